@@ -0,0 +1,86 @@
+"""Compare creating N child rows one POST at a time against one POST to ``/bulk/``.
+
+    python benchmarks/bulk_writes.py --items 100
+
+Requests go through the real URLconf with DRF's test client, inside a
+transaction that is rolled back, so the database is left untouched.
+"""
+import argparse
+from datetime import date
+
+import common  # noqa: F401  (configures Django)
+from common import User, Trip, Activity, Expense, timed
+
+from django.db import connection, transaction
+from rest_framework.test import APIClient
+
+
+class Rollback(Exception):
+    pass
+
+
+class QueryCounter:
+    # connection.queries is reset on every request_started, so count with a wrapper instead.
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def payloads(kind, trip, count):
+    if kind == 'activities':
+        return [{'trip': trip.pk, 'name': f'Stop {i}', 'date': '2025-05-02'} for i in range(count)]
+    return [
+        {'trip': trip.pk, 'description': f'Item {i}', 'amount': '9.50', 'category': 'food', 'date': '2025-05-02'}
+        for i in range(count)
+    ]
+
+
+def measure(client, kind, trip, count, repeat):
+    url = f'/api/{kind}/'
+    items = payloads(kind, trip, count)
+
+    def per_item():
+        for item in items:
+            assert client.post(url, item, format='json').status_code == 201
+
+    def bulk():
+        assert client.post(url + 'bulk/', items, format='json').status_code == 201
+
+    results = {}
+    for name, func in (('per item', per_item), ('bulk', bulk)):
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            func()
+        p50, p99 = timed(func, repeat=repeat)
+        results[name] = p50
+        print(f'{kind:10s} {name:8s} {queries.count:6d} queries  p50 {p50:9.2f} ms  p99 {p99:9.2f} ms')
+    print(f'{kind:10s} speedup  {results["per item"] / results["bulk"]:.1f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    try:
+        with transaction.atomic():
+            user = User.objects.create_user(username='bench_bulk_writes', password='unused')
+            trip = Trip.objects.create(user=user, title='Bulk benchmark', destination='Oslo',
+                                       start_date=date(2025, 5, 1), end_date=date(2025, 5, 9))
+            client = APIClient(HTTP_HOST='localhost')
+            client.force_authenticate(user)
+            for kind in ('activities', 'expenses'):
+                measure(client, kind, trip, args.items, args.repeat)
+            print(f'rows written: {Activity.objects.filter(trip=trip).count()} activities, '
+                  f'{Expense.objects.filter(trip=trip).count()} expenses')
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == '__main__':
+    main()
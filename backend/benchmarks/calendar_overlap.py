@@ -0,0 +1,105 @@
+"""Calendar lookups: trips overlapping a date window, and activity clashes within a trip.
+
+    python benchmarks/calendar_overlap.py                 # 200k trips of 1-21 days over two years
+    python benchmarks/calendar_overlap.py --trips 20000   # for a quick run
+
+Seeds inside a transaction that is rolled back, then times the trips
+overlapping a week and a month with the plain ``start_date <= end AND
+end_date >= start`` filter and with ``overlapping_trips`` (the GiST
+daterange index on PostgreSQL; elsewhere, and for one user's trips, the same
+range check), checking both return the same rows. Then compares
+``find_conflicts`` with checking every pair on synthetic days of activities.
+"""
+import argparse
+import random
+from datetime import date, time, timedelta
+from itertools import combinations
+from types import SimpleNamespace
+
+import common  # noqa: F401  (configures Django)
+from common import Trip, seed, timed
+
+from django.db import connection, transaction
+
+from trips.calendar import activity_slot, find_conflicts, overlapping_trips
+
+
+class Rollback(Exception):
+    pass
+
+
+def shorten_trips(rng):
+    """The seeded trips last about two years; give them holiday-sized lengths instead."""
+    trips = list(Trip.objects.only('pk', 'start_date'))
+    for trip in trips:
+        trip.end_date = trip.start_date + timedelta(days=rng.randrange(21))
+    Trip.objects.bulk_update(trips, ['end_date'], batch_size=5000)
+
+
+def measure_trips(repeat):
+    user_id = Trip.objects.values('user_id').order_by('?').first()['user_id']
+    print(f'{Trip.objects.count()} trips on {connection.vendor}; user {user_id}')
+    for label, days in (('week', 7), ('month', 30)):
+        start = date(2024, 6, 1)
+        end = start + timedelta(days=days - 1)
+        for who, user in (('all', None), ('user', user_id)):
+            trips = Trip.objects.all()
+            scan = trips.filter(start_date__lte=end, end_date__gte=start)
+            if user is not None:
+                scan = scan.filter(user=user)
+            indexed = overlapping_trips(trips, start, end, user=user)
+            assert set(scan.values_list('pk', flat=True)) == set(indexed.values_list('pk', flat=True))
+            scan_p50, scan_p99 = timed(lambda: list(scan.values_list('pk', flat=True)), repeat=repeat)
+            overlap_p50, overlap_p99 = timed(
+                lambda: list(overlapping_trips(trips, start, end, user=user).values_list('pk', flat=True)),
+                repeat=repeat,
+            )
+            print(f'{label:5s} {who:4s} {scan.count():7d} trips   range p50 {scan_p50:8.2f} ms p99 {scan_p99:8.2f} ms   '
+                  f'overlap p50 {overlap_p50:8.2f} ms p99 {overlap_p99:8.2f} ms   ({scan_p50 / overlap_p50:.1f}x)')
+
+
+def pairwise_conflicts(activities):
+    slots = [(*activity_slot(activity), activity) for activity in activities if activity.time is not None]
+    return [
+        (first, second) for (a_start, a_end, first), (b_start, b_end, second) in combinations(slots, 2)
+        if first.trip_id == second.trip_id and a_start < b_end and b_start < a_end
+    ]
+
+
+def measure_conflicts(rng, repeat):
+    for count in (100, 1000, 5000):
+        activities = [
+            SimpleNamespace(pk=pk, trip_id=1, date=date(2024, 6, 1) + timedelta(days=rng.randrange(count // 20 + 1)),
+                            time=time(rng.randrange(6, 22), rng.choice((0, 15, 30, 45))),
+                            end_time=None)
+            for pk in range(count)
+        ]
+        assert len(find_conflicts(activities)) == len(pairwise_conflicts(activities))
+        sweep_p50, _ = timed(lambda: find_conflicts(activities), repeat=repeat)
+        pairs_p50, _ = timed(lambda: pairwise_conflicts(activities), repeat=max(1, repeat // 10))
+        print(f'{count:5d} activities   pairwise p50 {pairs_p50:9.2f} ms   sweep p50 {sweep_p50:8.2f} ms   '
+              f'({pairs_p50 / sweep_p50:.1f}x)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trips', type=int, default=200_000)
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    try:
+        with transaction.atomic():
+            seed(trips=args.trips, users=args.users, activities_per_trip=0, expenses_per_trip=0,
+                 checklist_per_trip=0)
+            shorten_trips(rng)
+            measure_trips(args.repeat)
+            raise Rollback
+    except Rollback:
+        pass
+    measure_conflicts(rng, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Shared setup for the benchmark scripts in this directory.
+
+Run the scripts from ``backend/`` against a scratch database, e.g.
+``DJANGO_SETTINGS_MODULE=core.settings python benchmarks/indexes.py``.
+"""
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+import django
+
+django.setup()
+
+from django.contrib.auth import get_user_model
+from trips.models import Trip, Activity, Expense, Checklist
+
+User = get_user_model()
+
+DESTINATIONS = ['Paris', 'Tokyo', 'Lisbon', 'New York', 'Cairo', 'Lima', 'Sydney', 'Oslo', 'Hanoi', 'Cusco']
+STATUSES = [value for value, _ in Trip.STATUS_CHOICES]
+ACTIVITY_CATEGORIES = [value for value, _ in Activity.CATEGORY_CHOICES]
+EXPENSE_CATEGORIES = [value for value, _ in Expense.CATEGORY_CHOICES]
+
+
+def seed(trips=100_000, users=1_000, activities_per_trip=4, expenses_per_trip=4,
+         checklist_per_trip=1, batch_size=5_000, rng=None, expense_days=None):
+    """Bulk-insert a synthetic data set; ~1M rows with the defaults.
+
+    ``expense_days`` spreads each trip's expenses over that many days instead of one per day.
+    """
+    rng = rng or random.Random(42)
+    prefix = f'bench{int(time.time())}'
+    User.objects.bulk_create(
+        [User(username=f'{prefix}_{i}', role='user') for i in range(users)], batch_size=batch_size
+    )
+    user_ids = list(User.objects.filter(username__startswith=prefix).values_list('pk', flat=True))
+
+    base = date(2024, 1, 1)
+    for offset in range(0, trips, batch_size):
+        count = min(batch_size, trips - offset)
+        created = Trip.objects.bulk_create([
+            Trip(
+                user_id=rng.choice(user_ids),
+                title=f'Trip {offset + i}',
+                destination=rng.choice(DESTINATIONS),
+                description='Synthetic benchmark trip',
+                start_date=base + timedelta(days=rng.randrange(730)),
+                end_date=base + timedelta(days=rng.randrange(730, 760)),
+                budget=Decimal(rng.randrange(100, 10_000)),
+                status=rng.choice(STATUSES),
+            )
+            for i in range(count)
+        ])
+        children = [[], [], []]
+        for trip in created:
+            for i in range(activities_per_trip):
+                children[0].append(Activity(
+                    trip=trip, name=f'Activity {i}', category=rng.choice(ACTIVITY_CATEGORIES),
+                    date=trip.start_date + timedelta(days=i), completed=rng.random() < 0.3,
+                ))
+            for i in range(expenses_per_trip):
+                day = i % expense_days if expense_days else i
+                children[1].append(Expense(
+                    trip=trip, description=f'Expense {i}', amount=Decimal(rng.randrange(1, 500)),
+                    category=rng.choice(EXPENSE_CATEGORIES), date=trip.start_date + timedelta(days=day),
+                ))
+            for i in range(checklist_per_trip):
+                children[2].append(Checklist(trip=trip, item=f'Item {i}', priority=rng.randrange(3)))
+        Activity.objects.bulk_create(children[0], batch_size=batch_size)
+        Expense.objects.bulk_create(children[1], batch_size=batch_size)
+        Checklist.objects.bulk_create(children[2], batch_size=batch_size)
+        print(f'  seeded {offset + count}/{trips} trips', flush=True)
+
+
+def timed(func, repeat=20):
+    """Run ``func`` ``repeat`` times and return (p50, p99) latency in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.99))]
@@ -0,0 +1,91 @@
+"""Compare query plans and latency for the hot trip queries with and without the Meta indexes.
+
+    python benchmarks/indexes.py --seed          # seed ~1M rows first
+    python benchmarks/indexes.py                 # reuse the existing data
+
+The "before" run drops the indexes from migration 0003 (and restores the
+plain trip_id foreign key indexes) inside a transaction that is rolled back.
+"""
+import argparse
+
+import common  # noqa: F401  (configures Django)
+from common import Trip, Activity, Expense, Checklist, seed, timed
+
+from django.db import connection, models, transaction
+from django.db.models import Count, Sum
+
+
+class Rollback(Exception):
+    pass
+
+
+def query_shapes():
+    trip = Trip.objects.order_by('?').only('pk', 'user_id').first()
+    return {
+        'trip list': lambda: Trip.objects.order_by('-created_at')[:10],
+        'trip list by status': lambda: Trip.objects.filter(status='upcoming').order_by('-created_at')[:10],
+        'trip list by destination': lambda: Trip.objects.filter(destination='Lisbon').order_by('-created_at')[:10],
+        'user upcoming trips': lambda: Trip.objects.filter(user_id=trip.user_id, status='upcoming').order_by('start_date')[:3],
+        'active trips by start': lambda: Trip.objects.filter(status__in=['upcoming', 'ongoing']).order_by('start_date')[:10],
+        'trip activities': lambda: Activity.objects.filter(trip_id=trip.pk).order_by('date', 'time'),
+        'trip completed activities': lambda: Activity.objects.filter(trip_id=trip.pk, completed=True).values('trip').annotate(n=Count('pk')),
+        'trip expenses by category': lambda: Expense.objects.filter(trip_id=trip.pk).order_by().values('category').annotate(total=Sum('amount')),
+        'latest expenses': lambda: Expense.objects.order_by('-date')[:10],
+        'trip checklist': lambda: Checklist.objects.filter(trip_id=trip.pk).order_by('-priority', 'completed', 'created_at'),
+    }
+
+
+def measure(label, repeat):
+    print(f'\n=== {label} ===')
+    results = {}
+    for name, build in query_shapes().items():
+        plan = build().explain()
+        p50, p99 = timed(lambda: list(build()), repeat=repeat)
+        results[name] = p50
+        print(f'{name:28s} p50 {p50:8.2f} ms  p99 {p99:8.2f} ms')
+        print('    ' + plan.replace('\n', '\n    '))
+    return results
+
+
+def drop_indexes():
+    with connection.schema_editor() as editor:
+        for model in (Trip, Activity, Expense, Checklist):
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+        for model in (Activity, Expense, Checklist):
+            editor.add_index(model, models.Index(fields=['trip'], name=f'bench_{model._meta.model_name}_trip'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seed', action='store_true', help='Seed synthetic data before measuring.')
+    parser.add_argument('--trips', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(trips=args.trips)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    after = measure('with indexes', args.repeat)
+
+    connection.disable_constraint_checking()
+    try:
+        with transaction.atomic():
+            drop_indexes()
+            before = measure('without indexes', args.repeat)
+            raise Rollback
+    except Rollback:
+        pass
+    finally:
+        connection.enable_constraint_checking()
+
+    print('\n=== summary (p50 ms) ===')
+    for name in after:
+        speedup = before[name] / after[name] if after[name] else float('inf')
+        print(f'{name:28s} {before[name]:8.2f} -> {after[name]:8.2f}  ({speedup:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
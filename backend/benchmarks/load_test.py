@@ -0,0 +1,159 @@
+"""Load-test the dashboard/statistics/health endpoints: sync gunicorn vs the async views under uvicorn.
+
+    python benchmarks/load_test.py --username admin --password secret --trip 42
+    python benchmarks/load_test.py ... --uncached --concurrency 64 --duration 30
+
+Starts ``gunicorn core.wsgi --workers 3`` (the current deployment), then
+``gunicorn core.asgi -k uvicorn.workers.UvicornWorker --workers 3``, against
+whatever database the settings point at (use PostgreSQL: the async views only
+run queries concurrently there). Each endpoint is hammered by
+``--concurrency`` client threads for ``--duration`` seconds and p50/p99
+latency and requests/sec are reported. ``--uncached`` swaps the response
+cache for a dummy backend so every request reaches the database.
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+SERVERS = {
+    'sync (gunicorn, 3 workers)': ['core.wsgi:application'],
+    'async (gunicorn + uvicorn, 3 workers)': ['core.asgi:application', '--worker-class',
+                                              'uvicorn.workers.UvicornWorker'],
+}
+
+
+def endpoints(trip, asynchronous):
+    prefix = 'async/' if asynchronous else ''
+    return {
+        'trip statistics': f'/api/{prefix}trips/{trip}/statistics/',
+        'trip dashboard': f'/api/{prefix}trips/dashboard/',
+        'admin dashboard': f'/api/auth/{prefix}dashboard/admin/',
+        'health': '/health/async/' if asynchronous else '/health/',
+    }
+
+
+def request(port, path, headers=None, method='GET', body=None):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def start_server(args, port, extra_env):
+    command = [sys.executable, '-m', 'gunicorn', *args, '--bind', f'127.0.0.1:{port}', '--workers', '3']
+    process = subprocess.Popen(command, cwd=BACKEND, env={**os.environ, **extra_env},
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            if request(port, '/health/')[0] == 200:
+                return process
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'server {args[0]} did not start')
+
+
+def login(port, username, password):
+    status, body = request(port, '/api/auth/login/', {'Content-Type': 'application/json'}, 'POST',
+                           json.dumps({'username': username, 'password': password}))
+    if status != 200:
+        raise RuntimeError(f'login failed ({status}): {body[:200]!r}')
+    return {'Authorization': f'Bearer {json.loads(body)["access"]}'}
+
+
+def hammer(port, path, headers, concurrency, duration):
+    samples, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local = []
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                ok = False
+            if ok:
+                local.append((time.perf_counter() - start) * 1000)
+            else:
+                with lock:
+                    errors[0] += 1
+        connection.close()
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    samples.sort()
+    if not samples:
+        return None
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return statistics.median(samples), p99, len(samples) / elapsed, errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--username', required=True, help='An admin account (the admin dashboard is included).')
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--trip', type=int, required=True, help='Trip id for the statistics endpoint.')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--uncached', action='store_true', help='Disable the response cache in the servers.')
+    args = parser.parse_args()
+
+    env = {'RESPONSE_CACHE_BACKEND': 'django.core.cache.backends.dummy.DummyCache'} if args.uncached else {}
+    results = {}
+    for name, server in SERVERS.items():
+        process = start_server(server, args.port, env)
+        try:
+            headers = login(args.port, args.username, args.password)
+            print(f'\n=== {name} ===')
+            for label, path in endpoints(args.trip, asynchronous='uvicorn' in name).items():
+                result = hammer(args.port, path, headers, args.concurrency, args.duration)
+                results[name, label] = result
+                if result is None:
+                    print(f'{label:16s} no successful requests')
+                    continue
+                p50, p99, rps, errors = result
+                print(f'{label:16s} p50 {p50:8.2f} ms  p99 {p99:8.2f} ms  {rps:8.1f} req/s  errors {errors}')
+        finally:
+            process.terminate()
+            process.wait()
+
+    sync_name, async_name = SERVERS
+    print('\n=== async vs sync ===')
+    for label in endpoints(args.trip, False):
+        before, after = results.get((sync_name, label)), results.get((async_name, label))
+        if before and after:
+            print(f'{label:16s} p50 {before[0]:8.2f} -> {after[0]:8.2f} ms   '
+                  f'p99 {before[1]:8.2f} -> {after[1]:8.2f} ms   {before[2]:8.1f} -> {after[2]:8.1f} req/s')
+
+
+if __name__ == '__main__':
+    main()
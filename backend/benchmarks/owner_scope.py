@@ -0,0 +1,80 @@
+"""Per-user child queries: the trip__user join vs the denormalized owner column.
+
+    python benchmarks/owner_scope.py                       # 200k trips x 50 activities = 10M activities
+    python benchmarks/owner_scope.py --trips 20000         # 1M, for a quick run
+
+Seeds inside a transaction that is rolled back, then times the scoped list
+queries of ActivityViewSet, ExpenseViewSet and ChecklistViewSet for one user
+(first page, a deep keyset page and the count) filtered both ways, checks
+that they return the same rows and prints each plan.
+"""
+import argparse
+
+import common  # noqa: F401  (configures Django)
+from common import Trip, Activity, Expense, Checklist, seed, timed
+
+from django.db import transaction
+
+
+class Rollback(Exception):
+    pass
+
+
+ORDERING = {
+    Activity: ('date', 'time', 'pk'),
+    Expense: ('-date', '-pk'),
+    Checklist: ('-priority', 'completed', 'created_at', 'pk'),
+}
+
+
+def query_shapes(user_id):
+    shapes = {}
+    for model, ordering in ORDERING.items():
+        name = model.__name__
+        scoped = {
+            'join': model.objects.filter(trip__user_id=user_id).order_by(*ordering),
+            'owner': model.objects.filter(owner_id=user_id).order_by(*ordering),
+        }
+        shapes[f'{name} first page'] = {label: lambda rows=rows: list(rows[:10]) for label, rows in scoped.items()}
+        shapes[f'{name} page 50'] = {label: lambda rows=rows: list(rows[490:500]) for label, rows in scoped.items()}
+        shapes[f'{name} count'] = {label: lambda rows=rows: rows.count() for label, rows in scoped.items()}
+    return shapes
+
+
+def measure(repeat):
+    user_id = Trip.objects.values('user_id').order_by('?').first()['user_id']
+    print(f'{Activity.objects.count()} activities, {Expense.objects.count()} expenses, '
+          f'{Checklist.objects.count()} checklist items; user {user_id} owns '
+          f'{Activity.objects.filter(owner_id=user_id).count()} activities')
+    for name, variants in query_shapes(user_id).items():
+        assert variants['join']() == variants['owner'](), f'{name}: results differ'
+        join_p50, join_p99 = timed(variants['join'], repeat=repeat)
+        owner_p50, owner_p99 = timed(variants['owner'], repeat=repeat)
+        print(f'{name:28s} join p50 {join_p50:8.2f} ms p99 {join_p99:8.2f} ms   '
+              f'owner p50 {owner_p50:8.2f} ms p99 {owner_p99:8.2f} ms   ({join_p50 / owner_p50:.1f}x)')
+    for model in (Activity, Expense, Checklist):
+        for scope in ({'trip__user_id': user_id}, {'owner_id': user_id}):
+            plan = model.objects.filter(**scope)[:10].explain()
+            print(f'\n{model.__name__} {list(scope)[0]}:\n    ' + plan.replace('\n', '\n    '))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trips', type=int, default=200_000)
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--activities-per-trip', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    try:
+        with transaction.atomic():
+            seed(trips=args.trips, users=args.users, activities_per_trip=args.activities_per_trip,
+                 expenses_per_trip=4, checklist_per_trip=2)
+            measure(args.repeat)
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Monthly spending by category: GROUP BY over Expense vs the daily rollup table.
+
+    python benchmarks/rollups.py --trips 50000 --expenses-per-trip 20 --expense-days 5
+
+Seeds the data inside a transaction that is rolled back (the rollups are
+maintained by ``Expense.objects.bulk_create`` as it goes), then times the
+system-wide and single-user month/week series both ways and checks that they
+agree.
+"""
+import argparse
+
+import common  # noqa: F401  (configures Django)
+from common import Expense, seed, timed
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from trips.models import ExpenseRollup
+from trips.rollups import spending_series
+
+
+class Rollback(Exception):
+    pass
+
+
+def raw_series(expenses, bucket):
+    trunc = {'week': TruncWeek, 'month': TruncMonth}[bucket]
+    return list(
+        expenses.order_by()
+        .annotate(period=trunc('date'))
+        .values('period', 'category', 'currency')
+        .annotate(total=Sum('amount'), count=Count('pk'))
+        .order_by('period', 'category', 'currency')
+    )
+
+
+def measure(repeat):
+    user_id = Expense.objects.values_list('trip__user_id', flat=True).first()
+    cases = {
+        'system-wide': (Expense.objects.all(), ExpenseRollup.objects.all()),
+        'one user': (Expense.objects.filter(trip__user_id=user_id), ExpenseRollup.objects.filter(user_id=user_id)),
+    }
+    print(f'{Expense.objects.count()} expenses, {ExpenseRollup.objects.count()} rollup rows')
+    for name, (expenses, rollups) in cases.items():
+        for bucket in ('week', 'month'):
+            assert raw_series(expenses, bucket) == spending_series(rollups, bucket), f'{name} {bucket}: differs'
+            raw_p50, raw_p99 = timed(lambda: raw_series(expenses, bucket), repeat=repeat)
+            rollup_p50, rollup_p99 = timed(lambda: spending_series(rollups, bucket), repeat=repeat)
+            print(f'{name:12s} {bucket:6s} raw p50 {raw_p50:9.2f} ms p99 {raw_p99:9.2f} ms   '
+                  f'rollup p50 {rollup_p50:8.2f} ms p99 {rollup_p99:8.2f} ms   ({raw_p50 / rollup_p50:.1f}x)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trips', type=int, default=50_000)
+    parser.add_argument('--expenses-per-trip', type=int, default=20)
+    parser.add_argument('--expense-days', type=int, default=5,
+                        help="Days each trip's expenses fall on; more expenses per day compress better.")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    try:
+        with transaction.atomic():
+            seed(trips=args.trips, users=500, activities_per_trip=0, expenses_per_trip=args.expenses_per_trip,
+                 checklist_per_trip=0, expense_days=args.expense_days)
+            measure(args.repeat)
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Rows/sec for the list serializers: DRF ModelSerializer vs trips.fast_serializers.
+
+    python benchmarks/serializers.py --rows 10000
+
+Seeds ``--rows`` trips (with 4 activities and 4 expenses each) inside a
+transaction that is rolled back, then renders each list payload both ways and
+checks the JSON is byte-identical.
+"""
+import argparse
+
+import common  # noqa: F401  (configures Django)
+from common import Trip, Activity, Expense, seed, timed
+
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from trips.fast_serializers import FastSerializer
+from trips.serializers import TripListSerializer, ActivitySerializer, ExpenseSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+def payloads(rows):
+    return {
+        'trips (TripListSerializer)': (TripListSerializer, Trip.objects.for_list().order_by('-created_at')[:rows], ()),
+        'activities (ActivitySerializer)': (ActivitySerializer, Activity.objects.order_by('date', 'time', 'pk')[:rows],
+                                            ('expenses',)),
+        'expenses (ExpenseSerializer)': (ExpenseSerializer, Expense.objects.order_by('-date', 'pk')[:rows], ()),
+    }
+
+
+def measure(rows, repeat):
+    renderer = JSONRenderer()
+    for name, (serializer_class, queryset, prefetch) in payloads(rows).items():
+        def drf():
+            return renderer.render(serializer_class(queryset.prefetch_related(*prefetch), many=True).data)
+
+        def fast():
+            serializer = FastSerializer(serializer_class, annotations=queryset.query.annotations)
+            return renderer.render(serializer.serialize(serializer.prepare(queryset)))
+
+        assert drf() == fast(), f'{name}: output differs'
+        drf_p50, _ = timed(drf, repeat=repeat)
+        fast_p50, _ = timed(fast, repeat=repeat)
+        print(f'{name:34s} DRF {rows / drf_p50 * 1000:10.0f} rows/s   fast {rows / fast_p50 * 1000:10.0f} rows/s   '
+              f'({drf_p50 / fast_p50:.1f}x)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    try:
+        with transaction.atomic():
+            seed(trips=args.rows, users=100, checklist_per_trip=0)
+            measure(args.rows, args.repeat)
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == '__main__':
+    main()
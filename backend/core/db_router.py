@@ -0,0 +1,105 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Route reads inside the block to a ``DATABASE_REPLICAS`` alias (writes still go to ``default``)."""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def choose_replica():
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+def primary_key(user):
+    return f'db:primary:{user.pk}'
+
+
+def pin_to_primary(user):
+    """Send ``user``'s reads to the primary for ``REPLICA_STICKY_SECONDS`` so they see their own writes."""
+    window = settings.REPLICA_STICKY_SECONDS
+    caches[settings.RESPONSE_CACHE_ALIAS].set(primary_key(user), time.time() + window, timeout=window)
+
+
+def pinned_to_primary(user):
+    if not settings.DATABASE_REPLICAS or not user.is_authenticated:
+        return False
+    until = caches[settings.RESPONSE_CACHE_ALIAS].get(primary_key(user))
+    return until is not None and until > time.time()
+
+
+class ReplicaRouter:
+    """Send reads to a replica inside ``replica_reads()``; everything else uses ``default``.
+
+    Without ``DATABASE_REPLICAS`` it routes nothing, so it is always installed.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and settings.DATABASE_REPLICAS:
+            return choose_replica()
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Explicit, or Django would write an instance back to the replica it was read from.
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication.
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaReadsMixin:
+    """Serve ``replica_actions`` (viewset actions or ``APIView`` method names) of GET/HEAD requests from a replica.
+
+    Authentication and permission checks still read the primary, and users
+    pinned by a recent write keep reading it too.
+    """
+
+    replica_actions = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        with replica_reads(enabled=False):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        method = request.method.lower()
+        handler = getattr(self, 'action_map', {}).get(method, method)
+        if method in ('get', 'head') and handler in self.replica_actions and not pinned_to_primary(request.user):
+            # Undone by the replica_reads() block in dispatch.
+            _replica_reads.set(True)
+
+
+class PrimaryAfterWriteMiddleware:
+    """Pin users to the primary after a successful unsafe request (see ``pin_to_primary``)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (settings.DATABASE_REPLICAS and request.method not in ('GET', 'HEAD', 'OPTIONS')
+                and response.status_code < 400):
+            # DRF sets the JWT user on the Django request once the view has authenticated.
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user)
+        return response
@@ -24,9 +24,11 @@ INSTALLED_APPS = [
     'django_filters',
     'users',
     'trips',
+    'tokens',
 ]
 
 MIDDLEWARE = [
+    'health.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     
@@ -35,6 +37,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.db_router.PrimaryAfterWriteMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -59,13 +62,90 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite unless DB_HOST is set (docker-compose sets it), in which case the
+# DB_* variables describe the PostgreSQL primary.
+#
+# DB_CONN_MAX_AGE keeps connections open between requests (checked before
+# reuse by CONN_HEALTH_CHECKS); set it to 0 when serving core.asgi, where
+# every request runs on a new thread. DB_POOL_MODE=pgbouncer is for pointing
+# DB_HOST at pgbouncer in transaction mode: server-side cursors (used by
+# QuerySet.iterator() in exports and imports) don't survive it.
+#
+# DB_REPLICA_HOSTS is a comma-separated list of read replicas using the same
+# name and credentials; core.db_router.ReplicaRouter sends GET requests for
+# the dashboard, statistics and list endpoints to them. Responses that go
+# into the response cache are still built from the primary.
+DB_HOST = os.environ.get('DB_HOST', '')
+DB_POOL_MODE = os.environ.get('DB_POOL_MODE', 'persistent')
+
+
+def postgres_database(host, **extra):
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DB_NAME', 'tripdb'),
+        'USER': os.environ.get('DB_USER', 'tripuser'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': host,
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': DB_POOL_MODE == 'pgbouncer',
+        'OPTIONS': {'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5))},
+        **extra,
     }
+
+
+if DB_HOST:
+    DATABASES = {'default': postgres_database(DB_HOST)}
+    for index, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+        DATABASES[f'replica{index}'] = postgres_database(host.strip(), TEST={'MIRROR': 'default'})
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+    # Local stand-ins for replicas: comma-separated SQLite files (e.g. a copy of db.sqlite3).
+    for index, name in enumerate(filter(None, os.environ.get('DB_SQLITE_REPLICAS', '').split(',')), start=1):
+        DATABASES[f'replica{index}'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / name.strip(),
+            'TEST': {'MIRROR': 'default'},
+        }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# After a successful POST/PUT/PATCH/DELETE a user's reads stay on the primary
+# for this many seconds, so they see their own writes despite replication
+# lag. Tracked in the response cache, which must be shared between workers.
+REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 10))
+
+# Per-user response cache for dashboards and trip detail (see trips/cache.py).
+# LocMemCache is per process, so deployments running several workers need a
+# shared backend for invalidations to reach every worker. Any Django cache backend works, e.g. django.core.cache.backends.redis.RedisCache
+# with RESPONSE_CACHE_LOCATION=redis://host:6379/1 (configure the Redis server
+# with maxmemory-policy allkeys-lru for LRU eviction).
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    RESPONSE_CACHE_ALIAS: {
+        'BACKEND': RESPONSE_CACHE_BACKEND,
+        'LOCATION': os.environ.get('RESPONSE_CACHE_LOCATION', 'trip-planner-responses'),
+        'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TTL', 300)),
+    },
 }
 
+if RESPONSE_CACHE_BACKEND.endswith(('LocMemCache', 'FileBasedCache')):
+    CACHES[RESPONSE_CACHE_ALIAS]['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 5000)),
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -93,7 +173,7 @@ AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -112,6 +192,80 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_REFRESH_SERIALIZER': 'tokens.serializers.TokenRefreshSerializer',
+    'TOKEN_BLACKLIST_SERIALIZER': 'tokens.serializers.TokenBlacklistSerializer',
+}
+
+# Revoked refresh tokens are kept as jti/expiry rows (tokens.RevokedToken)
+# behind a per-process Bloom filter sized for TOKEN_BLACKLIST_BLOOM_CAPACITY
+# live entries. Each filter picks up other processes' revocations through a
+# version in the response cache, or after TOKEN_BLACKLIST_SYNC_SECONDS when
+# that cache is not shared. Every TOKEN_BLACKLIST_PRUNE_EVERY revocations,
+# as many expired rows are deleted; `manage.py prune_token_blacklist` clears
+# a backlog, including the legacy outstanding token tables.
+TOKEN_BLACKLIST_BLOOM_CAPACITY = int(os.environ.get('TOKEN_BLACKLIST_BLOOM_CAPACITY', 100_000))
+TOKEN_BLACKLIST_SYNC_SECONDS = int(os.environ.get('TOKEN_BLACKLIST_SYNC_SECONDS', 5))
+TOKEN_BLACKLIST_PRUNE_EVERY = int(os.environ.get('TOKEN_BLACKLIST_PRUNE_EVERY', 100))
+
+# Authenticated users are resolved from the response cache for up to
+# AUTH_USER_CACHE_SECONDS and from a per-process copy for up to
+# AUTH_USER_LOCAL_CACHE_SECONDS. Saving or deleting a user drops both in the
+# process that made the change, so the local window bounds how long other
+# processes keep honouring a revoked role or a deactivated account.
+AUTH_USER_CACHE_SECONDS = int(os.environ.get('AUTH_USER_CACHE_SECONDS', 60))
+AUTH_USER_LOCAL_CACHE_SECONDS = int(os.environ.get('AUTH_USER_LOCAL_CACHE_SECONDS', 5))
+
+# Seconds before the admin dashboard snapshot is recomputed on read
+# (see `manage.py refresh_dashboard_snapshot` for the periodic refresh).
+DASHBOARD_SNAPSHOT_MAX_AGE = 3600
+
+# Uploads up to this size are imported during the request; larger files are
+# queued for `manage.py run_import_worker`. Set to 0 to queue everything.
+IMPORT_INLINE_MAX_BYTES = int(os.environ.get('IMPORT_INLINE_MAX_BYTES', 256 * 1024))
+
+# Currency for system-wide and per-user money totals. Trip totals use the
+# trip's own currency; conversions use the rates loaded with
+# `manage.py load_fx_rates`, memoized per process until the next load (a
+# version in the response cache) or for at most FX_RATE_CACHE_SECONDS.
+# Amounts in a currency with no rate yet count at face value; loading rates
+# recomputes the trip costs they feed.
+FX_BASE_CURRENCY = os.environ.get('FX_BASE_CURRENCY', 'USD')
+FX_RATE_CACHE_SECONDS = int(os.environ.get('FX_RATE_CACHE_SECONDS', 3600))
+
+# Trip image uploads are stored without EXIF. WebP copies at these widths are
+# rendered by a pool of IMAGE_VARIANT_WORKERS threads after the upload commits
+# (0 renders them during the request). `manage.py generate_image_variants`
+# backfills.
+IMAGE_VARIANT_WORKERS = int(os.environ.get('IMAGE_VARIANT_WORKERS', 2))
+IMAGE_VARIANT_WIDTHS = (320, 640, 1280)
+IMAGE_VARIANT_QUALITY = int(os.environ.get('IMAGE_VARIANT_QUALITY', 80))
+
+# Calendar windows (/api/calendar/) span at most CALENDAR_MAX_DAYS, or
+# CALENDAR_ALL_MAX_DAYS for an admin's scope=all view not narrowed to one
+# trip. A response lists at most CALENDAR_MAX_ROWS trips and as many
+# activities, earliest first, and sets `truncated` when more matched.
+# Activities with a start time but no end time are taken to last
+# CALENDAR_ACTIVITY_MINUTES when looking for clashes within a trip.
+CALENDAR_MAX_DAYS = int(os.environ.get('CALENDAR_MAX_DAYS', 366))
+CALENDAR_ALL_MAX_DAYS = int(os.environ.get('CALENDAR_ALL_MAX_DAYS', 31))
+CALENDAR_MAX_ROWS = int(os.environ.get('CALENDAR_MAX_ROWS', 1000))
+CALENDAR_ACTIVITY_MINUTES = int(os.environ.get('CALENDAR_ACTIVITY_MINUTES', 60))
+
+# Threads (each with its own database connection) that the async views use to
+# run independent queries concurrently. 0 runs them one after another.
+ASYNC_QUERY_WORKERS = int(os.environ.get('ASYNC_QUERY_WORKERS', 8))
+
+# Per-view latency histograms for every request, plus SQL count/time and
+# render time for SAMPLE_RATE of them (served at /health/metrics/). Requests
+# slower than SLOW_REQUEST_MS are kept in a ring buffer at /health/slow/.
+# With TOKEN set both endpoints require `Authorization: Bearer <token>`.
+REQUEST_METRICS = {
+    'ENABLED': os.environ.get('REQUEST_METRICS_ENABLED', 'True') == 'True',
+    'SAMPLE_RATE': float(os.environ.get('REQUEST_METRICS_SAMPLE_RATE', 0.1)),
+    'SLOW_REQUEST_MS': int(os.environ.get('SLOW_REQUEST_MS', 500)),
+    'SLOW_REQUEST_LOG_SIZE': 50,
+    'SERVER_TIMING': True,
+    'TOKEN': os.environ.get('METRICS_TOKEN', ''),
 }
 
 CORS_ALLOWED_ORIGINS = [
@@ -0,0 +1,170 @@
+import contextvars
+import os
+import threading
+from collections import defaultdict, deque
+from contextlib import ExitStack, contextmanager
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+# Upper bounds (seconds) of the latency histogram buckets.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_SQL_PER_REQUEST = 50
+MAX_SQL_LENGTH = 1000
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 0.1,
+    'SLOW_REQUEST_MS': 500,
+    'SLOW_REQUEST_LOG_SIZE': 50,
+    'SERVER_TIMING': True,
+    'TOKEN': '',
+}
+
+
+def metrics_setting(name):
+    return getattr(settings, 'REQUEST_METRICS', {}).get(name, DEFAULTS[name])
+
+
+_current_recorder = contextvars.ContextVar('query_recorder', default=None)
+
+
+class QueryRecorder:
+    """``connection.execute_wrapper`` that counts and times queries, optionally keeping their SQL.
+
+    One recorder may wrap connections on several threads (see
+    ``record_queries``); ``duration`` is then the sum over all of them.
+    """
+
+    def __init__(self, capture_sql=False):
+        self.lock = threading.Lock()
+        self.count = 0
+        self.duration = 0.0
+        self.capture_sql = capture_sql
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = perf_counter() - start
+            with self.lock:
+                self.count += 1
+                self.duration += elapsed
+                if self.capture_sql and len(self.queries) < MAX_SQL_PER_REQUEST:
+                    self.queries.append({'ms': round(elapsed * 1000, 2), 'sql': sql[:MAX_SQL_LENGTH]})
+
+
+@contextmanager
+def recording(recorder):
+    """Make ``recorder`` the current context's recorder and wrap this thread's connections with it."""
+    token = _current_recorder.set(recorder)
+    try:
+        with record_queries():
+            yield recorder
+    finally:
+        _current_recorder.reset(token)
+
+
+@contextmanager
+def record_queries():
+    """Wrap this thread's connections with the current context's recorder, if there is one.
+
+    Connections are per thread, so code running a request's queries on
+    another thread (with a copy of the request's context) calls this there.
+    """
+    recorder = _current_recorder.get()
+    with ExitStack() as stack:
+        if recorder is not None:
+            for connection in connections.all():
+                if recorder not in connection.execute_wrappers:
+                    stack.enter_context(connection.execute_wrapper(recorder))
+        yield
+
+
+class Registry:
+    """Per-process request metrics, keyed by ``(view, method, status class)``."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = defaultdict(lambda: {'count': 0, 'seconds': 0.0, 'buckets': [0] * len(BUCKETS)})
+            self.sampled = defaultdict(lambda: {'count': 0, 'queries': 0, 'db_seconds': 0.0, 'render_seconds': 0.0})
+            self.slow = deque(maxlen=metrics_setting('SLOW_REQUEST_LOG_SIZE'))
+
+    def observe(self, key, seconds, sample=None):
+        with self.lock:
+            series = self.requests[key]
+            series['count'] += 1
+            series['seconds'] += seconds
+            for index, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    series['buckets'][index] += 1
+                    break
+            if sample is not None:
+                sampled = self.sampled[key]
+                sampled['count'] += 1
+                sampled['queries'] += sample['queries']
+                sampled['db_seconds'] += sample['db_seconds']
+                sampled['render_seconds'] += sample['render_seconds']
+
+    def record_slow(self, entry):
+        with self.lock:
+            self.slow.append(entry)
+
+    def slow_requests(self):
+        with self.lock:
+            return sorted(self.slow, key=lambda entry: entry['total_ms'], reverse=True)
+
+    def snapshot(self):
+        with self.lock:
+            requests = {key: {**value, 'buckets': list(value['buckets'])} for key, value in self.requests.items()}
+            return requests, {key: dict(value) for key, value in self.sampled.items()}
+
+
+registry = Registry()
+
+
+def label_set(key, **extra):
+    view, method, status = key
+    labels = {'view': view, 'method': method, 'status': status, 'pid': str(os.getpid()), **extra}
+    escaped = (f'{name}="{value.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for name, value in labels.items())
+    return '{' + ','.join(escaped) + '}'
+
+
+def prometheus_text():
+    """The registry in the Prometheus text exposition format (0.0.4)."""
+    requests, sampled = registry.snapshot()
+    lines = [
+        '# HELP http_request_duration_seconds Request latency measured by RequestMetricsMiddleware.',
+        '# TYPE http_request_duration_seconds histogram',
+    ]
+    for key, series in sorted(requests.items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS, series['buckets']):
+            cumulative += count
+            lines.append(f'http_request_duration_seconds_bucket{label_set(key, le=repr(bound))} {cumulative}')
+        lines.append(f'http_request_duration_seconds_bucket{label_set(key, le="+Inf")} {series["count"]}')
+        lines.append(f'http_request_duration_seconds_sum{label_set(key)} {series["seconds"]:.6f}')
+        lines.append(f'http_request_duration_seconds_count{label_set(key)} {series["count"]}')
+
+    counters = [
+        ('http_requests_sampled_total', 'Requests with query instrumentation (see SAMPLE_RATE).', 'count', '{}'),
+        ('http_request_db_queries_total', 'SQL queries run by sampled requests.', 'queries', '{}'),
+        ('http_request_db_seconds_total', 'SQL time of sampled requests.', 'db_seconds', '{:.6f}'),
+        ('http_request_render_seconds_total', 'Response rendering time of sampled requests.', 'render_seconds',
+         '{:.6f}'),
+    ]
+    for name, help_text, field, fmt in counters:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for key, series in sorted(sampled.items()):
+            lines.append(f'{name}{label_set(key)} {fmt.format(series[field])}')
+    return '\n'.join(lines) + '\n'
+
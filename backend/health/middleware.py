@@ -0,0 +1,96 @@
+import random
+from time import perf_counter
+
+from django.utils import timezone
+
+from .metrics import QueryRecorder, metrics_setting, recording, registry
+
+
+class RequestMetricsMiddleware:
+    """Record latency per view and, for a sample of requests, SQL count/time and render time.
+
+    Every request is timed (two ``perf_counter`` calls and a locked counter
+    update). ``REQUEST_METRICS['SAMPLE_RATE']`` of them additionally wrap the
+    database connections to count and time queries, including those the
+    views in ``trips.concurrent`` run on executor threads, and those are the
+    only requests whose SQL ends up in the slow request log.
+
+    Server-Timing reports ``app`` (the view, serializers included),
+    ``render`` (DRF rendering the response body) and, when sampled, ``db``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = metrics_setting('ENABLED')
+        self.sample_rate = metrics_setting('SAMPLE_RATE')
+        self.slow_seconds = metrics_setting('SLOW_REQUEST_MS') / 1000
+        self.server_timing = metrics_setting('SERVER_TIMING')
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        sampled = random.random() < self.sample_rate
+        request._metrics = {'view_start': None, 'render_start': None, 'render_end': None}
+        start = perf_counter()
+        if sampled:
+            with recording(QueryRecorder(capture_sql=True)) as recorder:
+                response = self.get_response(request)
+        else:
+            recorder = None
+            response = self.get_response(request)
+        total = perf_counter() - start
+
+        self.record(request, response, start, total, recorder)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.enabled:
+            request._metrics['view_start'] = perf_counter()
+
+    def process_template_response(self, request, response):
+        # First in MIDDLEWARE, so this hook runs last, right before the handler renders the response.
+        if self.enabled:
+            timings = request._metrics
+            timings['render_start'] = perf_counter()
+            response.add_post_render_callback(lambda rendered: timings.__setitem__('render_end', perf_counter()))
+        return response
+
+    def record(self, request, response, start, total, recorder):
+        timings = request._metrics
+        match = request.resolver_match
+        key = (match.view_name if match else 'unmatched', request.method, f'{response.status_code // 100}xx')
+
+        render = 0.0
+        if timings['render_start'] is not None and timings['render_end'] is not None:
+            render = timings['render_end'] - timings['render_start']
+        sample = None
+        if recorder is not None:
+            sample = {'queries': recorder.count, 'db_seconds': recorder.duration, 'render_seconds': render}
+        registry.observe(key, total, sample)
+
+        if total >= self.slow_seconds:
+            registry.record_slow({
+                'at': timezone.now().isoformat(),
+                'view': key[0],
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 2),
+                'render_ms': round(render * 1000, 2),
+                'queries': recorder.count if recorder else None,
+                'db_ms': round(recorder.duration * 1000, 2) if recorder else None,
+                'sql': recorder.queries if recorder else None,
+            })
+
+        if self.server_timing:
+            entries = []
+            if recorder is not None:
+                entries.append(f'db;dur={recorder.duration * 1000:.2f};desc="{recorder.count} queries"')
+            if timings['view_start'] is not None:
+                app_end = timings['render_start'] or start + total
+                entries.append(f'app;dur={(app_end - timings["view_start"]) * 1000:.2f};desc="view and serializers"')
+            if timings['render_start'] is not None:
+                entries.append(f'render;dur={render * 1000:.2f};desc="response rendering"')
+            entries.append(f'total;dur={total * 1000:.2f}')
+            response['Server-Timing'] = ', '.join(entries)
@@ -1,3 +1,83 @@
-from django.test import TestCase
+import asyncio
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from trips.cache import get_cache
+from trips.concurrent import gather_queries
+from trips.models import Trip
+
+from .metrics import QueryRecorder, recording, registry
+
+User = get_user_model()
+
+ALWAYS_SAMPLE = {'SAMPLE_RATE': 1.0, 'SLOW_REQUEST_MS': 0, 'TOKEN': 'secret'}
+
+
+@override_settings(REQUEST_METRICS=ALWAYS_SAMPLE)
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        get_cache().clear()
+        self.user = User.objects.create_user(username='metrics', password='pw')
+        Trip.objects.create(user=self.user, title='Lisbon', destination='Lisbon',
+                            start_date='2024-05-01', end_date='2024-05-04')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header(self):
+        response = self.client.get('/api/trips/')
+        self.assertEqual(response.status_code, 200)
+        entries = [entry.split(';')[0] for entry in response['Server-Timing'].split(', ')]
+        self.assertEqual(entries, ['db', 'app', 'render', 'total'])
+
+    def test_prometheus_metrics(self):
+        self.client.get('/api/trips/')
+        self.assertEqual(self.client.get('/health/metrics/').status_code, 403)
+
+        response = self.client.get('/health/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('http_request_duration_seconds_count{view="trip-list",method="GET",status="2xx"', body)
+        self.assertIn('http_request_db_queries_total{view="trip-list"', body)
+
+    def test_slow_requests_keep_sql(self):
+        self.client.get('/api/trips/')
+        response = self.client.get('/health/slow/', HTTP_AUTHORIZATION='Bearer secret')
+        slow = [entry for entry in response.json()['slow_requests'] if entry['view'] == 'trip-list']
+        self.assertEqual(len(slow), 1)
+        self.assertEqual(slow[0]['queries'], len(slow[0]['sql']))
+        self.assertTrue(any('trips_trip' in query['sql'] for query in slow[0]['sql']))
+
+    @override_settings(REQUEST_METRICS={**ALWAYS_SAMPLE, 'SAMPLE_RATE': 0.0})
+    def test_unsampled_requests_are_only_timed(self):
+        response = self.client.get('/api/trips/')
+        self.assertTrue(response['Server-Timing'].startswith('app;'))
+        requests, sampled = registry.snapshot()
+        self.assertEqual(requests[('trip-list', 'GET', '2xx')]['count'], 1)
+        self.assertEqual(sampled, {})
+
+    def test_async_views_report_their_queries(self):
+        self.user.role = 'admin'
+        self.user.save()
+        response = self.client.get('/api/async/trips/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        db = response['Server-Timing'].split(', ')[0]
+        self.assertTrue(db.startswith('db;'))
+        self.assertNotIn('desc="0 queries"', db)
+
+    def test_executor_queries_reach_the_request_recorder(self):
+        def select_one():
+            with connections['default'].cursor() as cursor:
+                cursor.execute('SELECT 1')
+                return cursor.fetchone()[0]
+
+        with mock.patch('trips.concurrent.runs_concurrently', return_value=True):
+            with recording(QueryRecorder(capture_sql=True)) as recorder:
+                self.assertEqual(asyncio.run(gather_queries(select_one, select_one)), [1, 1])
+        self.assertEqual(recorder.count, 2)
+        self.assertEqual([query['sql'] for query in recorder.queries], ['SELECT 1', 'SELECT 1'])
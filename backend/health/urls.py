@@ -1,6 +1,10 @@
 ﻿from django.urls import path
-from .views import health_check
+from .views import health_check, cache_metrics, async_health_check, request_metrics, slow_requests
 
 urlpatterns = [
     path('', health_check),
+    path('cache/', cache_metrics),
+    path('async/', async_health_check),
+    path('metrics/', request_metrics),
+    path('slow/', slow_requests),
 ]
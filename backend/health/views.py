@@ -1,16 +1,75 @@
-﻿from django.http import JsonResponse
+﻿from django.conf import settings
+from django.http import HttpResponse, JsonResponse
 from django.db import connection
 
-def health_check(request):
+def check_database():
     try:
         with connection.cursor() as cursor:
             cursor.execute("SELECT 1")
-        db_status = "healthy"
+        return "healthy"
     except:
-        db_status = "unhealthy"
+        return "unhealthy"
+
+def check_cache():
+    from trips.cache import get_cache
+
+    try:
+        cache = get_cache()
+        cache.set('health:ping', 1, timeout=10)
+        return "healthy" if cache.get('health:ping') == 1 else "unhealthy"
+    except Exception:
+        return "unhealthy"
+
+def health_check(request):
+    db_status = check_database()
     
     return JsonResponse({
         'status': 'healthy',
         'service': 'trip-planner-backend',
         'database': db_status
     })
+
+def cache_metrics(request):
+    from trips.cache import cache_stats
+
+    return JsonResponse({
+        'service': 'trip-planner-backend',
+        'response_cache': cache_stats(),
+    })
+
+async def async_health_check(request):
+    from trips.concurrent import gather_queries
+
+    db_status, cache_status = await gather_queries(check_database, check_cache)
+    return JsonResponse({
+        'status': 'healthy',
+        'service': 'trip-planner-backend',
+        'database': db_status,
+        'cache': cache_status,
+    })
+
+def metrics_authorized(request, allow_debug=False):
+    from .metrics import metrics_setting
+
+    token = metrics_setting('TOKEN')
+    if not token:
+        return allow_debug or settings.DEBUG
+    return request.headers.get('Authorization') == f'Bearer {token}'
+
+def request_metrics(request):
+    from .metrics import prometheus_text
+
+    if not metrics_authorized(request, allow_debug=True):
+        return JsonResponse({'detail': 'Invalid metrics token.'}, status=403)
+    return HttpResponse(prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def slow_requests(request):
+    from .metrics import registry
+
+    # Contains SQL, so without a REQUEST_METRICS token it is only served with DEBUG on.
+    if not metrics_authorized(request):
+        return JsonResponse({'detail': 'Invalid metrics token.'}, status=403)
+    return JsonResponse({
+        'service': 'trip-planner-backend',
+        'slow_requests': registry.slow_requests(),
+    })
@@ -0,0 +1,149 @@
+import hashlib
+import math
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from .models import RevokedToken
+
+VERSION_KEY = 'tokens:revoked:version'
+# Rows are pulled by revoked_at, which can commit out of order and comes from each server's clock.
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+class BloomFilter:
+    """Set membership with no false negatives and about ``error_rate`` false positives up to ``capacity`` keys."""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first, step = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * step) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(key))
+
+
+def revoked_tokens():
+    # Always the primary: a replica that lags would let a just-revoked token through.
+    return RevokedToken.objects.using(DEFAULT_DB_ALIAS)
+
+
+def current_version():
+    cache = caches[settings.RESPONSE_CACHE_ALIAS]
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 0, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    cache = caches[settings.RESPONSE_CACHE_ALIAS]
+    cache.add(VERSION_KEY, 0, timeout=None)
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        # Evicted between add() and incr(); any new value makes readers sync.
+        cache.set(VERSION_KEY, 1, timeout=None)
+        return 1
+
+
+class RevocationIndex:
+    """Process-local Bloom filter over ``RevokedToken`` so that checking a live token needs no query.
+
+    A token the filter has never seen is not revoked; a hit is confirmed in
+    the database. The filter pulls newly revoked rows when the version in
+    the response cache moves (every revocation bumps it) and at least every
+    ``TOKEN_BLACKLIST_SYNC_SECONDS``, and is rebuilt from the unexpired rows
+    once it holds more keys than it was sized for.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.filter = None
+        self.version = None
+        self.synced_at = None
+
+    def rebuild(self, now):
+        live = revoked_tokens().filter(expires_at__gt=now)
+        capacity = max(settings.TOKEN_BLACKLIST_BLOOM_CAPACITY, 2 * live.count())
+        bloom = BloomFilter(capacity)
+        for jti in live.values_list('jti', flat=True).iterator(chunk_size=5000):
+            bloom.add(jti)
+        self.filter = bloom
+
+    def sync(self):
+        now = timezone.now()
+        version = current_version()
+        with self.lock:
+            if self.filter is None or self.filter.count > self.filter.capacity:
+                self.rebuild(now)
+            elif (version is None or version != self.version
+                  or now - self.synced_at > timedelta(seconds=settings.TOKEN_BLACKLIST_SYNC_SECONDS)):
+                recent = revoked_tokens().filter(revoked_at__gte=self.synced_at - SYNC_OVERLAP, expires_at__gt=now)
+                for jti in recent.values_list('jti', flat=True):
+                    self.filter.add(jti)
+            else:
+                return
+            self.version, self.synced_at = version, now
+
+    def add(self, jti):
+        with self.lock:
+            if self.filter is not None:
+                self.filter.add(jti)
+
+    def is_revoked(self, jti):
+        self.sync()
+        if jti not in self.filter:
+            return False
+        return revoked_tokens().filter(jti=jti, expires_at__gt=timezone.now()).exists()
+
+
+_index = RevocationIndex()
+
+
+def is_revoked(jti):
+    return _index.is_revoked(jti)
+
+
+def revoke(jti, expires_at):
+    """Record ``jti`` as revoked until ``expires_at``; a no-op when it already is."""
+    revoked_tokens().bulk_create([RevokedToken(jti=jti, expires_at=expires_at)], ignore_conflicts=True)
+    _index.add(jti)
+
+    def announce():
+        if bump_version() % settings.TOKEN_BLACKLIST_PRUNE_EVERY == 0:
+            prune_expired(settings.TOKEN_BLACKLIST_PRUNE_EVERY)
+    transaction.on_commit(announce)
+
+
+def prune_expired(limit):
+    """Delete up to ``limit`` revoked tokens that have expired; returns how many went."""
+    expired = list(
+        revoked_tokens().filter(expires_at__lte=timezone.now()).order_by('expires_at')
+        .values_list('pk', flat=True)[:limit]
+    )
+    if not expired:
+        return 0
+    return revoked_tokens().filter(pk__in=expired).delete()[0]
+
+
+def reset_index():
+    global _index
+    _index = RevocationIndex()
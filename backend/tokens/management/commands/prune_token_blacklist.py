@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from tokens.blacklist import prune_expired
+
+
+class Command(BaseCommand):
+    help = ('Delete expired revoked tokens and the expired rows of the legacy outstanding/blacklisted '
+            'token tables, one batch at a time.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0,
+                            help='Seconds to pause between batches to spread load.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        revoked = self.drain(lambda: prune_expired(batch_size), options)
+
+        def prune_legacy():
+            expired = list(
+                OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+                .order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            # Cascades to BlacklistedToken; the count covers outstanding rows only.
+            return OutstandingToken.objects.filter(pk__in=expired).delete()[1].get(OutstandingToken._meta.label, 0)
+        legacy = self.drain(prune_legacy, options)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {revoked} expired revoked tokens and {legacy} expired outstanding tokens.'
+        ))
+
+    def drain(self, delete_batch, options):
+        total = 0
+        while True:
+            deleted = delete_batch()
+            total += deleted
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{total} deleted')
+            if deleted < options['batch_size']:
+                return total
+            if options['sleep']:
+                time.sleep(options['sleep'])
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:37
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def copy_live_blacklist(apps, schema_editor):
+    # Tokens blacklisted before the switch must stay rejected until they expire.
+    BlacklistedToken = apps.get_model('token_blacklist', 'BlacklistedToken')
+    RevokedToken = apps.get_model('tokens', 'RevokedToken')
+    db = schema_editor.connection.alias
+    live = (BlacklistedToken.objects.using(db).filter(token__expires_at__gt=timezone.now())
+            .values_list('token__jti', 'token__expires_at'))
+    batch = []
+    for jti, expires_at in live.iterator(chunk_size=1000):
+        batch.append(RevokedToken(jti=jti, expires_at=expires_at))
+        if len(batch) == 1000:
+            RevokedToken.objects.using(db).bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    RevokedToken.objects.using(db).bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('token_blacklist', '0012_alter_outstandingtoken_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jti', models.CharField(max_length=64, unique=True)),
+                ('expires_at', models.DateTimeField()),
+                ('revoked_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='revoked_token_expires_idx'), models.Index(fields=['revoked_at'], name='revoked_token_revoked_idx')],
+            },
+        ),
+        migrations.RunPython(copy_live_blacklist, migrations.RunPython.noop),
+    ]
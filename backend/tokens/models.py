@@ -0,0 +1,17 @@
+from django.db import models
+
+
+class RevokedToken(models.Model):
+    """A revoked refresh token's ``jti``, kept only until the token would have expired anyway."""
+    jti = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at'], name='revoked_token_expires_idx'),
+            models.Index(fields=['revoked_at'], name='revoked_token_revoked_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.jti} (until {self.expires_at})"
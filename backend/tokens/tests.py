@@ -0,0 +1,86 @@
+import uuid
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from .blacklist import BloomFilter, RevocationIndex, bump_version, reset_index
+from .models import RevokedToken
+from .tokens import RefreshToken
+
+User = get_user_model()
+
+
+class RevokedTokenTests(TestCase):
+    def setUp(self):
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        reset_index()
+        self.user = User.objects.create_user(username='rotator', password='secret123')
+        self.client = APIClient()
+
+    def test_rotation_revokes_the_old_refresh_token_without_outstanding_rows(self):
+        response = self.client.post('/api/auth/login/', {'username': 'rotator', 'password': 'secret123'})
+        first = response.data['refresh']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/token/refresh/', {'refresh': first})
+        self.assertEqual(response.status_code, 200)
+        second = response.data['refresh']
+        self.assertNotEqual(first, second)
+        self.assertEqual(RevokedToken.objects.count(), 1)
+        self.assertFalse(OutstandingToken.objects.exists())
+
+        self.assertEqual(self.client.post('/api/auth/token/refresh/', {'refresh': first}).status_code, 401)
+        self.assertEqual(self.client.post('/api/auth/token/refresh/', {'refresh': second}).status_code, 200)
+
+    def test_live_tokens_are_checked_without_a_query(self):
+        index = RevocationIndex()
+        index.sync()
+        with self.assertNumQueries(0):
+            for _ in range(100):
+                self.assertFalse(index.is_revoked(uuid.uuid4().hex))
+
+    def test_revocations_from_other_processes_reach_the_filter(self):
+        index = RevocationIndex()
+        token = RefreshToken.for_user(self.user)
+        self.assertFalse(index.is_revoked(token['jti']))
+
+        # Another process revokes it: the row plus a version bump, nothing local.
+        RevokedToken.objects.create(jti=token['jti'], expires_at=timezone.now() + timedelta(days=1))
+        bump_version()
+        self.assertTrue(index.is_revoked(token['jti']))
+
+    def test_expired_entries_are_ignored_and_pruned(self):
+        now = timezone.now()
+        for day in range(5):
+            RevokedToken.objects.create(jti=f'old{day}', expires_at=now - timedelta(days=day + 1))
+        RevokedToken.objects.create(jti='live', expires_at=now + timedelta(days=1))
+        self.assertFalse(RevocationIndex().is_revoked('old0'))
+        self.assertTrue(RevocationIndex().is_revoked('live'))
+
+        for day in range(3):
+            outstanding = OutstandingToken.objects.create(jti=f'legacy{day}', token='x',
+                                                          expires_at=now + timedelta(days=day - 1, hours=1))
+            BlacklistedToken.objects.create(token=outstanding)
+
+        out = StringIO()
+        call_command('prune_token_blacklist', batch_size=2, stdout=out)
+        self.assertIn('Deleted 5 expired revoked tokens and 1 expired outstanding tokens.', out.getvalue())
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['live'])
+        self.assertEqual(BlacklistedToken.objects.count(), 2)
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000)
+        keys = [uuid.uuid4().hex for _ in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10000))
+        self.assertLess(false_positives, 300)
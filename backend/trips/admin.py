@@ -1,5 +1,5 @@
 ﻿from django.contrib import admin
-from .models import Trip, Activity, Expense, Checklist
+from .models import Trip, Activity, Expense, Checklist, ImportJob, ExpenseRollup, FxRate
 
 @admin.register(Trip)
 class TripAdmin(admin.ModelAdmin):
@@ -24,3 +24,20 @@ class ExpenseAdmin(admin.ModelAdmin):
 class ChecklistAdmin(admin.ModelAdmin):
     list_display = ['item', 'trip', 'completed', 'priority']
     list_filter = ['completed']
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'format', 'status', 'position', 'created_count', 'error_count', 'created_at']
+    list_filter = ['status', 'format']
+
+@admin.register(ExpenseRollup)
+class ExpenseRollupAdmin(admin.ModelAdmin):
+    list_display = ['trip', 'user', 'category', 'currency', 'day', 'total', 'count']
+    list_filter = ['category', 'currency']
+    date_hierarchy = 'day'
+
+@admin.register(FxRate)
+class FxRateAdmin(admin.ModelAdmin):
+    list_display = ['currency', 'date', 'rate']
+    list_filter = ['currency']
+    date_hierarchy = 'date'
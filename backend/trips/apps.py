@@ -3,3 +3,10 @@
 class TripsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'trips'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from . import signals
+        from .search import ensure_search_indexes
+        signals.connect()
+        post_migrate.connect(ensure_search_indexes, sender=self)
@@ -0,0 +1,31 @@
+from .cache import acached_response
+from .concurrent import arun_queries, async_api_view, gather_queries, render
+from .conditional import make_etag, not_modified, set_validators
+from .dashboard import trip_dashboard_queries
+from .models import Trip
+from .statistics import build_statistics, expenses_by_category
+
+
+@async_api_view(replica=True)
+async def trip_statistics(request, pk):
+    """Async ``/trips/<pk>/statistics/``: the annotated trip and the category totals are fetched concurrently."""
+    trips, by_category = await gather_queries(
+        lambda: list(Trip.objects.with_statistics().filter(pk=pk)),
+        lambda: expenses_by_category([pk]),
+    )
+    if not trips:
+        return render({'detail': 'Not found.'}, status=404)
+    trip = trips[0]
+    etag = make_etag(request.get_host(), request.get_full_path(), trip.version, trip.updated_at)
+    response = not_modified(request, etag, trip.updated_at)
+    if response is None:
+        response = set_validators(render(build_statistics(trip, by_category[trip.pk])), etag, trip.updated_at)
+    return response
+
+
+@async_api_view(replica=True)
+async def trip_dashboard(request):
+    """Async ``/trips/dashboard/``; shares the sync view's cache entries."""
+    queries = trip_dashboard_queries(Trip.objects.order_by('-created_at'))
+    return await acached_response(request, 'trip-dashboard', lambda: arun_queries(queries),
+                                  scopes=['trips', 'activities'])
@@ -0,0 +1,175 @@
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .cache import trips_changed
+from .models import Trip, Activity
+
+
+class CachedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Resolves primary keys from ``context['related_objects']`` instead of one query per item."""
+
+    def to_internal_value(self, data):
+        related = self.context.get('related_objects', {}).get(self.queryset.model)
+        if related is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            obj = related.get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+
+def records_trip_changes(queryset):
+    """True when ``queryset``'s bulk writes call ``trips_changed`` themselves."""
+    return getattr(queryset, 'records_trip_changes', False)
+
+
+def bulk_serializer_class(serializer_class):
+    return type(f'Bulk{serializer_class.__name__}', (serializer_class,), {
+        'serializer_related_field': CachedPrimaryKeyRelatedField,
+    })
+
+
+class BulkWriteMixin:
+    """``/bulk/`` endpoint: POST creates, PATCH updates and DELETE removes many rows in one transaction.
+
+    Every item is validated before anything is written. If any item fails,
+    nothing is saved and the response lists one error dict per item (empty
+    for valid items). Rows are written with ``bulk_create``/``bulk_update``.
+    """
+    max_bulk_items = 1000
+    bulk_prefetch = ()
+
+    def is_admin(self):
+        return self.request.user.role == 'admin' or self.request.user.role == 'superadmin'
+
+    def related_querysets(self):
+        """Querysets a normal user may reference from bulk payloads, keyed by model."""
+        if self.is_admin():
+            return {Trip: Trip.objects.all(), Activity: Activity.objects.all()}
+        user = self.request.user
+        return {Trip: Trip.objects.filter(user=user), Activity: Activity.objects.filter(owner=user)}
+
+    def load_related(self, serializer_class, items):
+        model = serializer_class.Meta.model
+        querysets = self.related_querysets()
+        related = {}
+        for field in model._meta.concrete_fields:
+            if not field.is_relation or field.related_model not in querysets:
+                continue
+            pks = set()
+            for item in items:
+                value = item.get(field.name) if isinstance(item, dict) else None
+                if isinstance(value, int) and not isinstance(value, bool) or isinstance(value, str) and value.isdigit():
+                    pks.add(int(value))
+            related[field.related_model] = querysets[field.related_model].in_bulk(pks) if pks else {}
+        return related
+
+    def bulk_payload(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return None, Response({'error': 'Expected a non-empty list of objects'},
+                                  status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.max_bulk_items:
+            return None, Response({'error': f'At most {self.max_bulk_items} items per request'},
+                                  status=status.HTTP_400_BAD_REQUEST)
+        return items, None
+
+    def validate_items(self, items, instances=None):
+        serializer_class = bulk_serializer_class(self.get_serializer_class())
+        context = self.get_serializer_context()
+        context['related_objects'] = self.load_related(serializer_class, items)
+        validated, errors = [], []
+        for index, item in enumerate(items):
+            instance = instances[index] if instances is not None else None
+            if instances is not None and instance is None:
+                errors.append({'id': ['Not found.']})
+                validated.append(None)
+                continue
+            serializer = serializer_class(instance, data=item, partial=instances is not None, context=context)
+            if serializer.is_valid():
+                errors.append({})
+                validated.append(serializer.validated_data)
+            else:
+                errors.append(serializer.errors)
+                validated.append(None)
+        return validated, errors
+
+    def bulk_response(self, objs, status_code):
+        if self.bulk_prefetch:
+            prefetch_related_objects(objs, *self.bulk_prefetch)
+        data = self.get_serializer(objs, many=True).data
+        return Response(data, status=status_code)
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request):
+        if request.method == 'DELETE':
+            return self.bulk_destroy(request)
+        items, error = self.bulk_payload(request)
+        if error is not None:
+            return error
+        if request.method == 'PATCH':
+            return self.bulk_update(items)
+        return self.bulk_create(items)
+
+    def bulk_create(self, items):
+        validated, errors = self.validate_items(items)
+        if any(errors):
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        model = self.get_queryset().model
+        with transaction.atomic():
+            objs = model.objects.bulk_create([model(**data) for data in validated])
+            if not records_trip_changes(model.objects.all()):
+                trips_changed({obj.trip_id for obj in objs}, model=model)
+        return self.bulk_response(objs, status.HTTP_201_CREATED)
+
+    def bulk_update(self, items):
+        ids = [item.get('id') if isinstance(item, dict) else None for item in items]
+        existing = self.get_queryset().in_bulk([pk for pk in ids if isinstance(pk, int)])
+        instances = [existing.get(pk) for pk in ids]
+        validated, errors = self.validate_items(items, instances)
+        if any(errors):
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        model = self.get_queryset().model
+        fields = set()
+        trip_ids = {obj.trip_id for obj in instances}
+        for obj, data in zip(instances, validated):
+            for name, value in data.items():
+                setattr(obj, name, value)
+            fields.update(data)
+        if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+            now = timezone.now()
+            for obj in instances:
+                obj.updated_at = now
+            fields.add('updated_at')
+        with transaction.atomic():
+            if fields:
+                model.objects.bulk_update(instances, list(fields))
+            trips_changed(trip_ids | {obj.trip_id for obj in instances}, model=model)
+        return self.bulk_response(instances, status.HTTP_200_OK)
+
+    def bulk_destroy(self, request):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not ids or not all(isinstance(pk, int) for pk in ids):
+            return Response({'error': 'Expected {"ids": [...]}'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.max_bulk_items:
+            return Response({'error': f'At most {self.max_bulk_items} items per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.get_queryset().filter(pk__in=ids).prefetch_related(None)
+        with transaction.atomic():
+            if records_trip_changes(queryset):
+                _, deleted = queryset.delete()
+            else:
+                trip_ids = set(queryset.values_list('trip_id', flat=True))
+                _, deleted = queryset.delete()
+                trips_changed(trip_ids, model=queryset.model)
+        return Response({'deleted': deleted.get(queryset.model._meta.label, 0)})
@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from core.db_router import replica_reads
+
+from .conditional import make_etag, not_modified, set_validators
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'responses')]
+
+
+def record(event):
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def cache_stats():
+    """Hit/miss counters for this process."""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats.get('hit', 0) + stats.get('miss', 0)
+    stats['hit_ratio'] = round(stats.get('hit', 0) / lookups, 4) if lookups else None
+    return stats
+
+
+def get_versions(scopes):
+    """Current version (a bump timestamp) for each scope, starting any that are missing."""
+    cache = get_cache()
+    keys = {f'version:{scope}': scope for scope in scopes}
+    versions = cache.get_many(list(keys))
+    missing = {key: time.time() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    now = time.time()
+    get_cache().set_many({f'version:{scope}': now for scope in scopes}, timeout=None)
+
+
+# Scopes of the views covering every user's trips that a change to these child models shows up in.
+CHILD_SCOPES = {'activity': ('activities',), 'expense': ('expenses',)}
+
+
+def invalidate(trip_ids=(), user_ids=(), find_owners=False, scopes=('trips',)):
+    """Expire cached responses covering ``trip_ids`` and the dashboards of ``user_ids``.
+
+    With ``find_owners`` the owners of ``trip_ids`` are looked up and expired
+    too. ``scopes`` are the global scopes to bump along with them: ``'trips'``
+    for changes to trip rows, ``CHILD_SCOPES`` for changes below them.
+    """
+    from .models import Trip
+
+    trip_ids = {pk for pk in trip_ids if pk is not None}
+    user_ids = {pk for pk in user_ids if pk is not None}
+    if find_owners and trip_ids:
+        user_ids.update(Trip.objects.filter(pk__in=trip_ids).exclude(user=None).values_list('user_id', flat=True))
+    bump(*scopes, *(f'trip:{pk}' for pk in trip_ids), *(f'user:{pk}' for pk in user_ids))
+
+
+def schedule_invalidation(trip_ids=(), user_ids=(), find_owners=False, scopes=('trips',)):
+    """Invalidate once the current transaction commits, so readers can't re-cache old rows."""
+    trip_ids, user_ids, scopes = list(trip_ids), list(user_ids), list(scopes)
+    transaction.on_commit(lambda: invalidate(trip_ids, user_ids, find_owners, scopes))
+
+
+def trips_changed(trip_ids, find_owners=True, model=None):
+    """Record a change to ``trip_ids``: bump their row version and expire cached responses.
+
+    ``model`` names the child model that changed; without it the trips themselves did.
+    """
+    from .models import Trip
+
+    trip_ids = [pk for pk in trip_ids if pk is not None]
+    scopes = CHILD_SCOPES.get(model._meta.model_name, ()) if model is not None else ('trips',)
+    if trip_ids:
+        Trip.objects.filter(pk__in=trip_ids).touch()
+        schedule_invalidation(trip_ids, find_owners=find_owners, scopes=scopes)
+
+
+def response_validators(request, name, scopes=(), token=None, last_modified=None):
+    """``(etag, cache key, last_modified)`` for a cached response."""
+    versions = get_versions(scopes)
+    user = request.user.pk if request.user.is_authenticated else 'anon'
+    etag = make_etag(name, user, request.get_host(), token, *(repr(version) for version in versions))
+    if last_modified is None and versions:
+        last_modified = datetime.fromtimestamp(max(versions), tz=timezone.utc)
+    return etag, 'response:' + etag.strip('"'), last_modified
+
+
+def cached_response(request, name, build, scopes=(), token=None, last_modified=None):
+    """Serve ``build()``'s data from the per-user response cache.
+
+    The cache key carries the current version of every scope (plus an
+    optional database-derived ``token``), so bumping a scope orphans old
+    entries (they age out by TTL/LRU). The ETag is derived from that key,
+    so a matching ``If-None-Match`` is answered with a 304 before the
+    payload is even looked up.
+
+    A miss is built from the primary even in a replica-read view: a lagging
+    replica would store old rows under the new version until it expires.
+    """
+    etag, key, last_modified = response_validators(request, name, scopes, token, last_modified)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        record('not_modified')
+        return response
+
+    cache = get_cache()
+    data = cache.get(key)
+    if data is None:
+        record('miss')
+        with replica_reads(enabled=False):
+            data = build()
+        cache.set(key, data)
+    else:
+        record('hit')
+
+    return set_validators(Response(data), etag, last_modified)
+
+
+async def acached_response(request, name, abuild, scopes=(), token=None, last_modified=None):
+    """``cached_response`` for async views: ``abuild`` is awaited on a miss and the body rendered like DRF."""
+    from .concurrent import render
+
+    etag, key, last_modified = await sync_to_async(response_validators)(request, name, scopes, token, last_modified)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        record('not_modified')
+        return response
+
+    cache = get_cache()
+    data = await sync_to_async(cache.get)(key)
+    if data is None:
+        record('miss')
+        with replica_reads(enabled=False):
+            data = await abuild()
+        await sync_to_async(cache.set)(key, data)
+    else:
+        record('hit')
+
+    return set_validators(render(data), etag, last_modified)
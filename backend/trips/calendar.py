@@ -0,0 +1,62 @@
+import heapq
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+
+
+def overlapping_trips(queryset, start, end, user=None):
+    """Trips of ``queryset`` whose ``[start_date, end_date]`` meets ``[start, end]``.
+
+    With ``user`` the trips are narrowed to theirs first: a handful of rows
+    off the user index, where a range check is cheapest. Across all users
+    the GiST daterange index answers on PostgreSQL; other databases range
+    scan the ``(start_date, end_date)`` index.
+    """
+    if user is not None:
+        return queryset.filter(user=user, start_date__lte=end, end_date__gte=start)
+    if connections[queryset.db].vendor == 'postgresql':
+        table = queryset.model._meta.db_table
+        return queryset.filter(RawSQL(
+            f"daterange(\"{table}\".\"start_date\", \"{table}\".\"end_date\", '[]') && daterange(%s, %s, '[]')",
+            (start, end), output_field=BooleanField(),
+        ))
+    return queryset.filter(start_date__lte=end, end_date__gte=start)
+
+
+def activity_slot(activity):
+    """``(start, end)`` datetimes of a timed activity; an end time before the start runs past midnight."""
+    start = datetime.combine(activity.date, activity.time)
+    if activity.end_time is None:
+        return start, start + timedelta(minutes=settings.CALENDAR_ACTIVITY_MINUTES)
+    end = datetime.combine(activity.date, activity.end_time)
+    return start, end if end > start else end + timedelta(days=1)
+
+
+def find_conflicts(activities):
+    """``(earlier, later)`` pairs of activities on the same trip whose time slots overlap.
+
+    Each trip's slots are swept in start order while a heap holds the ones
+    still running; every slot left in the heap clashes with the current one,
+    so n timed activities with k conflicts cost O(n log n + k) rather than
+    comparing every pair. Activities without a
+    time are all-day and never conflict; slots that merely touch do not.
+    """
+    slots = defaultdict(list)
+    for activity in activities:
+        if activity.time is not None:
+            slots[activity.trip_id].append((*activity_slot(activity), activity))
+
+    conflicts = []
+    for trip_slots in slots.values():
+        trip_slots.sort(key=lambda slot: (slot[0], slot[1], slot[2].pk))
+        running = []
+        for index, (start, end, activity) in enumerate(trip_slots):
+            while running and running[0][0] <= start:
+                heapq.heappop(running)
+            conflicts.extend((trip_slots[other][2], activity) for _, other in running)
+            heapq.heappush(running, (end, index))
+    return conflicts
@@ -0,0 +1,117 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import close_old_connections, connections
+from django.http import HttpResponse
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+
+from core.db_router import pinned_to_primary, replica_reads
+from health.metrics import record_queries
+from users.authentication import CachedJWTAuthentication
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.ASYNC_QUERY_WORKERS, thread_name_prefix='orm-query')
+    return _executor
+
+
+def run_query(query):
+    # Executor threads keep their own connection; honour CONN_MAX_AGE like a request would.
+    close_old_connections()
+    try:
+        with record_queries():
+            return query()
+    finally:
+        close_old_connections()
+
+
+def runs_concurrently(using='default'):
+    """Whether independent queries can go to separate connections.
+
+    Not on SQLite (one writer, and test databases live in memory), not when
+    disabled with ``ASYNC_QUERY_WORKERS = 0`` and not inside a transaction,
+    whose uncommitted rows other connections can't see.
+    """
+    connection = connections[using]
+    return settings.ASYNC_QUERY_WORKERS > 0 and connection.vendor != 'sqlite' and not connection.in_atomic_block
+
+
+async def gather_queries(*queries):
+    """Run the sync callables ``queries`` and return their results in order.
+
+    Django 4.2's async ORM methods all run on one shared thread, so they
+    don't overlap; here each query gets a thread (and connection) from a
+    dedicated pool and ``asyncio.gather`` waits for all of them.
+    """
+    if not runs_concurrently():
+        return [await sync_to_async(query)() for query in queries]
+    loop = asyncio.get_running_loop()
+    # Each query gets a copy of the caller's context so replica_reads() and the request's
+    # query recorder apply in the executor too.
+    return await asyncio.gather(*(
+        loop.run_in_executor(get_executor(), contextvars.copy_context().run, run_query, query) for query in queries
+    ))
+
+
+def run_queries(queries):
+    return {name: query() for name, query in queries.items()}
+
+
+async def arun_queries(queries):
+    return dict(zip(queries, await gather_queries(*queries.values())))
+
+
+def render(data, status=200):
+    """Render like DRF's ``Response`` so async variants return the same bytes as the sync views."""
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+async def authenticate(request):
+    """Attach the JWT user to ``request``, or ``AnonymousUser`` when no token was sent."""
+    result = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+    if result is not None:
+        request.user, request.auth = result
+    else:
+        # Replaces the session middleware's lazy user, which would query synchronously.
+        request.user, request.auth = AnonymousUser(), None
+
+
+def async_api_view(permission=None, replica=False):
+    """Decorate an async view with JWT authentication, a permission check and DRF-style errors.
+
+    ``permission(user)`` returns whether the user may call the view; with
+    ``replica`` its reads go to ``DATABASE_REPLICAS`` unless the user is
+    pinned to the primary by a recent write.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return render({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+            try:
+                await authenticate(request)
+            except APIException as exc:
+                return render({'detail': exc.detail}, status=exc.status_code)
+            if permission is not None:
+                if not request.user.is_authenticated:
+                    return render({'detail': 'Authentication credentials were not provided.'}, status=401)
+                if not permission(request.user):
+                    return render({'detail': 'You do not have permission to perform this action.'}, status=403)
+            use_replica = replica and not await sync_to_async(pinned_to_primary)(request.user)
+            with replica_reads(enabled=use_replica):
+                return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
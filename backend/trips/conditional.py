@@ -0,0 +1,28 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .models import Trip
+
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def trip_token(pk):
+    """``(version, updated_at, user_id)`` for one trip from a primary-key lookup, or ``None`` if it doesn't exist."""
+    return Trip.objects.filter(pk=pk).order_by().values_list('version', 'updated_at', 'user_id').first()
+
+
+def not_modified(request, etag, last_modified=None):
+    """Return a 304 response when the request's validators still match, else ``None``."""
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(int(last_modified.timestamp()))
+    return response
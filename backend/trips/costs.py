@@ -0,0 +1,120 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, Exists, F, OuterRef, Q, Sum, Value, When
+
+from .cache import schedule_invalidation, trips_changed
+from .dashboard import schedule_delta
+from .fx import as_date, base_currency, convert, converted
+from .models import Trip, Expense
+
+
+def to_decimal(value):
+    return value if isinstance(value, Decimal) else Decimal(str(value or 0))
+
+
+def trip_currencies(trip_ids):
+    """``{trip_id: (currency, start_date)}``; system-wide totals convert trip costs at the start date."""
+    trips = Trip.objects.filter(pk__in=[pk for pk in trip_ids if pk is not None])
+    return {pk: (currency, start_date) for pk, currency, start_date in trips.values_list('pk', 'currency', 'start_date')}
+
+
+def in_base_currency(amounts):
+    """Sum ``{trip_id: amount}`` (in each trip's currency) in the base currency, as ``compute_dashboard_stats`` does."""
+    base = base_currency()
+    total = Decimal('0')
+    for trip_id, (currency, start_date) in trip_currencies(amounts).items():
+        total += convert(amounts[trip_id], currency, base, start_date) or 0
+    return total
+
+
+def apply_cost_deltas(deltas):
+    """Atomically add ``{trip_id: amount}`` (in each trip's currency) to each trip's ``actual_cost``."""
+    deltas = {trip_id: to_decimal(amount) for trip_id, amount in deltas.items() if trip_id is not None and amount}
+    if not deltas:
+        return
+    for trip_id, amount in deltas.items():
+        Trip.objects.filter(pk=trip_id).update(actual_cost=F('actual_cost') + amount)
+    total = in_base_currency(deltas)
+    if total:
+        schedule_delta({'system_stats.total_expenses': float(total)})
+
+
+def expense_totals(expenses, sign=1):
+    """``{trip_id: amount}`` for ``expenses`` (instances or value dicts), converted to each trip's currency."""
+    expenses = [
+        expense if isinstance(expense, dict) else
+        {'trip_id': expense.trip_id, 'amount': expense.amount, 'currency': expense.currency, 'date': expense.date}
+        for expense in expenses
+    ]
+    currencies = trip_currencies({expense['trip_id'] for expense in expenses})
+    deltas = defaultdict(Decimal)
+    for expense in expenses:
+        trip_currency = currencies.get(expense['trip_id'], (expense['currency'],))[0]
+        amount = convert(expense['amount'], expense['currency'], trip_currency, as_date(expense['date']))
+        deltas[expense['trip_id']] += sign * (amount or 0)
+    return deltas
+
+
+def find_cost_drift(trip_ids, lock=False):
+    """Return ``{trip_id: (stored, expected)}`` for trips whose actual_cost disagrees with their expenses."""
+    trips = Trip.objects.filter(pk__in=trip_ids)
+    if lock:
+        trips = trips.select_for_update()
+    stored = dict(trips.values_list('pk', 'actual_cost'))
+    expected = dict(
+        Expense.objects.filter(trip_id__in=list(stored))
+        .order_by()
+        .values('trip_id')
+        .annotate(total=Sum(converted(F('trip__currency'))))
+        .values_list('trip_id', 'total')
+    )
+    drift = {}
+    for pk, cost in stored.items():
+        total = expected.get(pk) or Decimal('0')
+        if cost != total:
+            drift[pk] = (cost, total)
+    return drift
+
+
+def recompute_trip_costs(trip_ids):
+    """Reset actual_cost from the expense table for ``trip_ids``, locking only those trips.
+
+    Returns the number of trips that were corrected.
+    """
+    with transaction.atomic():
+        drift = find_cost_drift(trip_ids, lock=True)
+        if drift:
+            Trip.objects.filter(pk__in=list(drift)).update(actual_cost=Case(
+                *[When(pk=pk, then=Value(expected)) for pk, (_, expected) in drift.items()],
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            ))
+    if drift:
+        trips_changed(drift)
+    correction = in_base_currency({pk: expected - stored for pk, (stored, expected) in drift.items()})
+    if correction:
+        schedule_delta({'system_stats.total_expenses': float(correction)})
+    return len(drift)
+
+
+def rates_changed(batch_size=1000):
+    """Bring trips whose money is converted up to date with newly loaded FX rates.
+
+    Trips holding expenses in another currency get their ``actual_cost``
+    recomputed; cached responses of every trip not in the base currency are
+    expired too, since their base-currency totals move. Returns the number of
+    trips that were corrected.
+    """
+    foreign = Expense.objects.filter(trip=OuterRef('pk')).exclude(currency=OuterRef('currency'))
+    affected = Trip.objects.annotate(has_foreign=Exists(foreign)).filter(
+        Q(has_foreign=True) | ~Q(currency=base_currency())
+    ).order_by('pk').values_list('pk', 'has_foreign')
+    affected = list(affected)
+    corrected = 0
+    for offset in range(0, len(affected), batch_size):
+        batch = affected[offset:offset + batch_size]
+        # Base-currency totals move with the rates: system-wide spending too.
+        schedule_invalidation([pk for pk, _ in batch], find_owners=True, scopes=['trips', 'expenses'])
+        corrected += recompute_trip_costs([pk for pk, has_foreign in batch if has_foreign])
+    return corrected
@@ -0,0 +1,155 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from core.db_router import replica_reads
+
+from .fx import base_currency, convert, converted
+from .models import Trip, DashboardSnapshot
+
+SNAPSHOT_PK = 1
+ACTIVE_STATUSES = ('upcoming', 'ongoing')
+ROLES = ('superadmin', 'admin', 'user')
+
+
+def compute_dashboard_stats():
+    """Admin dashboard counters computed live with grouped queries; money is in ``FX_BASE_CURRENCY``."""
+    User = get_user_model()
+    month_ago = timezone.now() - timedelta(days=30)
+
+    users = User.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_active=True)),
+        new_month=Count('id', filter=Q(created_at__gte=month_ago)),
+    )
+    users_by_role = dict.fromkeys(ROLES, 0)
+    for row in User.objects.order_by().values('role').annotate(count=Count('id')):
+        users_by_role[row['role']] = row['count']
+
+    base = base_currency()
+    trips = Trip.objects.aggregate(
+        total=Count('id'),
+        total_budget=Sum(converted(base, amount='budget', on='start_date')),
+        total_expenses=Sum(converted(base, amount='actual_cost', on='start_date')),
+        new_month=Count('id', filter=Q(created_at__gte=month_ago)),
+    )
+    trips_by_status = dict.fromkeys([value for value, _ in Trip.STATUS_CHOICES], 0)
+    for row in Trip.objects.order_by().values('status').annotate(count=Count('id')):
+        trips_by_status[row['status']] = row['count']
+
+    top_destinations = Trip.objects.order_by().values('destination').annotate(
+        count=Count('id')
+    ).order_by('-count')[:5]
+
+    return {
+        'system_stats': {
+            'total_users': users['total'],
+            'active_users': users['active'],
+            'total_trips': trips['total'],
+            'active_trips': sum(trips_by_status[value] for value in ACTIVE_STATUSES),
+            'total_budget': float(trips['total_budget'] or 0),
+            'total_expenses': float(trips['total_expenses'] or 0),
+            'new_users_month': users['new_month'],
+            'new_trips_month': trips['new_month'],
+        },
+        'users_by_role': users_by_role,
+        'trips_by_status': trips_by_status,
+        'top_destinations': list(top_destinations),
+    }
+
+
+def trip_dashboard_queries(trips):
+    """Independent queries behind the trips dashboard, keyed by payload field."""
+    from .serializers import TripListSerializer
+
+    return {
+        'total_trips': trips.count,
+        'upcoming_trips': lambda: trips.filter(status='upcoming').count(),
+        'ongoing_trips': lambda: trips.filter(status='ongoing').count(),
+        'completed_trips': lambda: trips.filter(status='completed').count(),
+        'recent_trips': lambda: TripListSerializer(trips.for_list()[:5], many=True).data,
+    }
+
+
+def refresh_snapshot():
+    # Deltas are added to the stored snapshot from here on, so it must start from the primary's rows.
+    with replica_reads(enabled=False):
+        snapshot, _ = DashboardSnapshot.objects.update_or_create(
+            pk=SNAPSHOT_PK,
+            defaults={'data': compute_dashboard_stats(), 'computed_at': timezone.now()},
+        )
+    return snapshot
+
+
+def get_dashboard_stats():
+    """Return ``(stats, meta)`` from the snapshot, recomputing it when missing or too old."""
+    max_age = timedelta(seconds=getattr(settings, 'DASHBOARD_SNAPSHOT_MAX_AGE', 3600))
+    snapshot = DashboardSnapshot.objects.filter(pk=SNAPSHOT_PK).first()
+    source = 'snapshot'
+    if snapshot is None or timezone.now() - snapshot.computed_at > max_age:
+        snapshot = refresh_snapshot()
+        source = 'live'
+    meta = {
+        'source': source,
+        'computed_at': snapshot.computed_at,
+        'updated_at': snapshot.updated_at,
+        'age_seconds': int((timezone.now() - snapshot.computed_at).total_seconds()),
+    }
+    return snapshot.data, meta
+
+
+def apply_delta(delta):
+    """Add ``{'section.key': amount}`` increments to the stored snapshot, if there is one."""
+    delta = {key: amount for key, amount in delta.items() if amount}
+    if not delta:
+        return
+    with transaction.atomic():
+        snapshot = DashboardSnapshot.objects.select_for_update().filter(pk=SNAPSHOT_PK).first()
+        if snapshot is None:
+            return
+        for path, amount in delta.items():
+            section, key = path.split('.')
+            values = snapshot.data.setdefault(section, {})
+            values[key] = round(values.get(key, 0) + amount, 2)
+        snapshot.save(update_fields=['data', 'updated_at'])
+
+
+def schedule_delta(delta):
+    transaction.on_commit(lambda: apply_delta(delta))
+
+
+def trip_delta(state, sign):
+    def in_base(amount):
+        return float(convert(amount, state['currency'], base_currency(), state['start_date']) or 0)
+
+    delta = {
+        'system_stats.total_trips': sign,
+        f"trips_by_status.{state['status']}": sign,
+        'system_stats.total_budget': sign * in_base(state['budget']),
+        'system_stats.total_expenses': sign * in_base(state['actual_cost']),
+    }
+    if state['status'] in ACTIVE_STATUSES:
+        delta['system_stats.active_trips'] = sign
+    return delta
+
+
+def user_delta(state, sign):
+    delta = {
+        'system_stats.total_users': sign,
+        f"users_by_role.{state['role']}": sign,
+    }
+    if state['is_active']:
+        delta['system_stats.active_users'] = sign
+    return delta
+
+
+def merge_deltas(*deltas):
+    merged = {}
+    for delta in deltas:
+        for key, amount in delta.items():
+            merged[key] = merged.get(key, 0) + amount
+    return merged
@@ -0,0 +1,111 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .models import Trip, Activity, Expense
+
+COLUMNS = [
+    'record', 'trip_id', 'trip_title', 'destination', 'owner', 'trip_status', 'start_date', 'end_date',
+    'budget', 'actual_cost', 'activity_id', 'expense_id', 'name', 'category', 'date', 'amount', 'currency',
+    'completed',
+]
+CHUNK_SIZE = 500
+BUFFER_SIZE = 64 * 1024
+
+
+def scoped_trips(user):
+    """Trips ``user`` may export, with the same role scoping as the expense API."""
+    if user.role == 'admin' or user.role == 'superadmin':
+        return Trip.objects.all()
+    return Trip.objects.filter(user=user)
+
+
+def export_rows(trips, chunk_size=CHUNK_SIZE):
+    """Yield one flat row per trip, followed by one per activity and expense of that trip.
+
+    Trips are read with ``iterator()`` (a server-side cursor on PostgreSQL) and
+    children are prefetched per chunk, so memory stays bounded by ``chunk_size``.
+    """
+    trips = trips.select_related('user').prefetch_related(
+        Prefetch('activities', queryset=Activity.objects.order_by('date', 'pk')),
+        Prefetch('expenses', queryset=Expense.objects.order_by('date', 'pk')),
+    ).order_by('pk')
+    for trip in trips.iterator(chunk_size=chunk_size):
+        base = {
+            'trip_id': trip.pk,
+            'trip_title': trip.title,
+            'destination': trip.destination,
+            'owner': trip.user.username if trip.user else None,
+            'trip_status': trip.status,
+            'start_date': trip.start_date,
+            'end_date': trip.end_date,
+            'budget': trip.budget,
+            'actual_cost': trip.actual_cost,
+        }
+        yield {'record': 'trip', **base}
+        for activity in trip.activities.all():
+            yield {
+                'record': 'activity', **base,
+                'activity_id': activity.pk,
+                'name': activity.name,
+                'category': activity.category,
+                'date': activity.date,
+                'amount': activity.cost,
+                'completed': activity.completed,
+            }
+        for expense in trip.expenses.all():
+            yield {
+                'record': 'expense', **base,
+                'activity_id': expense.activity_id,
+                'expense_id': expense.pk,
+                'name': expense.description,
+                'category': expense.category,
+                'date': expense.date,
+                'amount': expense.amount,
+                'currency': expense.currency,
+            }
+
+
+class Echo:
+    """File-like object whose ``write`` hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.DictWriter(Echo(), fieldnames=COLUMNS)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps({column: row.get(column) for column in COLUMNS}, cls=DjangoJSONEncoder) + '\n'
+
+
+FORMATS = {
+    'csv': (csv_lines, 'text/csv'),
+    'jsonl': (jsonl_lines, 'application/x-ndjson'),
+}
+
+
+def buffered(lines, size=BUFFER_SIZE):
+    """Join lines into ~``size`` byte chunks so the response isn't written one row at a time."""
+    buffer, length = [], 0
+    for line in lines:
+        buffer.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def export_stream(trips, export_format='csv', chunk_size=CHUNK_SIZE):
+    encoder, _ = FORMATS[export_format]
+    return buffered(encoder(export_rows(trips, chunk_size)))
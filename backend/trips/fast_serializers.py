@@ -0,0 +1,242 @@
+import decimal
+from datetime import timezone as dt_timezone
+from operator import attrgetter
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.fields import ISO_8601
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+class Unsupported(Exception):
+    """The serializer has a field the fast path can't reproduce exactly."""
+
+
+def identity(value):
+    return value
+
+
+def decimal_formatter(field):
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if field.localize or not coerce_to_string or field.decimal_places is None:
+        return field.to_representation
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def format_decimal(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+    return format_decimal
+
+
+def datetime_formatter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None:
+        return identity
+    if output_format.lower() != ISO_8601:
+        return field.to_representation
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+
+    def format_datetime(value):
+        if isinstance(value, str):
+            return value
+        if field_timezone is not None and value.tzinfo is not None:
+            value = value.astimezone(field_timezone)
+        elif field_timezone is None and value.tzinfo is not None:
+            value = value.astimezone(dt_timezone.utc).replace(tzinfo=None)
+        else:
+            value = field.enforce_timezone(value)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return format_datetime
+
+
+def isoformat_formatter(field, setting):
+    output_format = getattr(field, 'format', setting)
+    if output_format is None:
+        return identity
+    if output_format.lower() != ISO_8601:
+        return field.to_representation
+    return lambda value: value if isinstance(value, str) else value.isoformat()
+
+
+def file_formatter(field, model_field, context):
+    if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+        return lambda value: value or None
+    storage = model_field.storage
+    request = context.get('request')
+
+    def format_file(value):
+        if not value:
+            return None
+        url = storage.url(value)
+        return request.build_absolute_uri(url) if request is not None else url
+    return format_file
+
+
+def formatter_for(field, model_field, context):
+    """Equivalent of ``field.to_representation`` for the raw column value from ``.values()``."""
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        if field.pk_field is not None:
+            raise Unsupported(field.field_name)
+        return identity
+    if isinstance(field, serializers.RelatedField):
+        raise Unsupported(field.field_name)
+    if isinstance(field, serializers.FileField):
+        return file_formatter(field, model_field, context)
+    if isinstance(field, serializers.DecimalField):
+        return decimal_formatter(field)
+    if isinstance(field, serializers.DateTimeField):
+        return datetime_formatter(field)
+    if isinstance(field, serializers.DateField):
+        return isoformat_formatter(field, api_settings.DATE_FORMAT)
+    if isinstance(field, serializers.TimeField):
+        return isoformat_formatter(field, api_settings.TIME_FORMAT)
+    if isinstance(field, serializers.ChoiceField):
+        return lambda value: field.choice_strings_to_values.get(str(value), value) if value != '' else value
+    if type(field) in (serializers.CharField, serializers.EmailField, serializers.URLField, serializers.SlugField):
+        return str
+    if type(field) is serializers.IntegerField:
+        return int
+    return field.to_representation
+
+
+class FastSerializer:
+    """Read-only renderer for a ``ModelSerializer`` that works from ``values_list()`` rows.
+
+    Field mapping is compiled once per request from the serializer's own
+    fields, so the output is identical to ``serializer_class(many=True).data``:
+    model columns are formatted exactly like the DRF field would,
+    ``SerializerMethodField``s read a queryset annotation of the same name,
+    ``ReadOnlyField`` properties are evaluated against the row, forward
+    nested serializers are joined in the same query and reverse
+    ``many=True`` serializers are loaded with one query per page. Raises
+    ``Unsupported`` for anything else, so callers can fall back.
+    """
+
+    def __init__(self, serializer_class, context=None, prefix='', annotations=()):
+        self.context = context or {}
+        self.model = serializer_class.Meta.model
+        self.prefix = prefix
+        self.columns = []
+        self.getters = []
+        self.nested = []
+        self.pk_column = self.column(self.model._meta.pk.attname)
+        self.compile(serializer_class(context=self.context).fields, set(annotations))
+
+    def column(self, name):
+        name = self.prefix + name
+        if name not in self.columns:
+            self.columns.append(name)
+        return name
+
+    def compile(self, fields, annotations):
+        for name, field in fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.ListSerializer):
+                self.nested.append((name, self.compile_reverse(field)))
+                self.getters.append((name, lambda row: None))
+            elif isinstance(field, serializers.BaseSerializer):
+                child = FastSerializer(type(field), self.context, f'{self.prefix}{field.source}__')
+                self.columns.extend(column for column in child.columns if column not in self.columns)
+                self.getters.append((name, child.to_representation))
+            elif isinstance(field, serializers.SerializerMethodField):
+                if self.prefix or name not in annotations:
+                    raise Unsupported(name)
+                self.getters.append((name, attrgetter(self.column(name))))
+            else:
+                self.getters.append((name, self.compile_field(name, field)))
+
+    def compile_field(self, name, field):
+        source = field.source
+        if '.' in source or source == '*':
+            raise Unsupported(name)
+        try:
+            model_field = self.model._meta.get_field(source)
+        except FieldDoesNotExist:
+            prop = getattr(self.model, source, None)
+            if self.prefix or not isinstance(prop, property) or type(field) is not serializers.ReadOnlyField:
+                raise Unsupported(name)
+            # Rows carry every concrete column under its attribute name, so the property can run on the row.
+            for model_field in self.model._meta.concrete_fields:
+                self.column(model_field.attname)
+            return prop.fget
+        if not model_field.concrete or model_field.many_to_many:
+            raise Unsupported(name)
+        get = attrgetter(self.column(model_field.name))
+        formatter = formatter_for(field, model_field, self.context)
+
+        def getter(row):
+            value = get(row)
+            return None if value is None else formatter(value)
+        return getter
+
+    def compile_reverse(self, field):
+        try:
+            relation = self.model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            raise Unsupported(field.source)
+        if self.prefix or not relation.one_to_many:
+            raise Unsupported(field.source)
+        child = FastSerializer(type(field.child), self.context)
+        return child, relation.field.name, child.column(relation.field.attname)
+
+    def prepare(self, queryset, ordering=()):
+        """``values_list()`` over ``queryset`` with every column the getters and ``ordering`` need."""
+        columns = list(self.columns)
+        for term in ordering:
+            name = term.lstrip('-')
+            if name == 'pk':
+                name = self.model._meta.pk.attname
+            if name not in columns:
+                columns.append(name)
+        return queryset.prefetch_related(None).values_list(*columns, named=True)
+
+    def to_representation(self, row):
+        if self.prefix and getattr(row, self.pk_column) is None:
+            return None
+        return {name: getter(row) for name, getter in self.getters}
+
+    def serialize(self, rows):
+        rows = list(rows)
+        results = [self.to_representation(row) for row in rows]
+        for name, (child, link_name, link) in self.nested:
+            children = {}
+            ids = [getattr(row, self.pk_column) for row in rows]
+            if ids:
+                queryset = child.model._default_manager.filter(**{f'{link_name}__in': ids})
+                for child_row in child.prepare(queryset, child.model._meta.ordering):
+                    children.setdefault(getattr(child_row, link), []).append(child.to_representation(child_row))
+            for row, data in zip(rows, results):
+                data[name] = children.get(getattr(row, self.pk_column), [])
+        return results
+
+
+class FastListMixin:
+    """Serve ``list`` through ``FastSerializer`` when the list serializer supports it."""
+    fast_list = True
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_list:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            fast = FastSerializer(self.get_serializer_class(), self.get_serializer_context(),
+                                  annotations=queryset.query.annotations)
+        except Unsupported:
+            return super().list(request, *args, **kwargs)
+
+        ordering = [term for term in queryset.query.order_by if isinstance(term, str)]
+        rows = fast.prepare(queryset, ordering or self.get_queryset().model._meta.ordering)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(fast.serialize(page))
+        return Response(fast.serialize(rows))
@@ -0,0 +1,184 @@
+import bisect
+import csv
+import threading
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Round
+
+from .models import FxRate
+
+CENTS = Decimal('0.01')
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+# Bumped in the response cache whenever rates are loaded, so every process drops its memo.
+VERSION_KEY = 'fx:rates:version'
+
+_rates = {}
+_rates_lock = threading.Lock()
+
+
+def base_currency():
+    return settings.FX_BASE_CURRENCY
+
+
+def as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def clear_rate_cache():
+    with _rates_lock:
+        _rates.clear()
+
+
+def current_version():
+    cache = caches[settings.RESPONSE_CACHE_ALIAS]
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 0, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    cache = caches[settings.RESPONSE_CACHE_ALIAS]
+    cache.add(VERSION_KEY, 0, timeout=None)
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        # Evicted between add() and incr(); any new value makes readers reload.
+        cache.set(VERSION_KEY, 1, timeout=None)
+        return 1
+
+
+def rate_history(currency):
+    """``(dates, rates)`` for ``currency``, loaded once per process.
+
+    The memo is reloaded when ``load_rates`` (in any process) has moved the
+    shared version, and at least every ``FX_RATE_CACHE_SECONDS``.
+    """
+    version = current_version()
+    with _rates_lock:
+        entry = _rates.get(currency)
+    if entry is not None and entry[0] > time.monotonic() and entry[1] == version:
+        return entry[2]
+    rows = list(FxRate.objects.filter(currency=currency).order_by('date').values_list('date', 'rate'))
+    history = ([day for day, _ in rows], [rate for _, rate in rows])
+    with _rates_lock:
+        _rates[currency] = (time.monotonic() + settings.FX_RATE_CACHE_SECONDS, version, history)
+    return history
+
+
+def rate_on(currency, on):
+    """Units of ``currency`` per unit of the pivot on ``on``: the latest rate dated on or before it."""
+    dates, rates = rate_history(currency)
+    index = bisect.bisect_right(dates, as_date(on))
+    return rates[index - 1] if index else None
+
+
+def convert(amount, source, target, on):
+    """``amount`` of ``source`` in ``target`` at the rates of ``on``.
+
+    Without a rate for either currency the amount is counted at face value,
+    as it was before conversion existed, rather than dropped from totals.
+    """
+    amount = amount if isinstance(amount, Decimal) else Decimal(str(amount or 0))
+    if source == target or not amount:
+        return amount
+    source_rate, target_rate = rate_on(source, on), rate_on(target, on)
+    if source_rate is None or target_rate is None:
+        return amount
+    return (amount * target_rate / source_rate).quantize(CENTS)
+
+
+def rate_subquery(currency, on):
+    return Subquery(
+        FxRate.objects.filter(currency=currency, date__lte=on).order_by('-date').values('rate')[:1],
+        output_field=DecimalField(max_digits=18, decimal_places=8),
+    )
+
+
+def converted(target, amount='amount', currency='currency', on='date'):
+    """Expression for ``amount`` converted into ``target`` at the rates of ``on``, for use inside aggregates.
+
+    ``target`` is a currency code or an ``F()`` naming a currency column
+    (e.g. ``F('trip__currency')``). Each rate is looked up through the
+    ``(currency, date)`` unique index; rows without a rate keep their
+    face value, matching ``convert``.
+    """
+    if isinstance(target, F):
+        target_rate = rate_subquery(OuterRef(target.name), OuterRef(on))
+    else:
+        target_rate = rate_subquery(target, OuterRef(on))
+    source_rate = rate_subquery(OuterRef(currency), OuterRef(on))
+    return Case(
+        When(**{currency: target if isinstance(target, F) else Value(target)}, then=F(amount)),
+        default=Coalesce(
+            Round(ExpressionWrapper(F(amount) * target_rate / source_rate, output_field=MONEY), 2),
+            F(amount), output_field=MONEY,
+        ),
+        output_field=MONEY,
+    )
+
+
+def read_rates(lines, pivot):
+    """Yield ``(currency, date, rate)`` from a rates CSV, plus a rate of 1 for ``pivot`` on every date.
+
+    Accepts long files with ``date,currency,rate`` columns and wide files
+    with a ``Date`` column followed by one column per currency (the ECB
+    reference rate layout). Blank and ``N/A`` cells are skipped.
+    """
+    reader = csv.reader(lines)
+    header = [name.strip().lower() for name in next(reader, [])]
+    long_format = {'date', 'currency', 'rate'} <= set(header)
+    for row in reader:
+        if not row or not row[0].strip():
+            continue
+        if long_format:
+            values = dict(zip(header, row))
+            day = values['date']
+            cells = [(values['currency'], values['rate'])]
+        else:
+            day = row[0]
+            cells = zip(header[1:], row[1:])
+        day = as_date(day.strip())
+        yield pivot, day, Decimal(1)
+        for currency, rate in cells:
+            currency, rate = currency.strip().upper(), rate.strip()
+            if not currency or not rate or rate.upper() == 'N/A':
+                continue
+            try:
+                yield currency, day, Decimal(rate)
+            except InvalidOperation:
+                raise ValueError(f'Invalid rate {rate!r} for {currency} on {day}')
+
+
+def load_rates(rates, batch_size=1000):
+    """Insert or update ``(currency, date, rate)`` rows; returns how many were written."""
+    written = 0
+    batch = {}
+    with transaction.atomic():
+        for currency, day, rate in rates:
+            batch[currency, day] = rate
+            if len(batch) >= batch_size:
+                written += save_rates(batch)
+                batch = {}
+        written += save_rates(batch)
+    clear_rate_cache()
+    transaction.on_commit(bump_version)
+    if written:
+        from .costs import rates_changed
+        rates_changed()
+    return written
+
+
+def save_rates(batch):
+    FxRate.objects.bulk_create(
+        [FxRate(currency=currency, date=day, rate=rate) for (currency, day), rate in batch.items()],
+        update_conflicts=True, unique_fields=['currency', 'date'], update_fields=['rate'],
+    )
+    return len(batch)
@@ -0,0 +1,170 @@
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .cache import trips_changed
+from .models import Trip
+
+logger = logging.getLogger(__name__)
+
+VARIANT_DIR = 'trip_images/variants'
+ORIENTATION = 0x0112
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_VARIANT_WORKERS, thread_name_prefix='image')
+    return _executor
+
+
+def needs_variants(trip):
+    return bool(trip.image) and trip.image_variants.get('source') != trip.image.name
+
+
+def content_name(data, suffix):
+    return f'{VARIANT_DIR}/{hashlib.sha256(data).hexdigest()[:20]}{suffix}'
+
+
+def save_once(storage, name, data):
+    # Content-hashed names: an existing file already holds these bytes.
+    if not storage.exists(name):
+        storage.save(name, ContentFile(data))
+    return name
+
+
+def encode(image, **options):
+    buffer = BytesIO()
+    image.save(buffer, **options)
+    return buffer.getvalue()
+
+
+def exif_free_data(original, image):
+    """``original`` re-encoded without its metadata, or ``None`` if it had none.
+
+    ``image`` is ``original`` with its EXIF orientation applied.
+    """
+    if not original.info.get('exif') and not original.getexif():
+        return None
+    icc_profile = original.info.get('icc_profile')
+    if original.format == 'JPEG' and image.size == original.size and original.getexif().get(ORIENTATION, 1) == 1:
+        # Same pixels: reuse the original quantization tables rather than recompressing.
+        return encode(original, format='JPEG', quality='keep', subsampling='keep', icc_profile=icc_profile)
+    if original.format == 'JPEG':
+        return encode(image.convert('RGB'), format='JPEG', quality=95, icc_profile=icc_profile)
+    return encode(image, format=original.format or 'PNG', icc_profile=icc_profile)
+
+
+def strip_exif(field, original, image):
+    """Re-save the stored original without its metadata, returning the new name (or ``None`` if it had none)."""
+    data = exif_free_data(original, image)
+    if data is None:
+        return None
+    suffix = '.' + field.name.rsplit('.', 1)[-1].lower() if '.' in field.name else ''
+    return save_once(field.storage, content_name(data, suffix), data)
+
+
+def strip_upload(field):
+    """Swap a not-yet-stored upload for a copy without EXIF (GPS included) before it is written.
+
+    Runs on save, so the original served until the variants exist never
+    carries metadata. Files Pillow can't read are left alone.
+    """
+    if not field or field._committed:
+        return
+    upload = field.file
+    try:
+        upload.seek(0)
+        original = Image.open(upload)
+        original.load()
+    except (OSError, Image.DecompressionBombError):
+        upload.seek(0)
+        return
+    data = exif_free_data(original, ImageOps.exif_transpose(original))
+    if data is None:
+        upload.seek(0)
+        return
+    field.file = ContentFile(data, name=field.name)
+
+
+def render_variants(field):
+    """``(stripped original name or None, {width: name})`` for the image stored in ``field``."""
+    with field.storage.open(field.name, 'rb') as source:
+        original = Image.open(source)
+        original.load()
+    image = ImageOps.exif_transpose(original)
+    stripped = strip_exif(field, original, image)
+    icc_profile = original.info.get('icc_profile')
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    widths = sorted({min(width, image.width) for width in settings.IMAGE_VARIANT_WIDTHS})
+    variants = {}
+    for width in widths:
+        resized = image if width == image.width else image.resize(
+            (width, max(1, round(image.height * width / image.width))), Image.LANCZOS,
+        )
+        # No exif= argument, so the variants carry no metadata beyond the colour profile.
+        data = encode(resized, format='WEBP', quality=settings.IMAGE_VARIANT_QUALITY, method=4,
+                      icc_profile=icc_profile)
+        variants[str(width)] = save_once(field.storage, content_name(data, f'-{width}w.webp'), data)
+    return stripped, variants
+
+
+def generate_variants(trip_id):
+    """Build the WebP variants of a trip's image and record them, unless the image changed meanwhile.
+
+    Returns whether the trip was updated.
+    """
+    trip = Trip.objects.filter(pk=trip_id).only('pk', 'image', 'image_variants').first()
+    if trip is None or not needs_variants(trip):
+        return False
+    source = trip.image.name
+    stripped, variants = render_variants(trip.image)
+    image = stripped or source
+    updated = Trip.objects.filter(pk=trip_id, image=source).update(
+        image=image, image_variants={'source': image, 'widths': variants},
+    )
+    if not updated:
+        return False
+    # Variant files are content-addressed and may be shared, so only the EXIF-bearing upload is removed.
+    if stripped and not Trip.objects.filter(image=source).exists():
+        trip.image.storage.delete(source)
+    trips_changed([trip_id])
+    return True
+
+
+def run_generate_variants(trip_id):
+    close_old_connections()
+    try:
+        generate_variants(trip_id)
+    except Exception:
+        logger.exception('Generating image variants for trip %s failed', trip_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(trip_id):
+    """Generate variants after the current transaction commits, on the image worker pool.
+
+    With ``IMAGE_VARIANT_WORKERS = 0`` they are generated inline instead.
+    Trips whose work is lost (e.g. a restart) are picked up by
+    ``manage.py generate_image_variants``.
+    """
+    def submit():
+        if settings.IMAGE_VARIANT_WORKERS:
+            get_executor().submit(run_generate_variants, trip_id)
+        else:
+            generate_variants(trip_id)
+    transaction.on_commit(submit)
@@ -0,0 +1,386 @@
+import csv
+import hashlib
+import io
+import json
+import logging
+from datetime import timedelta
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .bulk import bulk_serializer_class
+from .cache import trips_changed
+from .export import scoped_trips
+from .models import Activity, Expense, ImportJob
+from .serializers import ActivitySerializer, ExpenseSerializer
+
+CHUNK_SIZE = 500
+MAX_ERRORS = 100
+READ_SIZE = 64 * 1024
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {'.csv': 'csv', '.json': 'json', '.jsonl': 'json', '.ndjson': 'json', '.ics': 'ical', '.ical': 'ical'}
+
+ACTIVITY_FIELDS = ['trip', 'name', 'description', 'category', 'date', 'time', 'location', 'cost',
+                   'completed', 'notes', 'booking_reference']
+EXPENSE_FIELDS = ['trip', 'activity', 'description', 'amount', 'category', 'date', 'currency',
+                  'notes', 'booking_reference']
+# Alternative column names, so files written by the trip export can be re-imported.
+ALIASES = {
+    'activity': {'amount': 'cost'},
+    'expense': {'name': 'description'},
+}
+
+
+class ImportFormatError(Exception):
+    pass
+
+
+# Parsers: each takes a binary file object and yields one dict per source row.
+
+def parse_csv(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.DictReader(text)
+    except (csv.Error, UnicodeDecodeError) as exc:
+        raise ImportFormatError(f'Invalid CSV: {exc}')
+
+
+def parse_json(stream):
+    """A top-level JSON array of objects, or JSON Lines (one object per line)."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig')
+    try:
+        first = text.read(1)
+        while first.isspace():
+            first = text.read(1)
+        if first == '[':
+            yield from json_array_items(text)
+        elif first:
+            yield json.loads(first + text.readline())
+            for line in text:
+                if line.strip():
+                    yield json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError) as exc:
+        raise ImportFormatError(f'Invalid JSON: {exc}')
+
+
+def json_array_items(text):
+    """Decode the items of a JSON array incrementally, reading the file in blocks."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,')
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            more = text.read(READ_SIZE)
+            if not more:
+                raise ImportFormatError('Invalid JSON: unterminated array')
+            buffer += more
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def unfold(lines):
+    """Join RFC 5545 folded lines (continuations start with a space or tab)."""
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def ical_text(value):
+    return (value.replace('\\n', '\n').replace('\\N', '\n').replace('\\,', ',')
+            .replace('\\;', ';').replace('\\\\', '\\'))
+
+
+def ical_event(properties):
+    row = {'type': 'activity'}
+    if 'SUMMARY' in properties:
+        row['name'] = ical_text(properties['SUMMARY'])
+    for key, field in (('LOCATION', 'location'), ('DESCRIPTION', 'description')):
+        if key in properties:
+            row[field] = ical_text(properties[key])
+    start = properties.get('DTSTART', '')
+    if len(start) >= 8:
+        row['date'] = f'{start[:4]}-{start[4:6]}-{start[6:8]}'
+        if start[8:9] == 'T' and len(start) >= 15:
+            row['time'] = f'{start[9:11]}:{start[11:13]}:{start[13:15]}'
+    uid = properties.get('UID')
+    if uid:
+        row['booking_reference'] = uid if len(uid) <= 100 else hashlib.sha1(uid.encode()).hexdigest()
+    return row
+
+
+def parse_ical(stream):
+    """One activity per VEVENT. Times are taken as written; TZID conversion is not applied."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    event = None
+    try:
+        for line in unfold(text):
+            name, _, value = line.partition(':')
+            name = name.split(';', 1)[0].upper()
+            if name == 'BEGIN' and value.upper() == 'VEVENT':
+                event = {}
+            elif name == 'END' and value.upper() == 'VEVENT' and event is not None:
+                yield ical_event(event)
+                event = None
+            elif event is not None:
+                event.setdefault(name, value)
+    except UnicodeDecodeError as exc:
+        raise ImportFormatError(f'Invalid iCalendar file: {exc}')
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'json': parse_json,
+    'ical': parse_ical,
+}
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def normalize(row):
+    """``(kind, data)`` for a parsed row, with blank values dropped and aliases applied."""
+    if not isinstance(row, dict):
+        raise ValueError('Expected an object')
+    row = {str(key).strip().lower(): value for key, value in row.items() if key is not None}
+    row = {key: value.strip() if isinstance(value, str) else value for key, value in row.items()}
+    row = {key: value for key, value in row.items() if value not in ('', None)}
+    kind = str(row.pop('type', row.pop('record', 'activity'))).lower()
+    if kind not in ('activity', 'expense', 'trip'):
+        raise ValueError(f'Unknown row type {kind!r}')
+    for alias, field in ALIASES.get(kind, {}).items():
+        if alias in row and field not in row:
+            row[field] = row.pop(alias)
+    if 'trip_title' in row and 'trip' not in row:
+        row['trip'] = row.pop('trip_title')
+    return kind, row
+
+
+def trip_reference(data, default=None):
+    """``('id', pk)`` or ``('title', title)`` for the trip a row points at.
+
+    Ids come from a ``trip_id`` column (or a JSON number in ``trip``); any
+    other ``trip`` value is a title, even when it is all digits.
+    """
+    if 'trip_id' in data:
+        try:
+            return 'id', int(data['trip_id'])
+        except (TypeError, ValueError):
+            raise ValueError('trip_id must be an integer.')
+    ref = data.get('trip')
+    if isinstance(ref, int) and not isinstance(ref, bool):
+        return 'id', ref
+    if ref is not None:
+        return 'title', str(ref)
+    return ('id', default) if default else None
+
+
+def derived_reference(kind, row):
+    """Stable reference for rows without one, so re-running an import skips them."""
+    content = json.dumps({'kind': kind, **row}, sort_keys=True, default=str)
+    return 'import-' + hashlib.sha1(content.encode()).hexdigest()[:20]
+
+
+def resolve_trips(job, refs):
+    """Look up every ``trip_reference`` in ``refs`` in one query; ambiguous titles map to ``None``."""
+    ids = {value for kind, value in refs if kind == 'id'}
+    titles = {value for kind, value in refs if kind == 'title'}
+    if not ids and not titles:
+        return {}
+    by_ref, duplicate_titles = {}, set()
+    for trip in scoped_trips(job.user).filter(Q(pk__in=ids) | Q(title__in=titles)):
+        if trip.pk in ids:
+            by_ref['id', trip.pk] = trip
+        if trip.title in titles:
+            if ('title', trip.title) in by_ref:
+                duplicate_titles.add(trip.title)
+            by_ref['title', trip.title] = trip
+    for title in duplicate_titles:
+        by_ref['title', title] = None
+    return by_ref
+
+
+class ChunkWriter:
+    """Validates one chunk of parsed rows and writes the new ones with ``bulk_create``."""
+
+    def __init__(self, job):
+        self.job = job
+        self.skipped = 0
+        self.errors = []
+
+    def error(self, number, errors):
+        self.errors.append({'row': number, 'errors': errors})
+
+    def write(self, chunk):
+        rows = []
+        for number, row in chunk:
+            try:
+                kind, data = normalize(row)
+            except ValueError as exc:
+                self.error(number, {'non_field_errors': [str(exc)]})
+                continue
+            if kind == 'trip':
+                self.skipped += 1
+                continue
+            rows.append((number, kind, data))
+
+        refs = {}
+        for number, kind, data in rows:
+            try:
+                refs[number] = trip_reference(data, self.job.trip_id)
+            except ValueError as exc:
+                self.error(number, {'trip_id': [str(exc)]})
+        trips = resolve_trips(self.job, {ref for ref in refs.values() if ref is not None})
+        for number, kind, data in rows:
+            data.pop('trip_id', None)
+            trip = trips.get(refs.get(number))
+            if trip is None:
+                data['trip'] = None
+                if number in refs:
+                    message = 'Ambiguous trip title.' if refs[number] in trips else 'Unknown trip.'
+                    self.error(number, {'trip': [message]})
+                continue
+            data['trip'] = trip.pk
+            data.setdefault('booking_reference', derived_reference(kind, data))
+
+        trip_objects = {trip.pk: trip for trip in trips.values() if trip is not None}
+        valid = [row for row in rows if row[2]['trip'] is not None]
+        activities = self.create(Activity, ActivitySerializer, ACTIVITY_FIELDS, trip_objects,
+                                 [row for row in valid if row[1] == 'activity'])
+        expenses = self.create(Expense, ExpenseSerializer, EXPENSE_FIELDS, trip_objects,
+                               [row for row in valid if row[1] == 'expense'])
+        if activities:
+            # Expense.objects.bulk_create() already records its own trips.
+            trips_changed({activity.trip_id for activity in activities}, model=Activity)
+        return len(activities) + len(expenses)
+
+    def existing_references(self, model, rows):
+        return set(
+            model.objects.filter(
+                trip_id__in={data['trip'] for _, _, data in rows},
+                booking_reference__in={data['booking_reference'] for _, _, data in rows},
+            ).values_list('trip_id', 'booking_reference')
+        )
+
+    def activity_references(self, rows):
+        """Map ``(trip, booking_reference)`` to the activity an expense row points at."""
+        refs = {str(data['activity']) for _, _, data in rows if data.get('activity') is not None}
+        if not refs:
+            return {}
+        activities = Activity.objects.filter(
+            trip_id__in={data['trip'] for _, _, data in rows}, booking_reference__in=refs,
+        )
+        return {(activity.trip_id, activity.booking_reference): activity for activity in activities}
+
+    def create(self, model, serializer_class, fields, trips, rows):
+        if not rows:
+            return []
+        seen = self.existing_references(model, rows)
+        related = {model.trip.field.related_model: trips}
+        activities = {}
+        if model is Expense:
+            activities = self.activity_references(rows)
+            related[Activity] = {activity.pk: activity for activity in activities.values()}
+        serializer_class = bulk_serializer_class(serializer_class)
+        context = {'related_objects': related}
+
+        objs = []
+        for number, _, data in rows:
+            key = (data['trip'], data['booking_reference'])
+            if key in seen:
+                self.skipped += 1
+                continue
+            if data.get('activity') is not None:
+                activity = activities.get((data['trip'], str(data['activity'])))
+                if activity is None:
+                    self.error(number, {'activity': ['No activity with this booking reference in the trip.']})
+                    continue
+                data['activity'] = activity.pk
+            serializer = serializer_class(data={field: data[field] for field in fields if field in data},
+                                          context=context)
+            if not serializer.is_valid():
+                self.error(number, serializer.errors)
+                continue
+            seen.add(key)
+            objs.append(model(**serializer.validated_data))
+        return model.objects.bulk_create(objs)
+
+
+def run_import(job, chunk_size=CHUNK_SIZE):
+    """Run ``job`` from its saved ``position`` to the end of the file.
+
+    Each chunk is written and the position advanced in one transaction, so an
+    interrupted job can be resumed; rows whose ``booking_reference`` already
+    exists on the trip are skipped, so re-running a file never duplicates.
+    Any error fails the job at the last committed chunk instead of leaving
+    it running for the worker to retry forever.
+    """
+    job.status = 'running'
+    job.save(update_fields=['status', 'updated_at'])
+    try:
+        with job.file.open('rb') as stream:
+            rows = islice(enumerate(PARSERS[job.format](stream), 1), job.position, None)
+            for chunk in chunked(rows, chunk_size):
+                writer = ChunkWriter(job)
+                with transaction.atomic():
+                    created = writer.write(chunk)
+                    job.position += len(chunk)
+                    job.created_count += created
+                    job.skipped_count += writer.skipped
+                    job.error_count += len(writer.errors)
+                    errors = sorted(writer.errors, key=lambda error: error['row'])
+                    job.errors = (job.errors + errors)[:MAX_ERRORS]
+                    job.save(update_fields=['position', 'created_count', 'skipped_count', 'error_count',
+                                            'errors', 'updated_at'])
+    except (ImportFormatError, OSError) as exc:
+        job.status = 'failed'
+        job.message = str(exc)
+    except Exception as exc:
+        logger.exception('Import job %s failed', job.pk)
+        # The failed chunk was rolled back; keep the counters it had committed.
+        job.refresh_from_db(fields=['position', 'created_count', 'skipped_count', 'error_count', 'errors'])
+        job.status = 'failed'
+        job.message = f'Import stopped at row {job.position + 1}: {exc}'
+    else:
+        job.status = 'completed'
+        job.message = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'message', 'finished_at', 'updated_at'])
+    return job
+
+
+def claim_job(stale_after=300):
+    """Take the oldest pending job, or a running one whose worker stopped heartbeating."""
+    stale = timezone.now() - timedelta(seconds=stale_after)
+    with transaction.atomic():
+        job = (
+            ImportJob.objects.select_for_update(skip_locked=True)
+            .filter(Q(status='pending') | Q(status='running', updated_at__lt=stale))
+            .order_by('created_at')
+            .first()
+        )
+        if job is not None:
+            job.status = 'running'
+            job.save(update_fields=['status', 'updated_at'])
+    return job
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from trips.models import Trip
+from trips.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily expense rollups from the expense table, one batch of trips at a time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0,
+                            help='Seconds to pause between batches to spread load.')
+        parser.add_argument('--start-after', type=int, default=0,
+                            help='Resume after this trip id (printed as progress).')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_pk = options['start_after']
+        scanned = written = 0
+        while True:
+            trip_ids = list(
+                Trip.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not trip_ids:
+                break
+            last_pk = trip_ids[-1]
+            scanned += len(trip_ids)
+            written += rebuild_rollups(trip_ids)
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Up to trip {last_pk}: {scanned} trips, {written} rollup rows')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Scanned {scanned} trips, wrote {written} rollup rows.'))
@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from trips.export import CHUNK_SIZE, FORMATS, export_stream, scoped_trips
+from trips.models import Trip
+
+
+class Command(BaseCommand):
+    help = 'Stream trips with their activities and expenses as CSV or JSON Lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='export_format', choices=list(FORMATS), default='csv')
+        parser.add_argument('--user', help='Export as this username, with their role scoping. Default: all trips.')
+        parser.add_argument('--trip', type=int, action='append', dest='trips', help='Limit to a trip id (repeatable).')
+        parser.add_argument('--output', help='File to write; defaults to stdout.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(username=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'User {options["user"]!r} does not exist')
+            trips = scoped_trips(user)
+        else:
+            trips = Trip.objects.all()
+        if options['trips']:
+            trips = trips.filter(pk__in=options['trips'])
+
+        stream = export_stream(trips, options['export_format'], options['chunk_size'])
+        if not options['output']:
+            for chunk in stream:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            for chunk in stream:
+                output.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from trips.images import generate_variants
+from trips.models import Trip
+
+
+class Command(BaseCommand):
+    help = 'Strip EXIF from trip images and generate their WebP variants, one batch of trips at a time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--sleep', type=float, default=0,
+                            help='Seconds to pause between batches to spread load.')
+        parser.add_argument('--start-after', type=int, default=0,
+                            help='Resume after this trip id (printed as progress).')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_pk = options['start_after']
+        scanned = generated = failed = 0
+        trips = Trip.objects.exclude(image='').exclude(image__isnull=True)
+        while True:
+            trip_ids = list(trips.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not trip_ids:
+                break
+            last_pk = trip_ids[-1]
+            scanned += len(trip_ids)
+            for trip_id in trip_ids:
+                try:
+                    generated += generate_variants(trip_id)
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f'Trip {trip_id}: {exc}')
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Up to trip {last_pk}: {scanned} trips, {generated} generated')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Scanned {scanned} trips with images, generated variants for {generated}, {failed} failed.'
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from trips.fx import load_rates, read_rates
+
+
+class Command(BaseCommand):
+    help = 'Load dated FX rates from a local CSV (date,currency,rate rows or the ECB wide layout).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--pivot', default='EUR',
+                            help='Currency the rates are quoted against (one unit of it buys `rate` units).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as lines:
+                written = load_rates(read_rates(lines, options['pivot'].upper()), options['batch_size'])
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f'Loaded {written} rates.'))
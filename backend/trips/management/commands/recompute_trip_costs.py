@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from trips.costs import find_cost_drift, recompute_trip_costs
+from trips.models import Trip
+
+
+class Command(BaseCommand):
+    help = 'Repair Trip.actual_cost drift against the expense table, one batch of trips at a time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0,
+                            help='Seconds to pause between batches to spread load.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drifted trips without writing.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_pk = 0
+        scanned = fixed = 0
+        while True:
+            trip_ids = list(
+                Trip.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not trip_ids:
+                break
+            last_pk = trip_ids[-1]
+            scanned += len(trip_ids)
+            if options['dry_run']:
+                drift = find_cost_drift(trip_ids)
+                for pk, (stored, expected) in drift.items():
+                    self.stdout.write(f'Trip {pk}: stored {stored}, expenses total {expected}')
+                fixed += len(drift)
+            else:
+                fixed += recompute_trip_costs(trip_ids)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        verb = 'would be corrected' if options['dry_run'] else 'corrected'
+        self.stdout.write(self.style.SUCCESS(f'Scanned {scanned} trips, {fixed} {verb}.'))
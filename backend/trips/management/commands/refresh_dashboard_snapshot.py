@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from trips.dashboard import refresh_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Recompute the admin dashboard snapshot from scratch.'
+
+    def handle(self, *args, **options):
+        snapshot = refresh_snapshot()
+        stats = snapshot.data['system_stats']
+        self.stdout.write(self.style.SUCCESS(
+            f"Dashboard snapshot refreshed: {stats['total_users']} users, {stats['total_trips']} trips"
+        ))
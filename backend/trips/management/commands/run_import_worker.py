@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from trips.imports import CHUNK_SIZE, claim_job, run_import
+
+
+class Command(BaseCommand):
+    help = 'Process queued trip imports; jobs left running by a dead worker are resumed from their last chunk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty.')
+        parser.add_argument('--sleep', type=float, default=2, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--stale-after', type=int, default=300,
+                            help='Seconds without progress before a running job is reclaimed.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_job(options['stale_after'])
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
+                continue
+            run_import(job, options['chunk_size'])
+            self.stdout.write(
+                f'Import {job.pk} {job.status}: {job.created_count} created, '
+                f'{job.skipped_count} skipped, {job.error_count} errors'
+            )
@@ -0,0 +1,84 @@
+from django.db import migrations
+
+# The statements are spelled out here rather than built by trips.search, so
+# later changes to the search documents don't rewrite this migration.
+POSTGRES_INSTALL = [
+    'ALTER TABLE "trips_trip" ADD COLUMN IF NOT EXISTS "search_vector" tsvector GENERATED ALWAYS AS (setweight(to_tsvector(\'english\', coalesce("title", \'\')), \'A\') || setweight(to_tsvector(\'english\', coalesce("destination", \'\')), \'A\') || setweight(to_tsvector(\'english\', coalesce("description", \'\')), \'B\')) STORED',
+    'CREATE INDEX IF NOT EXISTS "trips_trip_search_idx" ON "trips_trip" USING gin ("search_vector")',
+    'ALTER TABLE "trips_activity" ADD COLUMN IF NOT EXISTS "search_vector" tsvector GENERATED ALWAYS AS (setweight(to_tsvector(\'english\', coalesce("name", \'\')), \'A\') || setweight(to_tsvector(\'english\', coalesce("location", \'\')), \'B\') || setweight(to_tsvector(\'english\', coalesce("notes", \'\')), \'C\')) STORED',
+    'CREATE INDEX IF NOT EXISTS "trips_activity_search_idx" ON "trips_activity" USING gin ("search_vector")',
+    'ALTER TABLE "trips_expense" ADD COLUMN IF NOT EXISTS "search_vector" tsvector GENERATED ALWAYS AS (setweight(to_tsvector(\'english\', coalesce("description", \'\')), \'A\')) STORED',
+    'CREATE INDEX IF NOT EXISTS "trips_expense_search_idx" ON "trips_expense" USING gin ("search_vector")',
+]
+POSTGRES_UNINSTALL = [
+    'DROP INDEX IF EXISTS "trips_trip_search_idx"',
+    'ALTER TABLE "trips_trip" DROP COLUMN IF EXISTS "search_vector"',
+    'DROP INDEX IF EXISTS "trips_activity_search_idx"',
+    'ALTER TABLE "trips_activity" DROP COLUMN IF EXISTS "search_vector"',
+    'DROP INDEX IF EXISTS "trips_expense_search_idx"',
+    'ALTER TABLE "trips_expense" DROP COLUMN IF EXISTS "search_vector"',
+]
+SQLITE_INSTALL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS trips_trip_fts USING fts5(title, destination, description, content='trips_trip', content_rowid='id', tokenize='porter unicode61')",
+    'CREATE TRIGGER IF NOT EXISTS trips_trip_fts_ai AFTER INSERT ON trips_trip BEGIN INSERT INTO trips_trip_fts(rowid, title, destination, description) VALUES (new.id, new.title, new.destination, new.description); END',
+    "CREATE TRIGGER IF NOT EXISTS trips_trip_fts_ad AFTER DELETE ON trips_trip BEGIN INSERT INTO trips_trip_fts(trips_trip_fts, rowid, title, destination, description) VALUES ('delete', old.id, old.title, old.destination, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS trips_trip_fts_au AFTER UPDATE ON trips_trip BEGIN INSERT INTO trips_trip_fts(trips_trip_fts, rowid, title, destination, description) VALUES ('delete', old.id, old.title, old.destination, old.description); INSERT INTO trips_trip_fts(rowid, title, destination, description) VALUES (new.id, new.title, new.destination, new.description); END",
+    "INSERT INTO trips_trip_fts(trips_trip_fts) VALUES ('rebuild')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS trips_activity_fts USING fts5(name, location, notes, content='trips_activity', content_rowid='id', tokenize='porter unicode61')",
+    'CREATE TRIGGER IF NOT EXISTS trips_activity_fts_ai AFTER INSERT ON trips_activity BEGIN INSERT INTO trips_activity_fts(rowid, name, location, notes) VALUES (new.id, new.name, new.location, new.notes); END',
+    "CREATE TRIGGER IF NOT EXISTS trips_activity_fts_ad AFTER DELETE ON trips_activity BEGIN INSERT INTO trips_activity_fts(trips_activity_fts, rowid, name, location, notes) VALUES ('delete', old.id, old.name, old.location, old.notes); END",
+    "CREATE TRIGGER IF NOT EXISTS trips_activity_fts_au AFTER UPDATE ON trips_activity BEGIN INSERT INTO trips_activity_fts(trips_activity_fts, rowid, name, location, notes) VALUES ('delete', old.id, old.name, old.location, old.notes); INSERT INTO trips_activity_fts(rowid, name, location, notes) VALUES (new.id, new.name, new.location, new.notes); END",
+    "INSERT INTO trips_activity_fts(trips_activity_fts) VALUES ('rebuild')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS trips_expense_fts USING fts5(description, content='trips_expense', content_rowid='id', tokenize='porter unicode61')",
+    'CREATE TRIGGER IF NOT EXISTS trips_expense_fts_ai AFTER INSERT ON trips_expense BEGIN INSERT INTO trips_expense_fts(rowid, description) VALUES (new.id, new.description); END',
+    "CREATE TRIGGER IF NOT EXISTS trips_expense_fts_ad AFTER DELETE ON trips_expense BEGIN INSERT INTO trips_expense_fts(trips_expense_fts, rowid, description) VALUES ('delete', old.id, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS trips_expense_fts_au AFTER UPDATE ON trips_expense BEGIN INSERT INTO trips_expense_fts(trips_expense_fts, rowid, description) VALUES ('delete', old.id, old.description); INSERT INTO trips_expense_fts(rowid, description) VALUES (new.id, new.description); END",
+    "INSERT INTO trips_expense_fts(trips_expense_fts) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS trips_trip_fts_ai',
+    'DROP TRIGGER IF EXISTS trips_trip_fts_ad',
+    'DROP TRIGGER IF EXISTS trips_trip_fts_au',
+    'DROP TABLE IF EXISTS trips_trip_fts',
+    'DROP TRIGGER IF EXISTS trips_activity_fts_ai',
+    'DROP TRIGGER IF EXISTS trips_activity_fts_ad',
+    'DROP TRIGGER IF EXISTS trips_activity_fts_au',
+    'DROP TABLE IF EXISTS trips_activity_fts',
+    'DROP TRIGGER IF EXISTS trips_expense_fts_ai',
+    'DROP TRIGGER IF EXISTS trips_expense_fts_ad',
+    'DROP TRIGGER IF EXISTS trips_expense_fts_au',
+    'DROP TABLE IF EXISTS trips_expense_fts',
+]
+STATEMENTS = {
+    'postgresql': (POSTGRES_INSTALL, POSTGRES_UNINSTALL),
+    'sqlite': (SQLITE_INSTALL, SQLITE_UNINSTALL),
+}
+
+
+def run(schema_editor, index):
+    statements = STATEMENTS.get(schema_editor.connection.vendor)
+    if statements is None:
+        return
+    for sql in statements[index]:
+        schema_editor.execute(sql)
+
+
+def install(apps, schema_editor):
+    run(schema_editor, 0)
+
+
+def uninstall(apps, schema_editor):
+    run(schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+    """Full-text search: a generated tsvector column with a GIN index on
+    PostgreSQL, or a trigger-maintained FTS5 table on SQLite."""
+
+    dependencies = [
+        ('trips', '0003_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
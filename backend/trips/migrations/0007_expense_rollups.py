@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('trips', '0006_import_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('accommodation', 'Accommodation'), ('food', 'Food & Drinks'), ('transport', 'Transport'), ('activities', 'Activities'), ('shopping', 'Shopping'), ('other', 'Other')], max_length=20)),
+                ('currency', models.CharField(max_length=3)),
+                ('day', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('trip', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='expense_rollups', to='trips.trip')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='expense_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'day'], name='expense_rollup_user_day_idx'), models.Index(fields=['day'], name='expense_rollup_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='expenserollup',
+            constraint=models.UniqueConstraint(fields=('trip', 'category', 'currency', 'day'), name='expense_rollup_key'),
+        ),
+    ]
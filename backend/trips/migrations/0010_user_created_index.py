@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.db import migrations
+
+INDEX_NAME = 'user_created_idx'
+
+
+def create_index(apps, schema_editor):
+    # The user model's app ships without migrations, so its listing index is created here.
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {quote(INDEX_NAME)} ON {quote(User._meta.db_table)} '
+        f'({quote("created_at")}, {quote("id")})'
+    )
+
+
+def drop_index(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS {schema_editor.quote_name(INDEX_NAME)}')
+
+
+class Migration(migrations.Migration):
+    """Index behind the newest-first user listings (admin user management and dashboard)."""
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('trips', '0009_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
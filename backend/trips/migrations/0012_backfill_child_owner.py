@@ -0,0 +1,49 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 1000
+
+
+def backfill_owners(apps, schema_editor):
+    """Copy trip.user onto the child rows, one committed batch of trips at a time."""
+    db = schema_editor.connection.alias
+    Trip = apps.get_model('trips', 'Trip')
+    children = [apps.get_model('trips', name) for name in ('Activity', 'Expense', 'Checklist')]
+    owner = Subquery(Trip.objects.using(db).filter(pk=OuterRef('trip_id')).values('user_id')[:1])
+    last_pk = 0
+    while True:
+        trip_ids = list(
+            Trip.objects.using(db).filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE]
+        )
+        if not trip_ids:
+            break
+        last_pk = trip_ids[-1]
+        for model in children:
+            model.objects.using(db).filter(trip_id__in=trip_ids, owner__isnull=True).update(owner_id=owner)
+
+
+class Migration(migrations.Migration):
+    """Backfill the child tables' owner column, then index it (building the indexes once, after the writes)."""
+
+    # Each batch commits on its own, so a large backfill neither holds one long transaction nor restarts from zero.
+    atomic = False
+
+    dependencies = [
+        ('trips', '0011_child_owner'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_owners, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['owner', 'date', 'time'], name='activity_owner_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='checklist',
+            index=models.Index(fields=['owner', '-priority', 'completed', 'created_at'], name='checklist_owner_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['owner', '-date'], name='expense_owner_date_idx'),
+        ),
+    ]
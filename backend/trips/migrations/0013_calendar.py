@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:53
+
+from django.db import migrations, models
+
+INDEX_NAME = 'trip_dates_gist_idx'
+
+
+def order_dates(apps, schema_editor):
+    # daterange() raises for an end before the start, so swap those rows first.
+    Trip = apps.get_model('trips', 'Trip')
+    Trip.objects.filter(end_date__lt=models.F('start_date')).update(
+        start_date=models.F('end_date'), end_date=models.F('start_date'),
+    )
+
+
+def install(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{INDEX_NAME}" ON "trips_trip" '
+            "USING gist (daterange(\"start_date\", \"end_date\", '[]'))"
+        )
+
+
+def uninstall(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{INDEX_NAME}"')
+
+
+class Migration(migrations.Migration):
+    """Calendar: an optional activity end time, a (date, time) index for
+    windows across trips and, on PostgreSQL, a GiST index over each trip's
+    daterange for overlap queries."""
+
+    dependencies = [
+        ('trips', '0012_backfill_child_owner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='end_time',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['date', 'time'], name='activity_date_idx'),
+        ),
+        migrations.RunPython(order_dates, migrations.RunPython.noop),
+        migrations.RunPython(install, uninstall),
+    ]
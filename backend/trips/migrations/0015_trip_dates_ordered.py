@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0014_trip_dates_index'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='trip',
+            constraint=models.CheckConstraint(check=models.Q(('end_date__gte', models.F('start_date'))), name='trip_dates_ordered'),
+        ),
+    ]
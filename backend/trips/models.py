@@ -1,6 +1,210 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.core.validators import MinValueValidator
+from django.db.models import Count, F, OuterRef, Prefetch, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Now
+
+
+def child_aggregate(model, aggregate, output_field=None):
+    subquery = (
+        model.objects.filter(trip=OuterRef('pk'))
+        .order_by()
+        .values('trip')
+        .annotate(value=aggregate)
+        .values('value')
+    )
+    output_field = output_field or models.IntegerField()
+    return Coalesce(Subquery(subquery, output_field=output_field), 0, output_field=output_field)
+
+class TripQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        from .rollups import reassign_rollups
+
+        if 'user' not in kwargs and 'user_id' not in kwargs:
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            trip_ids = list(self.values_list('pk', flat=True))
+            rows = super().update(**kwargs)
+            sync_child_owners(trip_ids)
+            reassign_rollups(trip_ids)
+        return rows
+
+    def with_activity_counts(self):
+        return self.annotate(
+            activities_count=Count('activities', distinct=True),
+            completed_activities=Count('activities', filter=Q(activities__completed=True), distinct=True),
+        )
+
+    def for_list(self):
+        return self.select_related('user').with_activity_counts()
+
+    def with_statistics(self):
+        from .fx import converted
+
+        money = models.DecimalField(max_digits=12, decimal_places=2)
+        return self.annotate(
+            stat_total_activities=child_aggregate(Activity, Count('pk')),
+            stat_completed_activities=child_aggregate(Activity, Count('pk', filter=Q(completed=True))),
+            stat_total_expenses=child_aggregate(Expense, Sum(converted(F('trip__currency'))), money),
+            stat_checklist_total=child_aggregate(Checklist, Count('pk')),
+            stat_checklist_completed=child_aggregate(Checklist, Count('pk', filter=Q(completed=True))),
+        )
+
+    def touch(self):
+        """Bump ``version`` for trips whose activities, expenses or checklist changed."""
+        return self.update(version=F('version') + 1, updated_at=Now())
+
+    def for_detail(self):
+        return self.select_related('user').with_activity_counts().prefetch_related(
+            Prefetch('activities', queryset=Activity.objects.prefetch_related('expenses')),
+            'expenses',
+            'checklist_items',
+        )
+
+def set_owners(objs):
+    """Copy ``trip.user`` onto ``owner`` for ``objs``, with at most one query for trips that are not loaded."""
+    missing = []
+    for obj in objs:
+        field = obj._meta.get_field('trip')
+        if field.is_cached(obj) and field.get_cached_value(obj) is not None:
+            obj.owner_id = field.get_cached_value(obj).user_id
+        elif obj.trip_id is not None:
+            missing.append(obj)
+    if missing:
+        owners = dict(Trip.objects.filter(pk__in={obj.trip_id for obj in missing}).values_list('pk', 'user_id'))
+        for obj in missing:
+            obj.owner_id = owners.get(obj.trip_id)
+
+
+def sync_child_owners(trip_ids):
+    """Re-copy ``Trip.user`` onto the activities, expenses and checklist items of ``trip_ids``."""
+    owner = Subquery(Trip.objects.filter(pk=OuterRef('trip_id')).values('user_id')[:1])
+    for model in (Activity, Expense, Checklist):
+        model.objects.filter(trip_id__in=trip_ids).update(owner_id=owner)
+
+
+class OwnedQuerySet(models.QuerySet):
+    """Keeps the ``owner`` copy of ``trip.user`` set for bulk writes, which skip ``save()``."""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        set_owners(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if {'trip', 'trip_id'} & set(fields):
+            objs = list(objs)
+            set_owners(objs)
+            fields = [*fields, 'owner']
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs):
+        for name in ('trip', 'trip_id'):
+            if name in kwargs:
+                trip = kwargs[name]
+                kwargs['owner_id'] = (
+                    trip.user_id if isinstance(trip, Trip)
+                    else Trip.objects.filter(pk=trip).values_list('user_id', flat=True).first()
+                )
+        return super().update(**kwargs)
+
+
+class TripOwned(models.Model):
+    """A trip's child row carrying ``owner``, a copy of ``trip.user``, so per-user scoping skips the trip join."""
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True,
+                              editable=False, related_name='+', db_index=False)
+
+    objects = OwnedQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_trip_id = instance.__dict__.get('trip_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        trip_changed = self._state.adding or self.trip_id != getattr(self, '_loaded_trip_id', None)
+        if trip_changed or self.owner_id is None:
+            set_owners([self])
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'owner'}
+        super().save(*args, **kwargs)
+        self._loaded_trip_id = self.trip_id
+
+
+class ExpenseQuerySet(OwnedQuerySet):
+    """Keeps ``Trip.actual_cost`` and the expense rollups correct for bulk writes, which skip model signals."""
+    # Bulk writes here already bump the trips they touch (see trips_changed).
+    records_trip_changes = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from .cache import trips_changed
+        from .costs import apply_cost_deltas, expense_totals
+        from .rollups import apply_rollup_deltas, rollup_deltas
+
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            deltas = expense_totals(objs)
+            apply_cost_deltas(deltas)
+            apply_rollup_deltas(rollup_deltas(objs))
+            trips_changed(deltas, model=self.model)
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        from .costs import recompute_trip_costs
+        from .rollups import ROLLUP_FIELDS, rebuild_rollups
+
+        if not ROLLUP_FIELDS & set(fields):
+            return super().bulk_update(objs, fields, *args, **kwargs)
+        with transaction.atomic(using=self.db):
+            trip_ids = set(self.filter(pk__in=[obj.pk for obj in objs]).values_list('trip_id', flat=True))
+            rows = super().bulk_update(objs, fields, *args, **kwargs)
+            trip_ids |= {obj.trip_id for obj in objs}
+            if {'amount', 'trip', 'trip_id'} & set(fields):
+                recompute_trip_costs(trip_ids)
+            rebuild_rollups(trip_ids)
+        return rows
+
+    def update(self, **kwargs):
+        from .costs import recompute_trip_costs
+        from .rollups import ROLLUP_FIELDS, rebuild_rollups
+
+        if not ROLLUP_FIELDS & set(kwargs):
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            trip_ids = set(self.order_by().values_list('trip_id', flat=True).distinct())
+            rows = super().update(**kwargs)
+            new_trip = kwargs.get('trip_id', kwargs.get('trip'))
+            if new_trip is not None:
+                trip_ids.add(getattr(new_trip, 'pk', new_trip))
+            if {'amount', 'trip', 'trip_id'} & set(kwargs):
+                recompute_trip_costs(trip_ids)
+            rebuild_rollups(trip_ids)
+        return rows
+
+    def delete(self):
+        """Delete without the collector: expenses have no dependent rows, and its
+        per-row ``post_delete`` would adjust costs and rollups one row at a time."""
+        from .cache import trips_changed
+        from .costs import apply_cost_deltas, expense_totals
+        from .rollups import apply_rollup_deltas, rollup_deltas
+
+        if self.query.is_sliced:
+            raise TypeError("Cannot use 'limit' or 'offset' with delete().")
+        query = self._chain()
+        query.query.select_related = False
+        query.query.clear_ordering(force=True)
+        with transaction.atomic(using=self.db):
+            rows = list(query.values('trip_id', 'amount', 'currency', 'date', 'category'))
+            deleted = query._raw_delete(query.db) if rows else 0
+            apply_cost_deltas(expense_totals(rows, sign=-1))
+            apply_rollup_deltas(rollup_deltas(rows, sign=-1))
+            trips_changed({row['trip_id'] for row in rows}, model=self.model)
+        return deleted, {self.model._meta.label: deleted}
 
 class Trip(models.Model):
     STATUS_CHOICES = [
@@ -19,20 +223,52 @@ class Trip(models.Model):
     end_date = models.DateField()
     budget = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, validators=[MinValueValidator(0)])
     actual_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0, validators=[MinValueValidator(0)])
+    currency = models.CharField(max_length=3, default='USD')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='planning')
     image = models.ImageField(upload_to='trip_images/', null=True, blank=True)
+    # {'source': image name, 'widths': {width: WebP name}}, filled in by trips.images.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_public = models.BooleanField(default=False)
     travelers_count = models.IntegerField(default=1, validators=[MinValueValidator(1)])
     notes = models.TextField(blank=True)
+    version = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Only ever written by F() updates (trips.costs, touch(), trips.images):
+    # a full-row save from an instance loaded earlier would roll them back.
+    DERIVED_FIELDS = ('actual_cost', 'version', 'image_variants')
+
+    objects = TripQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='trip_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='trip_status_created_idx'),
+            models.Index(fields=['destination'], name='trip_destination_idx'),
+            models.Index(fields=['start_date'], name='trip_start_date_idx'),
+            models.Index(fields=['start_date', 'end_date'], name='trip_dates_idx'),
+            models.Index(fields=['user', 'status'], name='trip_user_status_idx'),
+            models.Index(fields=['user', '-created_at'], name='trip_user_created_idx'),
+            models.Index(fields=['start_date'], name='trip_active_start_idx',
+                         condition=Q(status__in=['upcoming', 'ongoing'])),
+        ]
+        constraints = [
+            models.CheckConstraint(check=Q(end_date__gte=F('start_date')), name='trip_dates_ordered'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not args and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DERIVED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def duration_days(self):
         return (self.end_date - self.start_date).days + 1
@@ -43,7 +279,7 @@ class Trip(models.Model):
             return self.budget - self.actual_cost
         return None
 
-class Activity(models.Model):
+class Activity(TripOwned):
     CATEGORY_CHOICES = [
         ('sightseeing', 'Sightseeing'),
         ('food', 'Food & Dining'),
@@ -56,12 +292,13 @@ class Activity(models.Model):
         ('other', 'Other'),
     ]
     
-    trip = models.ForeignKey(Trip, related_name='activities', on_delete=models.CASCADE)
+    trip = models.ForeignKey(Trip, related_name='activities', on_delete=models.CASCADE, db_index=False)
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default='other')
     date = models.DateField()
     time = models.TimeField(null=True, blank=True)
+    end_time = models.TimeField(null=True, blank=True)
     location = models.CharField(max_length=300, blank=True)
     cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, validators=[MinValueValidator(0)])
     completed = models.BooleanField(default=False)
@@ -73,11 +310,18 @@ class Activity(models.Model):
 
     class Meta:
         ordering = ['date', 'time']
+        indexes = [
+            models.Index(fields=['trip', 'date', 'time'], name='activity_trip_date_idx'),
+            models.Index(fields=['trip', 'completed'], name='activity_trip_completed_idx'),
+            models.Index(fields=['trip', 'booking_reference'], name='activity_trip_booking_idx'),
+            models.Index(fields=['owner', 'date', 'time'], name='activity_owner_date_idx'),
+            models.Index(fields=['date', 'time'], name='activity_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.trip.title}"
 
-class Expense(models.Model):
+class Expense(TripOwned):
     CATEGORY_CHOICES = [
         ('accommodation', 'Accommodation'),
         ('food', 'Food & Drinks'),
@@ -87,7 +331,7 @@ class Expense(models.Model):
         ('other', 'Other'),
     ]
     
-    trip = models.ForeignKey(Trip, related_name='expenses', on_delete=models.CASCADE)
+    trip = models.ForeignKey(Trip, related_name='expenses', on_delete=models.CASCADE, db_index=False)
     activity = models.ForeignKey(Activity, related_name='expenses', on_delete=models.SET_NULL, null=True, blank=True)
     description = models.CharField(max_length=200)
     amount = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
@@ -95,16 +339,26 @@ class Expense(models.Model):
     date = models.DateField()
     currency = models.CharField(max_length=3, default='USD')
     notes = models.TextField(blank=True)
+    booking_reference = models.CharField(max_length=100, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ExpenseQuerySet.as_manager()
+
     class Meta:
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['trip', 'category'], name='expense_trip_category_idx'),
+            models.Index(fields=['trip', '-date'], name='expense_trip_date_idx'),
+            models.Index(fields=['-date'], name='expense_date_idx'),
+            models.Index(fields=['trip', 'booking_reference'], name='expense_trip_booking_idx'),
+            models.Index(fields=['owner', '-date'], name='expense_owner_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.description} - ${self.amount}"
 
-class Checklist(models.Model):
-    trip = models.ForeignKey(Trip, related_name='checklist_items', on_delete=models.CASCADE)
+class Checklist(TripOwned):
+    trip = models.ForeignKey(Trip, related_name='checklist_items', on_delete=models.CASCADE, db_index=False)
     item = models.CharField(max_length=200)
     completed = models.BooleanField(default=False)
     category = models.CharField(max_length=50, default='general')
@@ -113,6 +367,94 @@ class Checklist(models.Model):
 
     class Meta:
         ordering = ['-priority', 'completed', 'created_at']
+        indexes = [
+            models.Index(fields=['trip', '-priority', 'completed', 'created_at'], name='checklist_trip_order_idx'),
+            models.Index(fields=['owner', '-priority', 'completed', 'created_at'], name='checklist_owner_order_idx'),
+        ]
 
     def __str__(self):
         return self.item
+
+class DashboardSnapshot(models.Model):
+    data = models.JSONField(default=dict)
+    computed_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Dashboard snapshot @ {self.computed_at:%Y-%m-%d %H:%M}"
+
+class ImportJob(models.Model):
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('json', 'JSON'),
+        ('ical', 'iCalendar'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='import_jobs')
+    trip = models.ForeignKey(Trip, on_delete=models.SET_NULL, null=True, blank=True, related_name='import_jobs')
+    file = models.FileField(upload_to='imports/')
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    position = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='importjob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Import {self.pk} ({self.format}, {self.status})"
+
+class ExpenseRollup(models.Model):
+    """Daily expense totals per (trip, category, currency), kept current by ``trips.rollups``."""
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='expense_rollups',
+                             null=True, blank=True)
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='expense_rollups', db_index=False)
+    category = models.CharField(max_length=20, choices=Expense.CATEGORY_CHOICES)
+    currency = models.CharField(max_length=3)
+    day = models.DateField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['trip', 'category', 'currency', 'day'], name='expense_rollup_key'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'day'], name='expense_rollup_user_day_idx'),
+            models.Index(fields=['day'], name='expense_rollup_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.trip_id} {self.category} {self.day}: {self.total} {self.currency}"
+
+class FxRate(models.Model):
+    """Units of ``currency`` per unit of the pivot currency the rates were quoted against, on ``date``."""
+
+    currency = models.CharField(max_length=3)
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['currency', 'date'], name='fxrate_currency_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.currency} {self.date}: {self.rate}"
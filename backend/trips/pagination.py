@@ -0,0 +1,167 @@
+import copy
+from collections import OrderedDict
+
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    """Page-number pagination that switches to keyset (seek) pagination on request.
+
+    Clients opt in with ``?pagination=cursor`` or by following a ``cursor`` link.
+    Pages are then located with a ``WHERE (ordering columns) > (last row)``
+    clause on the queryset's current ordering (including any ``?ordering=``
+    applied by ``OrderingFilter``, or an annotation such as the search rank)
+    with ``pk`` as the tie-breaker, so deep pages cost the same as the first
+    one. The total ``count`` is only computed when ``?count=true`` is passed.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    mode_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    cursor_salt = 'trips.pagination.cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.fields = [self.resolve_field(queryset, name) for name, _ in self.ordering]
+        self.count = queryset.count() if self.wants_count(request) else None
+
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor['d'] == 'p'
+        if cursor is not None:
+            queryset = queryset.filter(self.seek_filter(cursor['v'], reverse))
+        queryset = queryset.order_by(*self.order_expressions(reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page_rows = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        payload = OrderedDict()
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['next'] = self.get_cursor_link(self.page_rows[-1], 'n') if self.has_next and self.page_rows else None
+        payload['previous'] = self.get_cursor_link(self.page_rows[0], 'p') if self.has_previous and self.page_rows else None
+        payload['results'] = data
+        return Response(payload)
+
+    def wants_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes')
+
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        parsed = []
+        for term in ordering:
+            if not isinstance(term, str):
+                raise NotFound('Cursor pagination requires field orderings')
+            descending = term.startswith('-')
+            name = term.lstrip('-')
+            parsed.append(('pk' if name in ('pk', 'id') else name, descending))
+        if not any(name == 'pk' for name, _ in parsed):
+            parsed.append(('pk', parsed[0][1] if parsed else False))
+        return parsed
+
+    def resolve_field(self, queryset, name):
+        model = queryset.model
+        if name == 'pk':
+            return model._meta.pk
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            # An unbound copy of the output field, named so it reads the annotation off each row.
+            field = copy.copy(annotation.output_field)
+            field.set_attributes_from_name(name)
+            return field
+        try:
+            return model._meta.get_field(name)
+        except FieldDoesNotExist:
+            raise NotFound(f'Cursor pagination does not support ordering by {name}')
+
+    def order_expressions(self, reverse=False):
+        expressions = []
+        for (name, descending), field in zip(self.ordering, self.fields):
+            method = F(name).desc if descending != reverse else F(name).asc
+            if not field.null:
+                expressions.append(method())
+            elif reverse:
+                expressions.append(method(nulls_first=True))
+            else:
+                expressions.append(method(nulls_last=True))
+        return expressions
+
+    def seek_filter(self, values, reverse):
+        """``Q`` selecting rows strictly after ``values`` in the (possibly reversed) ordering.
+
+        Nullable columns sort NULLs last, so NULL is treated as the largest value.
+        """
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (name, descending), field, value in zip(self.ordering, self.fields, values):
+            lookup = 'gt' if descending == reverse else 'lt'
+            if value is None:
+                after = Q(**{f'{name}__isnull': False}) if reverse else Q(pk__in=[])
+                same = Q(**{f'{name}__isnull': True})
+            else:
+                after = Q(**{f'{name}__{lookup}': value})
+                if field.null and not reverse:
+                    after |= Q(**{f'{name}__isnull': True})
+                same = Q(**{name: value})
+            condition |= equal & after
+            equal &= same
+        return condition
+
+    def encode_cursor(self, row, direction):
+        values = [
+            None if getattr(row, field.attname) is None else field.value_to_string(row)
+            for field in self.fields
+        ]
+        return signing.dumps(
+            {'o': [('-' if desc else '') + name for name, desc in self.ordering], 'v': values, 'd': direction},
+            salt=self.cursor_salt, compress=True,
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = signing.loads(encoded, salt=self.cursor_salt)
+            ordering = [('-' if desc else '') + name for name, desc in self.ordering]
+            if cursor['o'] != ordering or cursor['d'] not in ('n', 'p') or len(cursor['v']) != len(self.fields):
+                raise ValueError
+            cursor['v'] = [
+                None if value is None else field.to_python(value)
+                for field, value in zip(self.fields, cursor['v'])
+            ]
+        except (signing.BadSignature, ValidationError, KeyError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def get_cursor_link(self, row, direction):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(row, direction))
@@ -0,0 +1,127 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from .costs import to_decimal
+from .fx import as_date, converted
+from .models import Trip, Expense, ExpenseRollup
+
+# Rollups are stored per day; coarser buckets are computed on read.
+BUCKETS = {
+    'day': lambda: F('day'),
+    'week': lambda: TruncWeek('day'),
+    'month': lambda: TruncMonth('day'),
+}
+ROLLUP_FIELDS = {'amount', 'trip', 'trip_id', 'category', 'currency', 'date'}
+
+
+def rollup_deltas(expenses, sign=1, deltas=None):
+    """Add ``{(trip_id, category, currency, day): [amount, count]}`` for ``expenses`` (model instances or dicts)."""
+    deltas = deltas if deltas is not None else defaultdict(lambda: [Decimal('0'), 0])
+    for expense in expenses:
+        if isinstance(expense, dict):
+            key = (expense['trip_id'], expense['category'], expense['currency'], as_date(expense['date']))
+            amount = expense['amount']
+        else:
+            key = (expense.trip_id, expense.category, expense.currency, as_date(expense.date))
+            amount = expense.amount
+        deltas[key][0] += sign * to_decimal(amount)
+        deltas[key][1] += sign
+    return deltas
+
+
+def add_to_rollup(key, amount, count, owners):
+    trip_id, category, currency, day = key
+    rows = ExpenseRollup.objects.filter(trip_id=trip_id, category=category, currency=currency, day=day)
+    changes = {'total': F('total') + amount, 'count': F('count') + count}
+    if rows.update(**changes):
+        if count < 0:
+            rows.filter(count__lte=0).delete()
+        return
+    if count <= 0:
+        # Nothing to subtract from: the trip predates the rollups and gets them from the backfill.
+        return
+    try:
+        with transaction.atomic():
+            ExpenseRollup.objects.create(user_id=owners.get(trip_id), trip_id=trip_id, category=category,
+                                         currency=currency, day=day, total=amount, count=count)
+    except IntegrityError:
+        # Another transaction created the row first.
+        rows.update(**changes)
+
+
+def apply_rollup_deltas(deltas):
+    """Add each delta to its rollup row, creating missing rows and dropping emptied ones.
+
+    Rows that don't exist yet are inserted in one batch, so bulk imports
+    cost one query per new day rather than two.
+    """
+    deltas = {key: value for key, value in deltas.items() if key[0] is not None and (value[0] or value[1])}
+    if not deltas:
+        return
+    existing = set(
+        ExpenseRollup.objects.filter(trip_id__in={key[0] for key in deltas}, day__in={key[3] for key in deltas})
+        .values_list('trip_id', 'category', 'currency', 'day')
+    )
+    owners = dict(Trip.objects.filter(pk__in={key[0] for key in deltas}).values_list('pk', 'user_id'))
+    missing = [key for key in deltas if key not in existing and deltas[key][1] > 0]
+    if missing:
+        try:
+            with transaction.atomic():
+                ExpenseRollup.objects.bulk_create([
+                    ExpenseRollup(user_id=owners.get(key[0]), trip_id=key[0], category=key[1], currency=key[2],
+                                  day=key[3], total=deltas[key][0], count=deltas[key][1])
+                    for key in missing
+                ], batch_size=1000)
+        except IntegrityError:
+            # Raced with another writer; fall back to row-by-row increments.
+            missing = []
+    for key in set(deltas) - set(missing):
+        add_to_rollup(key, *deltas[key], owners)
+
+
+def rebuild_rollups(trip_ids):
+    """Recompute the rollups of ``trip_ids`` from the expense table, locking those trips.
+
+    Returns the number of rollup rows written.
+    """
+    with transaction.atomic():
+        owners = dict(Trip.objects.filter(pk__in=list(trip_ids)).select_for_update().values_list('pk', 'user_id'))
+        ExpenseRollup.objects.filter(trip_id__in=list(owners)).delete()
+        rows = (
+            Expense.objects.filter(trip_id__in=list(owners))
+            .order_by()
+            .values('trip_id', 'category', 'currency', 'date')
+            .annotate(total=Sum('amount'), count=Count('pk'))
+        )
+        created = ExpenseRollup.objects.bulk_create([
+            ExpenseRollup(user_id=owners[row['trip_id']], trip_id=row['trip_id'], category=row['category'],
+                          currency=row['currency'], day=row['date'], total=row['total'], count=row['count'])
+            for row in rows
+        ], batch_size=1000)
+    return len(created)
+
+
+def reassign_rollups(trip_ids):
+    """Re-copy ``Trip.user`` onto the rollups of ``trip_ids``."""
+    owner = Subquery(Trip.objects.filter(pk=OuterRef('trip_id')).values('user_id')[:1])
+    ExpenseRollup.objects.filter(trip_id__in=trip_ids).update(user_id=owner)
+
+
+def spending_series(rollups, bucket='day', currency=None):
+    """Coarsen daily ``rollups`` into ``bucket`` periods, one row per (period, category, currency).
+
+    With ``currency`` every row is converted into it at its day's rates and
+    the series has one row per (period, category).
+    """
+    rollups = rollups.order_by().annotate(period=BUCKETS[bucket]())
+    if currency is None:
+        rows = rollups.values('period', 'category', 'currency').annotate(total=Sum('total'), count=Sum('count'))
+        return list(rows.order_by('period', 'category', 'currency'))
+    rows = rollups.values('period', 'category').annotate(
+        total=Sum(converted(currency, amount='total', on='day')), count=Sum('count'), currency=Value(currency),
+    )
+    return list(rows.order_by('period', 'category'))
@@ -0,0 +1,149 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+from .models import Trip, Activity, Expense
+
+# (column, weight) pairs making up each model's search document.
+SEARCH_DOCUMENTS = {
+    Trip: (('title', 'A'), ('destination', 'A'), ('description', 'B')),
+    Activity: (('name', 'A'), ('location', 'B'), ('notes', 'C')),
+    Expense: (('description', 'A'),),
+}
+SEARCH_CONFIG = 'english'
+TOKEN_RE = re.compile(r'\w+')
+
+
+def postgres_install_sql(table, document):
+    vector = ' || '.join(
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(\"{column}\", '')), '{weight}')"
+        for column, weight in document
+    )
+    return [
+        f'ALTER TABLE "{table}" ADD COLUMN IF NOT EXISTS "search_vector" tsvector '
+        f'GENERATED ALWAYS AS ({vector}) STORED',
+        f'CREATE INDEX IF NOT EXISTS "{table}_search_idx" ON "{table}" USING gin ("search_vector")',
+    ]
+
+
+def postgres_uninstall_sql(table, document):
+    return [
+        f'DROP INDEX IF EXISTS "{table}_search_idx"',
+        f'ALTER TABLE "{table}" DROP COLUMN IF EXISTS "search_vector"',
+    ]
+
+
+def sqlite_install_sql(table, document):
+    fts = f'{table}_fts'
+    columns = ', '.join(column for column, _ in document)
+    new_values = ', '.join(f'new.{column}' for column, _ in document)
+    old_values = ', '.join(f'old.{column}' for column, _ in document)
+    delete = f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+    insert = f'INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values});'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columns}, content='{table}', "
+        f"content_rowid='id', tokenize='porter unicode61')",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN {delete} {insert} END',
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def sqlite_uninstall_sql(table, document):
+    fts = f'{table}_fts'
+    return [f'DROP TRIGGER IF EXISTS {fts}_{suffix}' for suffix in ('ai', 'ad', 'au')] + [
+        f'DROP TABLE IF EXISTS {fts}',
+    ]
+
+
+INSTALLERS = {
+    'postgresql': (postgres_install_sql, postgres_uninstall_sql),
+    'sqlite': (sqlite_install_sql, sqlite_uninstall_sql),
+}
+
+
+def install_search_indexes(conn, uninstall=False):
+    if conn.vendor not in INSTALLERS:
+        return
+    builder = INSTALLERS[conn.vendor][1 if uninstall else 0]
+    with conn.cursor() as cursor:
+        for model, document in SEARCH_DOCUMENTS.items():
+            for sql in builder(model._meta.db_table, document):
+                cursor.execute(sql)
+
+
+def ensure_search_indexes(sender, using='default', **kwargs):
+    """post_migrate hook: SQLite drops triggers when Django rebuilds a table, so put them back."""
+    conn = connections[using]
+    if conn.vendor != 'sqlite':
+        return
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {row[0] for row in cursor.fetchall()}
+    tables = {f'{model._meta.db_table}_fts' for model in SEARCH_DOCUMENTS}
+    triggers = {f'{table}_{suffix}' for table in tables for suffix in ('ai', 'ad', 'au')}
+    # Only repair once migration 0004 has created the FTS tables.
+    if tables <= existing and not triggers <= existing:
+        install_search_indexes(conn)
+
+
+def search_tokens(terms):
+    return TOKEN_RE.findall(' '.join(terms))
+
+
+def full_text_search(queryset, terms):
+    """Filter ``queryset`` to rows matching every term (as a prefix) and annotate ``search_rank``.
+
+    Returns ``None`` when the model or database has no full-text index.
+    """
+    model = queryset.model
+    tokens = search_tokens(terms)
+    if model not in SEARCH_DOCUMENTS or not tokens:
+        return None
+    table = model._meta.db_table
+    vendor = connections[queryset.db].vendor
+
+    if vendor == 'postgresql':
+        query = ' & '.join(f'{token}:*' for token in tokens)
+        tsquery = f"to_tsquery('{SEARCH_CONFIG}', %s)"
+        return queryset.filter(
+            RawSQL(f'"{table}"."search_vector" @@ {tsquery}', (query,), output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(f'ts_rank("{table}"."search_vector", {tsquery})', (query,), output_field=FloatField())
+        )
+
+    if vendor == 'sqlite':
+        fts = f'{table}_fts'
+        query = ' '.join(f'"{token}"*' for token in tokens)
+        return queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', (query,))
+        ).annotate(
+            search_rank=RawSQL(
+                f'(SELECT -bm25({fts}) FROM {fts} WHERE {fts} MATCH %s AND {fts}.rowid = "{table}"."id")',
+                (query,), output_field=FloatField(),
+            )
+        )
+    return None
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """``SearchFilter`` backed by the full-text index, ranked by relevance.
+
+    Uses the same ``?search=`` parameter. Falls back to ``SearchFilter``'s
+    ``icontains`` matching on databases without a full-text index.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        results = full_text_search(queryset, terms)
+        if results is None:
+            return super().filter_queryset(request, queryset, view)
+        if not request.query_params.get(filters.OrderingFilter.ordering_param):
+            results = results.order_by('-search_rank', *queryset.query.order_by)
+        return results
@@ -1,5 +1,5 @@
 ﻿from rest_framework import serializers
-from .models import Trip, Activity, Expense, Checklist
+from .models import Trip, Activity, Expense, Checklist, ImportJob
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -12,19 +12,45 @@ class UserBasicSerializer(serializers.ModelSerializer):
 class ExpenseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Expense
-        fields = '__all__'
+        exclude = ['owner']
 
 class ChecklistSerializer(serializers.ModelSerializer):
     class Meta:
         model = Checklist
-        fields = '__all__'
+        exclude = ['owner']
 
 class ActivitySerializer(serializers.ModelSerializer):
     expenses = ExpenseSerializer(many=True, read_only=True)
 
     class Meta:
         model = Activity
-        fields = '__all__'
+        exclude = ['owner']
+
+class CalendarActivitySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Activity
+        fields = ['id', 'trip', 'name', 'category', 'date', 'time', 'end_time', 'location', 'completed']
+
+class ImageVariantsField(serializers.Field):
+    """``{'srcset': ..., 'urls': {width: url}}`` for a trip's WebP image variants, or ``None`` until they exist."""
+
+    def __init__(self, **kwargs):
+        super().__init__(read_only=True, **kwargs)
+
+    def to_representation(self, value):
+        widths = (value or {}).get('widths')
+        if not widths:
+            return None
+        storage = Trip._meta.get_field('image').storage
+        request = self.context.get('request')
+        urls = {}
+        for width, name in sorted(widths.items(), key=lambda item: int(item[0])):
+            url = storage.url(name)
+            urls[width] = request.build_absolute_uri(url) if request is not None else url
+        return {
+            'srcset': ', '.join(f'{url} {width}w' for width, url in urls.items()),
+            'urls': urls,
+        }
 
 class TripSerializer(serializers.ModelSerializer):
     activities = ActivitySerializer(many=True, read_only=True)
@@ -35,26 +61,68 @@ class TripSerializer(serializers.ModelSerializer):
     budget_remaining = serializers.ReadOnlyField()
     activities_count = serializers.SerializerMethodField()
     completed_activities = serializers.SerializerMethodField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Trip
         fields = '__all__'
+        read_only_fields = ['actual_cost']
+
+    def validate(self, attrs):
+        start = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        end = attrs.get('end_date', getattr(self.instance, 'end_date', None))
+        if start and end and end < start:
+            raise serializers.ValidationError({'end_date': 'End date cannot be before the start date.'})
+        return attrs
 
     def get_activities_count(self, obj):
+        if hasattr(obj, 'activities_count'):
+            return obj.activities_count
         return obj.activities.count()
 
     def get_completed_activities(self, obj):
+        if hasattr(obj, 'completed_activities'):
+            return obj.completed_activities
         return obj.activities.filter(completed=True).count()
 
 class TripListSerializer(serializers.ModelSerializer):
     duration_days = serializers.ReadOnlyField()
     activities_count = serializers.SerializerMethodField()
     user = UserBasicSerializer(read_only=True)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Trip
-        fields = ['id', 'title', 'destination', 'start_date', 'end_date', 'budget',
-                  'status', 'image', 'duration_days', 'activities_count', 'created_at', 'user']
+        fields = ['id', 'title', 'destination', 'start_date', 'end_date', 'budget', 'currency',
+                  'status', 'image', 'image_variants', 'duration_days', 'activities_count', 'created_at', 'user']
 
     def get_activities_count(self, obj):
+        if hasattr(obj, 'activities_count'):
+            return obj.activities_count
         return obj.activities.count()
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    file = serializers.FileField(write_only=True)
+    format = serializers.ChoiceField(choices=ImportJob.FORMAT_CHOICES, required=False)
+
+    class Meta:
+        model = ImportJob
+        fields = ['id', 'file', 'format', 'trip', 'status', 'position', 'created_count', 'skipped_count',
+                  'error_count', 'errors', 'message', 'created_at', 'updated_at', 'finished_at']
+        read_only_fields = ['status', 'position', 'created_count', 'skipped_count', 'error_count',
+                            'errors', 'message', 'finished_at']
+
+    def validate(self, attrs):
+        from .imports import EXTENSIONS
+
+        if 'format' not in attrs:
+            name = attrs['file'].name.lower()
+            extension = name[name.rfind('.'):] if '.' in name else ''
+            if extension not in EXTENSIONS:
+                raise serializers.ValidationError({'format': 'Could not infer the format from the file name.'})
+            attrs['format'] = EXTENSIONS[extension]
+        trip = attrs.get('trip')
+        user = self.context['request'].user
+        if trip and trip.user_id != user.pk and user.role not in ('admin', 'superadmin'):
+            raise serializers.ValidationError({'trip': 'You can only import into your own trips.'})
+        return attrs
@@ -0,0 +1,167 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.utils import timezone
+
+from .cache import bump, schedule_invalidation, trips_changed
+from .costs import apply_cost_deltas, expense_totals, recompute_trip_costs
+from .dashboard import schedule_delta, trip_delta, user_delta, merge_deltas
+from .images import needs_variants, schedule_variants, strip_upload
+from .models import Trip, Activity, Expense, Checklist, sync_child_owners
+from .rollups import apply_rollup_deltas, reassign_rollups, rollup_deltas
+
+TRIP_FIELDS = ('status', 'budget', 'actual_cost', 'currency', 'start_date', 'user_id')
+USER_FIELDS = ('role', 'is_active')
+
+
+def state_of(instance, fields):
+    return {field: getattr(instance, field) for field in fields}
+
+
+def deleted_directly(origin, model):
+    """False when the delete cascaded from another model (e.g. a trip taking its expenses)."""
+    if origin is None:
+        return True
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin_model is model
+
+
+def is_recent(instance):
+    return instance.created_at is not None and instance.created_at >= timezone.now() - timedelta(days=30)
+
+
+def remember_previous_trip(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        instance._dashboard_previous = None
+        return
+    instance._dashboard_previous = Trip.objects.filter(pk=instance.pk).values(*TRIP_FIELDS).first()
+
+
+def trip_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_dashboard_previous', None)
+    if previous is not None and update_fields is not None and 'actual_cost' not in update_fields:
+        # Trip.save() leaves actual_cost to the F() updates; the row still holds the previous value.
+        instance.actual_cost = previous['actual_cost']
+    delta = trip_delta(state_of(instance, TRIP_FIELDS), 1)
+    if created or previous is None:
+        delta['system_stats.new_trips_month'] = 1
+    else:
+        delta = merge_deltas(delta, trip_delta(previous, -1))
+        if previous['user_id'] != instance.user_id:
+            reassign_rollups([instance.pk])
+            sync_child_owners([instance.pk])
+        if previous['currency'] != instance.currency:
+            recompute_trip_costs([instance.pk])
+    schedule_delta(delta)
+    schedule_invalidation([instance.pk], [instance.user_id, previous and previous['user_id']])
+
+
+def strip_trip_image(sender, instance, raw=False, **kwargs):
+    if not raw:
+        strip_upload(instance.image)
+
+
+def trip_image_saved(sender, instance, raw=False, **kwargs):
+    if not raw and needs_variants(instance):
+        schedule_variants(instance.pk)
+
+
+def trip_deleted(sender, instance, **kwargs):
+    delta = trip_delta(state_of(instance, TRIP_FIELDS), -1)
+    if is_recent(instance):
+        delta['system_stats.new_trips_month'] = -1
+    schedule_delta(delta)
+    schedule_invalidation([instance.pk], [instance.user_id])
+
+
+def remember_previous_user(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        instance._dashboard_previous = None
+        return
+    instance._dashboard_previous = sender.objects.filter(pk=instance.pk).values(*USER_FIELDS).first()
+
+
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_dashboard_previous', None)
+    delta = user_delta(state_of(instance, USER_FIELDS), 1)
+    if created or previous is None:
+        delta['system_stats.new_users_month'] = 1
+    else:
+        delta = merge_deltas(delta, user_delta(previous, -1))
+    schedule_delta(delta)
+    user_id = instance.pk
+    transaction.on_commit(lambda: bump(f'user:{user_id}'))
+
+
+def user_deleted(sender, instance, **kwargs):
+    delta = user_delta(state_of(instance, USER_FIELDS), -1)
+    if is_recent(instance):
+        delta['system_stats.new_users_month'] = -1
+    schedule_delta(delta)
+
+
+def remember_previous_expense(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        instance._cost_previous = None
+        return
+    instance._cost_previous = (
+        Expense.objects.filter(pk=instance.pk).values('trip_id', 'amount', 'category', 'currency', 'date').first()
+    )
+
+
+def expense_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = expense_totals([instance])
+    rollups = rollup_deltas([instance])
+    previous = getattr(instance, '_cost_previous', None)
+    if previous is not None:
+        for trip_id, amount in expense_totals([previous], sign=-1).items():
+            deltas[trip_id] += amount
+        rollup_deltas([previous], sign=-1, deltas=rollups)
+    apply_cost_deltas(deltas)
+    apply_rollup_deltas(rollups)
+    trips_changed(deltas, model=Expense)
+
+
+def expense_deleted(sender, instance, origin=None, **kwargs):
+    if not deleted_directly(origin, Expense):
+        return
+    apply_cost_deltas(expense_totals([instance], sign=-1))
+    apply_rollup_deltas(rollup_deltas([instance], sign=-1))
+    trips_changed([instance.trip_id], model=Expense)
+
+
+def trip_child_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        trips_changed([instance.trip_id], model=sender)
+
+
+def trip_child_deleted(sender, instance, origin=None, **kwargs):
+    if deleted_directly(origin, sender):
+        trips_changed([instance.trip_id], model=sender)
+
+
+def connect():
+    User = get_user_model()
+    pre_save.connect(remember_previous_trip, sender=Trip, dispatch_uid='dashboard_trip_pre_save')
+    post_save.connect(trip_saved, sender=Trip, dispatch_uid='dashboard_trip_saved')
+    pre_save.connect(strip_trip_image, sender=Trip, dispatch_uid='images_trip_pre_save')
+    post_save.connect(trip_image_saved, sender=Trip, dispatch_uid='images_trip_saved')
+    post_delete.connect(trip_deleted, sender=Trip, dispatch_uid='dashboard_trip_deleted')
+    pre_save.connect(remember_previous_user, sender=User, dispatch_uid='dashboard_user_pre_save')
+    post_save.connect(user_saved, sender=User, dispatch_uid='dashboard_user_saved')
+    post_delete.connect(user_deleted, sender=User, dispatch_uid='dashboard_user_deleted')
+    pre_save.connect(remember_previous_expense, sender=Expense, dispatch_uid='cost_expense_pre_save')
+    post_save.connect(expense_saved, sender=Expense, dispatch_uid='cost_expense_saved')
+    post_delete.connect(expense_deleted, sender=Expense, dispatch_uid='cost_expense_deleted')
+    for model in (Activity, Checklist):
+        post_save.connect(trip_child_saved, sender=model, dispatch_uid=f'cache_{model.__name__}_saved')
+        post_delete.connect(trip_child_deleted, sender=model, dispatch_uid=f'cache_{model.__name__}_deleted')
@@ -0,0 +1,54 @@
+from collections import defaultdict
+
+from django.db.models import F, Sum
+
+from .fx import converted
+from .models import Trip, Expense
+
+
+def expenses_by_category(trip_ids):
+    """Expense totals per category in each trip's currency."""
+    rows = (
+        Expense.objects.filter(trip_id__in=trip_ids)
+        .order_by()
+        .values('trip_id', 'category')
+        .annotate(total=Sum(converted(F('trip__currency'))))
+        .order_by('trip_id', '-total')
+    )
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[row['trip_id']].append({'category': row['category'], 'total': row['total']})
+    return grouped
+
+
+def build_statistics(trip, by_category):
+    """Shape a trip annotated by ``TripQuerySet.with_statistics`` into the statistics payload."""
+    return {
+        'total_activities': trip.stat_total_activities,
+        'completed_activities': trip.stat_completed_activities,
+        'total_expenses': trip.stat_total_expenses or 0,
+        'currency': trip.currency,
+        'expenses_by_category': by_category,
+        'checklist_progress': {
+            'total': trip.stat_checklist_total,
+            'completed': trip.stat_checklist_completed,
+        },
+        'budget_status': {
+            'budget': float(trip.budget) if trip.budget else 0,
+            'spent': float(trip.actual_cost),
+            'remaining': float(trip.budget_remaining) if trip.budget_remaining else 0,
+        },
+    }
+
+
+def trip_statistics(trip):
+    if not hasattr(trip, 'stat_total_activities'):
+        trip = Trip.objects.with_statistics().get(pk=trip.pk)
+    return build_statistics(trip, expenses_by_category([trip.pk])[trip.pk])
+
+
+def bulk_trip_statistics(queryset):
+    """Statistics for every trip in ``queryset`` in two queries, keyed by trip id."""
+    trips = list(queryset.with_statistics())
+    by_category = expenses_by_category([trip.pk for trip in trips])
+    return {trip.pk: build_statistics(trip, by_category[trip.pk]) for trip in trips}
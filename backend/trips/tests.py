@@ -1,3 +1,1399 @@
-from django.test import TestCase
+import csv
+import asyncio
+import importlib
+import json
+import shutil
+import threading
+import tempfile
+import time
+from datetime import date, time as clock
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, connections
+from django.db.models import Count, F, Sum
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .cache import cache_stats, get_cache
+from .calendar import find_conflicts
+from .concurrent import gather_queries
+from .costs import recompute_trip_costs
+from .dashboard import compute_dashboard_stats, refresh_snapshot
+from .fast_serializers import FastSerializer
+from .fx import bump_version, clear_rate_cache, convert, current_version
+from .images import generate_variants, needs_variants
+from .imports import ChunkWriter, run_import
+from .models import Trip, Activity, Expense, Checklist, DashboardSnapshot, ImportJob, ExpenseRollup, FxRate
+from .serializers import ExpenseSerializer
+from .statistics import trip_statistics
+from .views import TripViewSet, ActivityViewSet, ExpenseViewSet
+
+User = get_user_model()
+
+
+class TripQueryCountTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='traveler', password='secret123')
+
+    def make_trip(self, activities=2):
+        trip = Trip.objects.create(
+            user=self.user, title='Trip', destination='Lisbon',
+            start_date=date(2025, 5, 1), end_date=date(2025, 5, 4),
+        )
+        for i in range(activities):
+            activity = Activity.objects.create(
+                trip=trip, name=f'Activity {i}', date=date(2025, 5, 2), completed=i % 2 == 0,
+            )
+            Expense.objects.create(
+                trip=trip, activity=activity, description='Ticket', amount='10.00',
+                category='activities', date=date(2025, 5, 2),
+            )
+        Checklist.objects.create(trip=trip, item='Passport')
+        return trip
+
+    def test_list_query_count_is_constant(self):
+        self.make_trip()
+        with self.assertNumQueries(2):
+            self.client.get('/api/trips/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(5):
+                self.make_trip(activities=4)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/trips/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['activities_count'], 4)
+
+    def test_retrieve_query_count_is_constant(self):
+        small = self.make_trip(activities=1)
+        large = self.make_trip(activities=8)
+
+        with self.assertNumQueries(6):
+            self.client.get(f'/api/trips/{small.pk}/')
+        with self.assertNumQueries(6):
+            response = self.client.get(f'/api/trips/{large.pk}/')
+
+        self.assertEqual(response.data['activities_count'], 8)
+        self.assertEqual(response.data['completed_activities'], 4)
+        self.assertEqual(len(response.data['activities'][0]['expenses']), 1)
+
+
+class TripStatisticsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.trip = Trip.objects.create(
+            title='Trip', destination='Kyoto', start_date=date(2025, 4, 1),
+            end_date=date(2025, 4, 5), budget='500.00',
+        )
+        Activity.objects.create(trip=self.trip, name='Temple', date=date(2025, 4, 2), completed=True)
+        Activity.objects.create(trip=self.trip, name='Market', date=date(2025, 4, 3))
+        Expense.objects.create(trip=self.trip, description='Hotel', amount='100.00',
+                               category='accommodation', date=date(2025, 4, 1))
+        Expense.objects.create(trip=self.trip, description='Ramen', amount='15.00',
+                               category='food', date=date(2025, 4, 2))
+        Expense.objects.create(trip=self.trip, description='Sushi', amount='5.00',
+                               category='food', date=date(2025, 4, 3))
+        Checklist.objects.create(trip=self.trip, item='Passport', completed=True)
+        Checklist.objects.create(trip=self.trip, item='Adapter')
+
+    def test_statistics_in_two_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/trips/{self.trip.pk}/statistics/')
+
+        data = response.data
+        self.assertEqual(data['total_activities'], 2)
+        self.assertEqual(data['completed_activities'], 1)
+        self.assertEqual(data['total_expenses'], Decimal('120.00'))
+        self.assertEqual([row['category'] for row in data['expenses_by_category']], ['accommodation', 'food'])
+        self.assertEqual(data['checklist_progress'], {'total': 2, 'completed': 1})
+        self.assertEqual(data['budget_status'], {'budget': 500.0, 'spent': 120.0, 'remaining': 380.0})
+
+    def test_bulk_statistics(self):
+        empty = Trip.objects.create(title='Empty', destination='Oslo',
+                                    start_date=date(2025, 6, 1), end_date=date(2025, 6, 2))
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/trips/bulk_statistics/?ids={self.trip.pk},{empty.pk}')
+
+        self.assertEqual(response.data[self.trip.pk]['total_activities'], 2)
+        self.assertEqual(response.data[empty.pk]['total_expenses'], 0)
+        self.assertEqual(response.data[empty.pk]['expenses_by_category'], [])
+
+    def test_bulk_statistics_rejects_bad_ids(self):
+        response = self.client.get('/api/trips/bulk_statistics/?ids=1,abc')
+        self.assertEqual(response.status_code, 400)
+
+
+class DashboardSnapshotTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(username='admin', password='secret123', role='admin')
+        self.client.force_authenticate(self.admin)
+
+    def create_trip(self, **kwargs):
+        defaults = {'title': 'Trip', 'destination': 'Rome', 'user': self.admin,
+                    'start_date': date(2025, 3, 1), 'end_date': date(2025, 3, 3)}
+        defaults.update(kwargs)
+        return Trip.objects.create(**defaults)
+
+    def test_signals_keep_snapshot_in_sync_with_live_stats(self):
+        refresh_snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            trip = self.create_trip(budget='200.00', status='upcoming')
+            self.create_trip(status='completed', actual_cost='50.00')
+            User.objects.create_user(username='someone', password='secret123')
+        with self.captureOnCommitCallbacks(execute=True):
+            trip.status = 'ongoing'
+            trip.budget = Decimal('300.00')
+            trip.save()
+            self.admin.role = 'superadmin'
+            self.admin.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_trip().delete()
+
+        snapshot = DashboardSnapshot.objects.get()
+        self.assertEqual(snapshot.data['system_stats'], compute_dashboard_stats()['system_stats'])
+        self.assertEqual(snapshot.data['trips_by_status'], compute_dashboard_stats()['trips_by_status'])
+        self.assertEqual(snapshot.data['users_by_role'], compute_dashboard_stats()['users_by_role'])
+
+    def test_dashboard_reads_snapshot(self):
+        self.create_trip(status='upcoming')
+        response = self.client.get('/api/auth/dashboard/admin/')
+        self.assertEqual(response.data['snapshot']['source'], 'live')
+        self.assertEqual(response.data['trips_by_status']['upcoming'], 1)
+
+        response = self.client.get('/api/auth/dashboard/admin/')
+        self.assertEqual(response.data['snapshot']['source'], 'snapshot')
+        self.assertEqual(response.data['system_stats']['active_trips'], 1)
+
+
+class TripCostMaintenanceTests(TestCase):
+    def setUp(self):
+        self.trip = Trip.objects.create(title='A', destination='Paris',
+                                        start_date=date(2025, 1, 1), end_date=date(2025, 1, 2))
+        self.other = Trip.objects.create(title='B', destination='Berlin',
+                                         start_date=date(2025, 1, 1), end_date=date(2025, 1, 2))
+
+    def add_expense(self, trip, amount):
+        return Expense.objects.create(trip=trip, description='x', amount=amount,
+                                      category='food', date=date(2025, 1, 1))
+
+    def cost(self, trip):
+        return Trip.objects.get(pk=trip.pk).actual_cost
+
+    def test_expense_writes_adjust_actual_cost(self):
+        expense = self.add_expense(self.trip, '40.00')
+        self.add_expense(self.trip, '10.50')
+        self.assertEqual(self.cost(self.trip), Decimal('50.50'))
+
+        expense.amount = Decimal('30.00')
+        expense.save()
+        self.assertEqual(self.cost(self.trip), Decimal('40.50'))
+
+        expense.trip = self.other
+        expense.save()
+        self.assertEqual(self.cost(self.trip), Decimal('10.50'))
+        self.assertEqual(self.cost(self.other), Decimal('30.00'))
+
+        expense.delete()
+        self.assertEqual(self.cost(self.other), Decimal('0.00'))
+
+    def test_stale_trip_save_keeps_derived_fields(self):
+        stale = Trip.objects.get(pk=self.trip.pk)
+        self.add_expense(self.trip, '40.00')
+        Trip.objects.filter(pk=self.trip.pk).update(image_variants={'source': 'x.jpg', 'widths': {}})
+        version = Trip.objects.get(pk=self.trip.pk).version
+
+        stale.title = 'Renamed'
+        stale.save()
+
+        trip = Trip.objects.get(pk=self.trip.pk)
+        self.assertEqual(trip.title, 'Renamed')
+        self.assertEqual(trip.actual_cost, Decimal('40.00'))
+        self.assertEqual(trip.version, version)
+        self.assertEqual(trip.image_variants['source'], 'x.jpg')
+        self.assertEqual(stale.actual_cost, Decimal('40.00'))
+
+    def test_bulk_operations_adjust_actual_cost(self):
+        Expense.objects.bulk_create([
+            Expense(trip=self.trip, description='x', amount=Decimal('5.00'), category='food', date=date(2025, 1, 1))
+            for _ in range(4)
+        ])
+        self.assertEqual(self.cost(self.trip), Decimal('20.00'))
+
+        Expense.objects.filter(trip=self.trip).update(amount=Decimal('2.00'))
+        self.assertEqual(self.cost(self.trip), Decimal('8.00'))
+
+        Expense.objects.filter(pk=Expense.objects.filter(trip=self.trip).first().pk).update(trip=self.other)
+        self.assertEqual(self.cost(self.trip), Decimal('6.00'))
+        self.assertEqual(self.cost(self.other), Decimal('2.00'))
+
+        Expense.objects.filter(trip=self.trip).delete()
+        self.assertEqual(self.cost(self.trip), Decimal('0.00'))
+
+    def test_recompute_command_repairs_drift(self):
+        self.add_expense(self.trip, '12.00')
+        Trip.objects.filter(pk__in=[self.trip.pk, self.other.pk]).update(actual_cost=Decimal('99.00'))
+
+        call_command('recompute_trip_costs', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(self.cost(self.trip), Decimal('12.00'))
+        self.assertEqual(self.cost(self.other), Decimal('0.00'))
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='pager', password='secret123')
+        self.client.force_authenticate(self.user)
+        self.trip = Trip.objects.create(user=self.user, title='Trip', destination='Seoul',
+                                        start_date=date(2025, 1, 1), end_date=date(2025, 1, 9))
+        for i in range(25):
+            Trip.objects.create(user=self.user, title=f'Trip {i}', destination='Busan',
+                                start_date=date(2025, 1, 1), end_date=date(2025, 1, 2),
+                                budget=None if i % 4 == 0 else i % 5)
+            Activity.objects.create(trip=self.trip, name=f'Activity {i}', date=date(2025, 1, 1 + i % 3),
+                                    time=None if i % 3 == 0 else f'{8 + i % 7}:00')
+
+    def walk(self, url):
+        ids, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.extend(row['id'] for row in response.data['results'])
+            pages.append(response.data)
+            url = response.data['next']
+        return ids, pages
+
+    def test_cursor_walk_matches_offset_ordering(self):
+        expected = [trip.pk for trip in Trip.objects.order_by('-created_at', '-pk')]
+        ids, pages = self.walk('/api/trips/?pagination=cursor')
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(pages), 3)
+
+    def test_cursor_walk_with_nullable_ordering(self):
+        ids, _ = self.walk('/api/trips/?pagination=cursor&ordering=budget&page_size=4')
+        expected = list(Trip.objects.order_by(F('budget').asc(nulls_last=True), 'pk').values_list('pk', flat=True))
+        self.assertEqual(ids, expected)
+
+        ids, _ = self.walk('/api/activities/?pagination=cursor&page_size=7')
+        expected = list(Activity.objects.order_by('date', F('time').asc(nulls_last=True), 'pk')
+                        .values_list('pk', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_previous_link_returns_prior_page(self):
+        first = self.client.get('/api/activities/?pagination=cursor&page_size=5').data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual([row['id'] for row in back['results']], [row['id'] for row in first['results']])
+
+    def test_count_is_opt_in_and_page_mode_is_default(self):
+        response = self.client.get('/api/expenses/?pagination=cursor&count=true')
+        self.assertEqual(response.data['count'], 0)
+        response = self.client.get('/api/trips/')
+        self.assertEqual(response.data['count'], 26)
+
+    def test_tampered_cursor_is_rejected(self):
+        response = self.client.get('/api/trips/?cursor=bogus')
+        self.assertEqual(response.status_code, 404)
+
+
+class FullTextSearchTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='searcher', password='secret123')
+        self.client.force_authenticate(self.user)
+        self.kyoto = Trip.objects.create(user=self.user, title='Temples and gardens', destination='Kyoto',
+                                         description='Autumn leaves', start_date=date(2025, 11, 1),
+                                         end_date=date(2025, 11, 5))
+        self.alps = Trip.objects.create(user=self.user, title='Hiking the Alps', destination='Zermatt',
+                                        description='Glacier hikes and a visit to Kyoto-style tea house',
+                                        start_date=date(2025, 7, 1), end_date=date(2025, 7, 5))
+        Activity.objects.create(trip=self.kyoto, name='Tea ceremony', location='Gion', date=date(2025, 11, 2))
+        Expense.objects.create(trip=self.alps, description='Cable car tickets', amount='40.00',
+                               category='transport', date=date(2025, 7, 2))
+
+    def search(self, url):
+        return [row['id'] for row in self.client.get(url).data['results']]
+
+    def test_trip_search_ranks_title_and_destination_first(self):
+        self.assertEqual(self.search('/api/trips/?search=kyoto'), [self.kyoto.pk, self.alps.pk])
+        self.assertEqual(self.search('/api/trips/?search=hik'), [self.alps.pk])
+        self.assertEqual(self.search('/api/trips/?search=kyoto glacier'), [self.alps.pk])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.kyoto.title = 'Shrines'
+        self.kyoto.destination = 'Nara'
+        self.kyoto.save()
+        self.assertEqual(self.search('/api/trips/?search=nara'), [self.kyoto.pk])
+        self.assertEqual(self.search('/api/trips/?search=temples'), [])
+        self.alps.delete()
+        self.assertEqual(self.search('/api/trips/?search=glacier'), [])
+
+    def test_activity_and_expense_search(self):
+        self.assertEqual(len(self.search('/api/activities/?search=gion')), 1)
+        self.assertEqual(len(self.search('/api/expenses/?search=cable')), 1)
+        self.assertEqual(self.search('/api/expenses/?search=ceremony'), [])
+
+    def test_ranked_search_with_cursor_pagination(self):
+        for i in range(5):
+            Trip.objects.create(user=self.user, title=f'Kyoto day {i}', destination='Kyoto',
+                                start_date=date(2025, 11, 1), end_date=date(2025, 11, 2))
+        expected = self.search('/api/trips/?search=kyoto&page_size=100')
+        ids, url = [], '/api/trips/?search=kyoto&pagination=cursor&page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(ids), 7)
+
+        response = self.client.get('/api/activities/?search=tea&pagination=cursor')
+        self.assertEqual(len(response.data['results']), 1)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='cached', password='secret123')
+        self.client.force_authenticate(self.user)
+        self.trip = Trip.objects.create(user=self.user, title='Trip', destination='Porto',
+                                        start_date=date(2025, 9, 1), end_date=date(2025, 9, 3))
+
+    def test_retrieve_is_cached_until_a_child_changes(self):
+        url = f'/api/trips/{self.trip.pk}/'
+        first = self.client.get(url)
+        with self.assertNumQueries(1):
+            second = self.client.get(url)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Activity.objects.create(trip=self.trip, name='Port tasting', date=date(2025, 9, 2))
+        third = self.client.get(url)
+        self.assertNotEqual(third['ETag'], first['ETag'])
+        self.assertEqual(third.data['activities_count'], 1)
+
+    def test_if_none_match_returns_304(self):
+        response = self.client.get('/api/auth/dashboard/user/')
+        self.assertEqual(response.data['personal_stats']['total_trips'], 1)
+
+        not_modified = self.client.get('/api/auth/dashboard/user/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(trip=self.trip, description='Taxi', amount='12.00',
+                                   category='transport', date=date(2025, 9, 1))
+        response = self.client.get('/api/auth/dashboard/user/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['personal_stats']['total_expenses'], 12.0)
+
+    def test_trip_dashboard_counts_hits_and_misses(self):
+        before = cache_stats()
+        self.client.get('/api/trips/dashboard/')
+        self.client.get('/api/trips/dashboard/')
+        after = cache_stats()
+        self.assertEqual(after.get('miss', 0) - before.get('miss', 0), 1)
+        self.assertEqual(after.get('hit', 0) - before.get('hit', 0), 1)
+
+    def test_child_changes_only_expire_the_views_showing_them(self):
+        url = '/api/trips/dashboard/'
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(trip=self.trip, description='Taxi', amount='12.00',
+                                   category='transport', date=date(2025, 9, 1))
+            Checklist.objects.create(trip=self.trip, item='Sunscreen')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Activity.objects.create(trip=self.trip, name='Port tasting', date=date(2025, 9, 2))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_owner_changes_expire_trip_detail(self):
+        url = f'/api/trips/{self.trip.pk}/'
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Rita'
+            self.user.save()
+        self.assertEqual(self.client.get(url).data['user']['first_name'], 'Rita')
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.trip = Trip.objects.create(title='Trip', destination='Quito',
+                                        start_date=date(2025, 2, 1), end_date=date(2025, 2, 4))
+        self.activity = Activity.objects.create(trip=self.trip, name='Cable car', date=date(2025, 2, 2))
+
+    def revalidate(self, url, etag, queries):
+        with self.assertNumQueries(queries):
+            return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_retrieve_and_nested_actions_return_304_from_one_query(self):
+        for url in (f'/api/trips/{self.trip.pk}/', f'/api/trips/{self.trip.pk}/activities/'):
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.revalidate(url, etag, 1).status_code, 304)
+
+            Expense.objects.create(trip=self.trip, activity=self.activity, description='Ticket',
+                                   amount='8.00', category='activities', date=date(2025, 2, 2))
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_revalidates_from_cache_versions(self):
+        url = '/api/trips/?status=planning'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.revalidate(url, etag, 0).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.activity.completed = True
+            self.activity.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trip.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+
+
+class BulkWriteTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='importer', password='secret123')
+        self.client.force_authenticate(self.user)
+        self.trip = Trip.objects.create(user=self.user, title='Trip', destination='Cusco',
+                                        start_date=date(2025, 8, 1), end_date=date(2025, 8, 9))
+        self.foreign = Trip.objects.create(title='Not mine', destination='Lima',
+                                           start_date=date(2025, 8, 1), end_date=date(2025, 8, 9))
+
+    def expense(self, amount, trip=None):
+        return {'trip': (trip or self.trip).pk, 'description': 'Item', 'amount': amount,
+                'category': 'food', 'date': '2025-08-02'}
+
+    def test_bulk_create_validates_in_a_constant_number_of_queries(self):
+        payload = [{'trip': self.trip.pk, 'name': f'Stop {i}', 'date': '2025-08-02'} for i in range(50)]
+        with self.assertNumQueries(6):
+            response = self.client.post('/api/activities/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 50)
+        self.assertEqual(self.trip.activities.count(), 50)
+        self.assertEqual(Trip.objects.get(pk=self.trip.pk).version, 1)
+
+    def test_bulk_create_reports_per_item_errors_and_writes_nothing(self):
+        payload = [self.expense('5.00'), self.expense('-1'), self.expense('3.00', trip=self.foreign)]
+        response = self.client.post('/api/expenses/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['errors']
+        self.assertEqual(errors[0], {})
+        self.assertIn('amount', errors[1])
+        self.assertIn('trip', errors[2])
+        self.assertFalse(Expense.objects.exists())
+
+    def test_bulk_expense_writes_keep_actual_cost(self):
+        response = self.client.post('/api/expenses/bulk/', [self.expense('5.00'), self.expense('7.50')], format='json')
+        ids = [row['id'] for row in response.data]
+        self.assertEqual(Trip.objects.get(pk=self.trip.pk).actual_cost, Decimal('12.50'))
+
+        response = self.client.patch('/api/expenses/bulk/', [{'id': ids[0], 'amount': '10.00'}, {'id': 999999}],
+                                     format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'][1], {'id': ['Not found.']})
+
+        response = self.client.patch('/api/expenses/bulk/', [{'id': ids[0], 'amount': '10.00'}], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Trip.objects.get(pk=self.trip.pk).actual_cost, Decimal('17.50'))
+
+        response = self.client.delete('/api/expenses/bulk/', {'ids': ids}, format='json')
+        self.assertEqual(response.data, {'deleted': 2})
+        self.assertEqual(Trip.objects.get(pk=self.trip.pk).actual_cost, Decimal('0.00'))
+
+    def test_bulk_expense_delete_runs_a_constant_number_of_queries(self):
+        counts = []
+        for size in (5, 50):
+            response = self.client.post('/api/expenses/bulk/', [self.expense('2.00') for _ in range(size)],
+                                        format='json')
+            ids = [row['id'] for row in response.data]
+            with CaptureQueriesContext(connections['default']) as queries:
+                response = self.client.delete('/api/expenses/bulk/', {'ids': ids}, format='json')
+            self.assertEqual(response.data, {'deleted': size})
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(Trip.objects.get(pk=self.trip.pk).actual_cost, Decimal('0.00'))
+        self.assertFalse(ExpenseRollup.objects.filter(trip=self.trip).exists())
+
+    def test_bulk_checklist_update(self):
+        items = Checklist.objects.bulk_create([Checklist(trip=self.trip, item=f'Item {i}') for i in range(3)])
+        payload = [{'id': item.pk, 'completed': True} for item in items]
+        response = self.client.patch('/api/checklist/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Checklist.objects.filter(completed=True).count(), 3)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='accountant', password='secret123')
+        self.admin = User.objects.create_user(username='boss', password='secret123', role='admin')
+        self.trips = []
+        for i, owner in enumerate([self.user, self.user, self.admin]):
+            trip = Trip.objects.create(user=owner, title=f'Trip {i}', destination='Oslo',
+                                       start_date=date(2025, 6, 1), end_date=date(2025, 6, 5))
+            activity = Activity.objects.create(trip=trip, name='Museum', date=date(2025, 6, 2), cost='12.00')
+            Expense.objects.create(trip=trip, activity=activity, description='Ticket', amount='12.00',
+                                   category='activities', date=date(2025, 6, 2))
+            self.trips.append(trip)
+
+    def export(self, user, query=''):
+        self.client.force_authenticate(user)
+        response = self.client.get(f'/api/trips/export/{query}')
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_export_is_scoped_to_the_users_trips(self):
+        response, body = self.export(self.user)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(body.splitlines()))
+        self.assertEqual([row['record'] for row in rows], ['trip', 'activity', 'expense'] * 2)
+        self.assertEqual({row['trip_id'] for row in rows}, {str(self.trips[0].pk), str(self.trips[1].pk)})
+        self.assertEqual(rows[2]['amount'], '12.00')
+        self.assertEqual(rows[2]['activity_id'], rows[1]['activity_id'])
+
+    def test_jsonl_export_for_admin_covers_every_trip(self):
+        response, body = self.export(self.admin, '?output=jsonl')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(rows), 9)
+        self.assertEqual(rows[0]['owner'], 'accountant')
+        self.assertEqual(rows[2]['amount'], '12.00')
+
+    def test_export_queries_per_chunk_not_per_trip(self):
+        out = StringIO()
+        # One trip cursor, then activities + expenses for each chunk of two trips.
+        with self.assertNumQueries(5):
+            call_command('export_trips', '--format=jsonl', '--chunk-size=2', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 9)
+
+    def test_rejects_unknown_format(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/trips/export/?output=xml').status_code, 400)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/trips/export/').status_code, 401)
+
+
+class ImportTests(TestCase):
+    CSV = (
+        'type,trip,name,date,time,cost,booking_reference,activity,amount,category,description\n'
+        'activity,Andes,Machu Picchu,2025-08-03,06:00,80.00,MP-1,,,sightseeing,\n'
+        'expense,Andes,,2025-08-03,,,TK-1,MP-1,80.00,activities,Entrance ticket\n'
+        'expense,Andes,,2025-08-04,,,,,12.50,food,Lunch\n'
+        'activity,Andes,,2025-08-05,,,,,,,\n'
+        'activity,Nowhere,Lost,2025-08-05,,,,,,,\n'
+    )
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='migrator', password='secret123')
+        self.client.force_authenticate(self.user)
+        self.trip = Trip.objects.create(user=self.user, title='Andes', destination='Cusco',
+                                        start_date=date(2025, 8, 1), end_date=date(2025, 8, 9))
+
+    def upload(self, name, content, **data):
+        return self.client.post('/api/imports/', {'file': SimpleUploadedFile(name, content.encode()), **data},
+                                format='multipart')
+
+    def test_csv_import_writes_valid_rows_and_reports_the_rest(self):
+        response = self.upload('trip.csv', self.CSV)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual(response.data['created_count'], 3)
+        self.assertEqual([error['row'] for error in response.data['errors']], [4, 5])
+        self.assertIn('name', response.data['errors'][0]['errors'])
+        self.assertEqual(response.data['errors'][1]['errors'], {'trip': ['Unknown trip.']})
+
+        ticket = Expense.objects.get(booking_reference='TK-1')
+        self.assertEqual(ticket.activity, Activity.objects.get(booking_reference='MP-1'))
+        self.assertEqual(Trip.objects.get(pk=self.trip.pk).actual_cost, Decimal('92.50'))
+
+        again = self.upload('trip.csv', self.CSV)
+        self.assertEqual(again.data['created_count'], 0)
+        self.assertEqual(again.data['skipped_count'], 3)
+        self.assertEqual(Expense.objects.count(), 2)
+
+    def test_ical_import_into_default_trip(self):
+        calendar = (
+            'BEGIN:VCALENDAR\r\nBEGIN:VEVENT\r\nUID:evt-1@example.com\r\nDTSTART:20250806T093000\r\n'
+            'SUMMARY:Rainbow\r\n  Mountain hike\r\nLOCATION:Vinicunca\\, Peru\r\nEND:VEVENT\r\n'
+            'BEGIN:VEVENT\r\nUID:evt-2@example.com\r\nDTSTART;VALUE=DATE:20250807\r\nSUMMARY:Rest day\r\n'
+            'END:VEVENT\r\nEND:VCALENDAR\r\n'
+        )
+        response = self.upload('calendar.ics', calendar, trip=self.trip.pk)
+        self.assertEqual(response.data['created_count'], 2)
+        hike = Activity.objects.get(booking_reference='evt-1@example.com')
+        self.assertEqual((hike.name, hike.location, str(hike.time)), ('Rainbow Mountain hike', 'Vinicunca, Peru', '09:30:00'))
+
+    def test_large_files_are_queued_for_the_worker(self):
+        rows = [{'trip': self.trip.pk, 'name': f'Stop {i}', 'date': '2025-08-02'} for i in range(30)]
+        with override_settings(IMPORT_INLINE_MAX_BYTES=0):
+            response = self.upload('plan.json', json.dumps(rows))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertFalse(Activity.objects.exists())
+
+        call_command('run_import_worker', '--once', '--chunk-size=8', stdout=StringIO())
+        progress = self.client.get(f'/api/imports/{response.data["id"]}/')
+        self.assertEqual((progress.data['status'], progress.data['position']), ('completed', 30))
+        self.assertEqual(Activity.objects.count(), 30)
+        self.assertEqual(Trip.objects.get(pk=self.trip.pk).version, 4)
+
+    def test_numeric_titles_are_not_trip_ids(self):
+        numbered = Trip.objects.create(user=self.user, title=str(self.trip.pk), destination='Lima',
+                                       start_date=date(2025, 9, 1), end_date=date(2025, 9, 3))
+        content = (
+            'trip,trip_id,name,date\n'
+            f'{self.trip.pk},,Ceviche,2025-09-01\n'
+            f',{self.trip.pk},Salkantay,2025-08-02\n'
+            ',later,Nowhere,2025-08-02\n'
+        )
+        response = self.upload('mixed.csv', content)
+        self.assertEqual(response.data['created_count'], 2)
+        self.assertEqual(Activity.objects.get(name='Ceviche').trip, numbered)
+        self.assertEqual(Activity.objects.get(name='Salkantay').trip, self.trip)
+        self.assertEqual(response.data['errors'], [{'row': 3, 'errors': {'trip_id': ['trip_id must be an integer.']}}])
+
+    def test_unexpected_errors_fail_the_job_at_its_last_chunk(self):
+        lines = [json.dumps({'trip': self.trip.pk, 'name': f'Stop {i}', 'date': '2025-08-02'}) for i in range(6)]
+        job = ImportJob.objects.create(user=self.user, format='json',
+                                       file=SimpleUploadedFile('plan.jsonl', '\n'.join(lines).encode()))
+        write = ChunkWriter.write
+        calls = []
+
+        def flaky(writer, chunk):
+            calls.append(chunk)
+            if len(calls) == 2:
+                raise IntegrityError('duplicate key')
+            return write(writer, chunk)
+
+        with mock.patch.object(ChunkWriter, 'write', flaky), self.assertLogs('trips.imports', 'ERROR'):
+            run_import(job, chunk_size=2)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.position, job.created_count), ('failed', 2, 2))
+        self.assertIn('duplicate key', job.message)
+
+        response = self.client.post(f'/api/imports/{job.pk}/resume/')
+        self.assertEqual(response.status_code, 202)
+        run_import(ImportJob.objects.get(pk=job.pk), chunk_size=2)
+        self.assertEqual(Activity.objects.count(), 6)
+
+    def test_interrupted_job_resumes_from_its_position(self):
+        lines = [json.dumps({'trip': self.trip.pk, 'name': f'Stop {i}', 'date': '2025-08-02'}) for i in range(5)]
+        job = ImportJob.objects.create(user=self.user, format='json', position=2,
+                                       file=SimpleUploadedFile('plan.jsonl', '\n'.join(lines).encode()))
+        run_import(job)
+        self.assertEqual(sorted(Activity.objects.values_list('name', flat=True)), ['Stop 2', 'Stop 3', 'Stop 4'])
+        self.assertEqual(job.position, 5)
+
+
+class FastSerializerParityTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(username='auditor', password='secret123', role='admin',
+                                              email='a@example.com', first_name='Ada')
+        self.client.force_authenticate(self.admin)
+        orphan = Trip.objects.create(title='Orphan', destination='Nowhere', start_date=date(2025, 1, 1),
+                                     end_date=date(2025, 1, 1))
+        for i in range(4):
+            trip = Trip.objects.create(user=self.admin, title=f'Trip {i}', destination='Kyoto', budget='1234.5',
+                                       start_date=date(2025, 3, 1 + i), end_date=date(2025, 3, 10), status='upcoming')
+            activity = Activity.objects.create(trip=trip, name='Temple', date=date(2025, 3, 2 + i),
+                                               time='09:15:00' if i % 2 else None, cost='7.1' if i else None,
+                                               completed=bool(i % 2), rating=4)
+            Activity.objects.create(trip=trip, name='Walk', date=date(2025, 3, 3))
+            for day in range(2):
+                Expense.objects.create(trip=trip, activity=activity if day else None, description='Tea',
+                                       amount='3.333', category='food', date=date(2025, 3, 2 + day))
+        Trip.objects.filter(pk=orphan.pk).update(image='trip_images/orphan.jpg')
+
+    def assertParity(self, viewset, url):
+        fast = self.client.get(url)
+        with mock.patch.object(viewset, 'fast_list', False):
+            slow = self.client.get(url)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, slow.content)
+
+    def test_trip_lists_match_drf_output(self):
+        for url in ['/api/trips/', '/api/trips/?ordering=budget', '/api/trips/?pagination=cursor&page_size=2',
+                    '/api/trips/?search=kyoto', '/api/trips/?status=upcoming&page=2&page_size=3']:
+            with self.subTest(url=url):
+                self.assertParity(TripViewSet, url)
+
+    def test_activity_and_expense_lists_match_drf_output(self):
+        for viewset, url in [(ActivityViewSet, '/api/activities/'), (ActivityViewSet, '/api/activities/?completed=true'),
+                             (ActivityViewSet, '/api/activities/?pagination=cursor&page_size=3'),
+                             (ExpenseViewSet, '/api/expenses/'), (ExpenseViewSet, '/api/expenses/?ordering=amount')]:
+            with self.subTest(url=url):
+                self.assertParity(viewset, url)
+
+    def test_nested_expenses_use_one_query_per_page(self):
+        with self.assertNumQueries(3):
+            self.client.get('/api/activities/')
+
+    def test_direct_use(self):
+        rows = FastSerializer(ExpenseSerializer).prepare(Expense.objects.order_by('pk'))
+        expected = ExpenseSerializer(Expense.objects.order_by('pk'), many=True).data
+        self.assertEqual(FastSerializer(ExpenseSerializer).serialize(rows), expected)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.create_user(username='walker', password='secret123')
+        self.admin = User.objects.create_user(username='chief', password='secret123', role='admin')
+        self.trip = Trip.objects.create(user=self.user, title='Alps', destination='Zermatt', budget='900.00',
+                                        status='upcoming', start_date=date(2025, 7, 1), end_date=date(2025, 7, 6))
+        Activity.objects.create(trip=self.trip, name='Hike', date=date(2025, 7, 2), completed=True)
+        Expense.objects.create(trip=self.trip, description='Lift', amount='45.50', category='transport',
+                               date=date(2025, 7, 2))
+        Checklist.objects.create(trip=self.trip, item='Boots')
+
+    def client_for(self, user):
+        client = APIClient()
+        if user is not None:
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return client
+
+    def assertSameBody(self, user, sync_url, async_url):
+        client = self.client_for(user)
+        expected = client.get(sync_url)
+        get_cache().clear()
+        actual = client.get(async_url)
+        self.assertEqual(actual.status_code, expected.status_code)
+        self.assertEqual(actual.content, expected.content)
+        return actual
+
+    def test_async_variants_return_the_sync_payloads(self):
+        self.assertSameBody(None, f'/api/trips/{self.trip.pk}/statistics/',
+                            f'/api/async/trips/{self.trip.pk}/statistics/')
+        self.assertSameBody(None, '/api/trips/dashboard/', '/api/async/trips/dashboard/')
+        self.assertSameBody(self.user, '/api/auth/dashboard/user/', '/api/auth/async/dashboard/user/')
+
+    def test_async_admin_dashboard(self):
+        client = self.client_for(self.admin)
+        expected = json.loads(client.get('/api/auth/dashboard/admin/').content)
+        actual = json.loads(client.get('/api/auth/async/dashboard/admin/').content)
+        self.assertEqual(actual.pop('snapshot')['source'], 'snapshot')
+        expected.pop('snapshot')
+        self.assertEqual(actual, expected)
+
+    def test_async_views_authenticate_and_authorize(self):
+        self.assertEqual(self.client_for(None).get('/api/auth/async/dashboard/user/').status_code, 401)
+        self.assertEqual(self.client_for(self.user).get('/api/auth/async/dashboard/admin/').status_code, 403)
+        self.assertEqual(self.client_for(self.admin).get('/api/auth/async/dashboard/user/').status_code, 403)
+        bad = APIClient()
+        bad.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        self.assertEqual(bad.get('/api/auth/async/dashboard/user/').status_code, 401)
+        self.assertEqual(self.client_for(None).get('/api/async/trips/999999/statistics/').status_code, 404)
+
+    def test_async_statistics_conditional_get(self):
+        url = f'/api/async/trips/{self.trip.pk}/statistics/'
+        etag = self.client_for(None).get(url)['ETag']
+        self.assertEqual(self.client_for(None).get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_gather_queries_runs_on_separate_threads(self):
+        with mock.patch('trips.concurrent.runs_concurrently', return_value=True):
+            barrier = threading.Barrier(2, timeout=5)
+
+            def query(value):
+                barrier.wait()
+                return value
+
+            self.assertEqual(asyncio.run(gather_queries(lambda: query(1), lambda: query(2))), [1, 2])
+
+    def test_async_health(self):
+        response = self.client_for(None).get('/health/async/')
+        self.assertEqual(response.json()['database'], 'healthy')
+        self.assertEqual(response.json()['cache'], 'healthy')
+
+
+@override_settings(DATABASE_REPLICAS=['default'])
+class ReplicaRoutingTests(TestCase):
+    # The replica alias is 'default' itself, so the routed queries still find the test data.
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.create_user(username='reader', password='pw')
+        self.trip = Trip.objects.create(
+            user=self.user, title='Trip', destination='Lisbon',
+            start_date=date(2025, 5, 1), end_date=date(2025, 5, 4),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def routed_reads(self, method, url, **kwargs):
+        with mock.patch('core.db_router.choose_replica', return_value='default') as choose:
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertLess(response.status_code, 400)
+        return choose.call_count
+
+    def test_read_only_endpoints_use_replica(self):
+        self.assertGreater(self.routed_reads('get', f'/api/trips/{self.trip.pk}/statistics/'), 0)
+        self.assertGreater(self.routed_reads('get', '/api/expenses/'), 0)
+
+    def test_other_requests_use_primary(self):
+        self.assertEqual(self.routed_reads('get', f'/api/trips/{self.trip.pk}/'), 0)
+        # Cached responses are rebuilt from the primary.
+        self.assertEqual(self.routed_reads('get', '/api/trips/'), 0)
+        self.assertEqual(self.routed_reads('get', '/api/auth/dashboard/user/'), 0)
+        self.assertEqual(self.routed_reads('post', '/api/expenses/', data={
+            'trip': self.trip.pk, 'category': 'food', 'amount': '12.50', 'description': 'Lunch',
+            'date': '2025-05-02',
+        }, format='json'), 0)
+
+    def test_writes_inside_replica_reads_go_to_primary(self):
+        from core.db_router import ReplicaRouter, replica_reads
+
+        router = ReplicaRouter()
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Trip), 'default')
+            self.assertEqual(router.db_for_write(Trip, instance=self.trip), 'default')
+        self.assertIsNone(router.db_for_read(Trip))
+
+    def test_executor_queries_inherit_replica_reads(self):
+        from core.db_router import _replica_reads, replica_reads
+
+        async def gather():
+            with replica_reads():
+                return await gather_queries(_replica_reads.get, _replica_reads.get)
+
+        with mock.patch('trips.concurrent.runs_concurrently', return_value=True):
+            self.assertEqual(asyncio.run(gather()), [True, True])
+
+
+class StickyPrimaryTests(TestCase):
+    """A second in-memory SQLite database stands in for a replica that hasn't caught up."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Added after TestCase has set up its databases, so it is neither wrapped in a transaction nor blocked.
+        connections.settings['replica'] = {**connections.settings['default'], 'NAME': ':memory:', 'TEST': {}}
+        call_command('migrate', database='replica', run_syncdb=True, verbosity=0)
+        cls.replica_settings = override_settings(DATABASE_REPLICAS=['replica'], REPLICA_STICKY_SECONDS=30)
+        cls.replica_settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.replica_settings.disable()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        super().tearDownClass()
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.create_user(username='writer', password='pw')
+        self.other = User.objects.create_user(username='watcher', password='pw')
+        self.trip = Trip.objects.create(
+            user=self.user, title='Trip', destination='Lisbon',
+            start_date=date(2025, 5, 1), end_date=date(2025, 5, 4),
+        )
+        Expense.objects.create(trip=self.trip, description='Tram', amount='3.00', category='transport',
+                               date=date(2025, 5, 2))
+
+    def get(self, user, url):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(url).json()
+
+    def expense_count(self, user):
+        return len(self.get(user, '/api/expenses/')['results'])
+
+    def test_reads_go_to_replica(self):
+        self.assertEqual(Expense.objects.using('replica').count(), 0)
+        self.assertEqual(self.expense_count(self.user), 0)
+
+    def test_writer_reads_primary_within_window(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.patch(f'/api/trips/{self.trip.pk}/', {'title': 'Renamed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.expense_count(self.user), 1)
+        with mock.patch('core.db_router.time.time', return_value=time.time() + 31):
+            self.assertEqual(self.expense_count(self.user), 0)
+
+    def test_failed_writes_do_not_pin(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.post('/api/trips/', {}, format='json').status_code, 400)
+        self.assertEqual(self.expense_count(self.user), 0)
+
+    def test_cached_responses_are_built_from_primary(self):
+        # The replica hasn't seen the trip; a cache miss must not store its view under the current version.
+        self.assertEqual(len(self.get(self.other, '/api/trips/')['results']), 1)
+        self.assertEqual(self.get(self.other, '/api/trips/dashboard/')['total_trips'], 1)
+
+    def test_snapshot_refresh_reads_primary(self):
+        from core.db_router import replica_reads
+
+        with replica_reads():
+            snapshot = refresh_snapshot()
+        self.assertEqual(snapshot.data['system_stats']['total_trips'], 1)
+
+
+class ExpenseRollupTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.create_user(username='spender', password='pw')
+        self.other = User.objects.create_user(username='other', password='pw')
+        self.admin = User.objects.create_user(username='boss', password='pw', role='admin')
+        self.trip = Trip.objects.create(
+            user=self.user, title='Trip', destination='Lisbon',
+            start_date=date(2025, 5, 1), end_date=date(2025, 5, 31),
+        )
+
+    def expense(self, amount, day, category='food', currency='USD', trip=None):
+        return Expense.objects.create(trip=trip or self.trip, description='x', amount=Decimal(amount),
+                                      category=category, currency=currency, date=day)
+
+    def rollups(self):
+        return sorted(ExpenseRollup.objects.values_list('trip_id', 'category', 'currency', 'day', 'total', 'count'))
+
+    def expected(self):
+        rows = (Expense.objects.order_by().values('trip_id', 'category', 'currency', 'date')
+                .annotate(total=Sum('amount'), count=Count('pk')))
+        return sorted((row['trip_id'], row['category'], row['currency'], row['date'], row['total'], row['count'])
+                      for row in rows)
+
+    def test_rollups_follow_expense_writes(self):
+        lunch = self.expense('10.00', date(2025, 5, 2))
+        self.expense('5.50', date(2025, 5, 2))
+        hotel = self.expense('100.00', date(2025, 5, 3), category='accommodation', currency='EUR')
+        self.assertEqual(self.rollups(), self.expected())
+
+        lunch.amount, lunch.date = Decimal('12.00'), date(2025, 5, 4)
+        lunch.save()
+        hotel.delete()
+        self.assertEqual(self.rollups(), self.expected())
+
+        Expense.objects.bulk_create([
+            Expense(trip=self.trip, description='b', amount=Decimal('3'), category='food', date=date(2025, 5, 2)),
+            Expense(trip=self.trip, description='c', amount=Decimal('4'), category='transport', date=date(2025, 5, 9)),
+        ])
+        Expense.objects.filter(category='transport').update(category='other')
+        self.assertEqual(self.rollups(), self.expected())
+
+        Expense.objects.filter(date=date(2025, 5, 2)).delete()
+        self.assertEqual(self.rollups(), self.expected())
+
+    def test_rollups_follow_trip_owner(self):
+        self.expense('10.00', date(2025, 5, 2))
+        self.trip.user = self.other
+        self.trip.save()
+        self.assertEqual(set(ExpenseRollup.objects.values_list('user_id', flat=True)), {self.other.pk})
+
+    def test_backfill_rebuilds_rollups(self):
+        self.expense('10.00', date(2025, 5, 2))
+        self.expense('7.00', date(2025, 5, 3), currency='EUR')
+        ExpenseRollup.objects.all().delete()
+        ExpenseRollup.objects.create(trip=self.trip, user=self.user, category='other', currency='USD',
+                                     day=date(2025, 1, 1), total=Decimal('99'), count=3)
+
+        out = StringIO()
+        call_command('backfill_expense_rollups', '--batch-size', '1', stdout=out)
+        self.assertIn('wrote 2 rollup rows', out.getvalue())
+        self.assertEqual(self.rollups(), self.expected())
+
+    def test_spending_endpoint_coarsens_buckets(self):
+        self.expense('10.00', date(2025, 5, 5))
+        self.expense('20.00', date(2025, 5, 6))
+        self.expense('30.00', date(2025, 5, 12))
+        self.expense('40.00', date(2025, 6, 2))
+        other_trip = Trip.objects.create(user=self.other, title='Other', destination='Rome',
+                                         start_date=date(2025, 5, 1), end_date=date(2025, 5, 9))
+        self.expense('500.00', date(2025, 5, 5), trip=other_trip)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        def totals(query):
+            response = client.get(f'/api/analytics/spending/?{query}')
+            self.assertEqual(response.status_code, 200)
+            return [(row['period'], row['total']) for row in response.data['results']]
+
+        self.assertEqual(totals('bucket=month'), [(date(2025, 5, 1), Decimal('60.00')),
+                                                  (date(2025, 6, 1), Decimal('40.00'))])
+        self.assertEqual(totals('bucket=week&end=2025-05-31'), [(date(2025, 5, 5), Decimal('30.00')),
+                                                                (date(2025, 5, 12), Decimal('30.00'))])
+        self.assertEqual(len(totals('bucket=day&start=2025-05-06&end=2025-05-12')), 2)
+
+        self.assertEqual(client.get('/api/analytics/spending/?bucket=year').status_code, 400)
+        self.assertEqual(client.get('/api/analytics/spending/?start=May').status_code, 400)
+        self.assertEqual(client.get('/api/analytics/spending/?scope=all').status_code, 403)
+
+        client.force_authenticate(self.admin)
+        response = client.get('/api/analytics/spending/?scope=all&bucket=month&end=2025-05-31')
+        self.assertEqual([row['total'] for row in response.data['results']], [Decimal('560.00')])
+
+
+class FxConversionTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        clear_rate_cache()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        # ECB layout: units per EUR. 2025-05-03 is a Saturday with no rates.
+        self.load('Date,USD,GBP,JPY\n2025-05-01,1.1000,0.8500,N/A\n2025-05-05,1.2000,0.8000,160\n')
+        self.user = User.objects.create_user(username='traveller', password='pw')
+        self.trip = Trip.objects.create(user=self.user, title='Trip', destination='Paris', currency='EUR',
+                                        start_date=date(2025, 5, 1), end_date=date(2025, 5, 9))
+
+    def load(self, content):
+        path = f'{self.tmp}/rates.csv'
+        with open(path, 'w') as rates:
+            rates.write(content)
+        call_command('load_fx_rates', path, stdout=StringIO())
+
+    def expense(self, amount, currency, day, category='food'):
+        return Expense.objects.create(trip=self.trip, description='x', amount=Decimal(amount), category=category,
+                                      currency=currency, date=day)
+
+    def test_rates_load_and_memoize(self):
+        self.assertEqual(FxRate.objects.filter(currency='EUR').count(), 2)
+        self.assertFalse(FxRate.objects.filter(currency='JPY', date=date(2025, 5, 1)).exists())
+        self.assertEqual(convert(Decimal('11.00'), 'USD', 'EUR', date(2025, 5, 3)), Decimal('10.00'))
+        self.assertEqual(convert(Decimal('12.00'), 'USD', 'GBP', date(2025, 5, 5)), Decimal('8.00'))
+        self.assertEqual(convert(Decimal('1.00'), 'USD', 'EUR', date(2025, 4, 30)), Decimal('1.00'))
+        with self.assertNumQueries(0):
+            convert(Decimal('11.00'), 'USD', 'EUR', date(2025, 5, 4))
+
+        self.load('date,currency,rate\n2025-05-03,USD,1.1500\n')
+        self.assertEqual(convert(Decimal('11.50'), 'USD', 'EUR', date(2025, 5, 3)), Decimal('10.00'))
+
+    def test_loads_in_other_processes_drop_the_memo(self):
+        self.assertEqual(convert(Decimal('11.00'), 'USD', 'EUR', date(2025, 5, 3)), Decimal('10.00'))
+        # Another process loads a rate: the row and the shared version move, this process's memo doesn't.
+        FxRate.objects.create(currency='USD', date=date(2025, 5, 3), rate=Decimal('1.1500'))
+        self.assertEqual(convert(Decimal('11.00'), 'USD', 'EUR', date(2025, 5, 3)), Decimal('10.00'))
+        bump_version()
+        self.assertEqual(convert(Decimal('11.50'), 'USD', 'EUR', date(2025, 5, 3)), Decimal('10.00'))
+
+        version = current_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.load('date,currency,rate\n2025-05-06,USD,1.2500\n')
+        self.assertNotEqual(current_version(), version)
+
+    def test_trip_totals_are_in_trip_currency(self):
+        self.expense('11.00', 'USD', date(2025, 5, 2))
+        self.expense('5.00', 'EUR', date(2025, 5, 2))
+        lodging = self.expense('24.00', 'USD', date(2025, 5, 6), category='accommodation')
+        Expense.objects.bulk_create([Expense(trip=self.trip, description='y', amount=Decimal('8.50'),
+                                             category='food', currency='GBP', date=date(2025, 5, 1))])
+        lodging.amount = Decimal('36.00')
+        lodging.save()
+
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.actual_cost, Decimal('55.00'))
+        stats = trip_statistics(self.trip)
+        self.assertEqual(stats['currency'], 'EUR')
+        self.assertEqual(stats['total_expenses'], Decimal('55.00'))
+        self.assertEqual({row['category']: row['total'] for row in stats['expenses_by_category']},
+                         {'food': Decimal('25.00'), 'accommodation': Decimal('30.00')})
+        self.assertEqual(recompute_trip_costs([self.trip.pk]), 0)
+
+        self.trip.currency = 'USD'
+        self.trip.save()
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.actual_cost, Decimal('63.50'))
+
+    def test_currency_without_rates_counts_at_face_value(self):
+        self.expense('5.00', 'EUR', date(2025, 5, 2))
+        self.expense('20.00', 'CHF', date(2025, 5, 2))
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.actual_cost, Decimal('25.00'))
+        stats = trip_statistics(self.trip)
+        self.assertEqual(stats['total_expenses'], Decimal('25.00'))
+        self.assertEqual(stats['expenses_by_category'], [{'category': 'food', 'total': Decimal('25.00')}])
+        self.assertEqual(recompute_trip_costs([self.trip.pk]), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.load('date,currency,rate\n2025-05-01,CHF,0.8000\n')
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.actual_cost, Decimal('30.00'))
+
+    def test_user_totals_are_in_base_currency(self):
+        self.expense('10.00', 'EUR', date(2025, 5, 2))
+        self.expense('3.00', 'USD', date(2025, 5, 2))
+        client = APIClient()
+        client.force_authenticate(self.user)
+        stats = client.get('/api/auth/dashboard/user/').data['personal_stats']
+        self.assertEqual((stats['total_expenses'], stats['currency']), (14.0, 'USD'))
+
+        response = client.get('/api/analytics/spending/?bucket=month&currency=EUR')
+        self.assertEqual([(row['total'], row['currency']) for row in response.data['results']],
+                         [(Decimal('12.73'), 'EUR')])
+
+
+@override_settings(IMAGE_VARIANT_WORKERS=0, IMAGE_VARIANT_WIDTHS=(320, 640, 1280))
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='photographer', password='secret123')
+        self.client.force_authenticate(self.user)
+
+    def photo(self, size=(800, 600)):
+        image = Image.new('RGB', size, (200, 120, 40))
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera Maker'
+        exif[0x8825] = {2: (52.0, 31.0, 12.0)}  # GPS latitude
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG', exif=exif)
+        return SimpleUploadedFile('holiday.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def open(self, name):
+        with Trip._meta.get_field('image').storage.open(name, 'rb') as stored:
+            image = Image.open(stored)
+            image.load()
+        return image
+
+    def test_upload_generates_stripped_webp_variants_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/trips/', {
+                'title': 'Coast', 'destination': 'Lisbon', 'start_date': '2025-06-01', 'end_date': '2025-06-05',
+                'image': self.photo(),
+            }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+        trip = Trip.objects.get(pk=response.data['id'])
+        self.assertFalse(needs_variants(trip))
+        self.assertEqual(trip.image_variants['source'], trip.image.name)
+        self.assertFalse(self.open(trip.image.name).getexif())
+        self.assertEqual(self.open(trip.image.name).size, (800, 600))
+        # Widths above the original are capped to it.
+        self.assertEqual(sorted(trip.image_variants['widths'], key=int), ['320', '640', '800'])
+        for width, name in trip.image_variants['widths'].items():
+            self.assertRegex(name, rf'^trip_images/variants/[0-9a-f]{{20}}-{width}w\.webp$')
+            variant = self.open(name)
+            self.assertEqual((variant.format, variant.width), ('WEBP', int(width)))
+            self.assertFalse(variant.getexif())
+
+        detail = self.client.get(f'/api/trips/{trip.pk}/').data['image_variants']
+        self.assertEqual(list(detail['urls']), ['320', '640', '800'])
+        self.assertTrue(detail['urls']['320'].startswith('http://testserver/media/trip_images/variants/'))
+        self.assertEqual(detail['srcset'].split(', ')[0], f"{detail['urls']['320']} 320w")
+        listed = self.client.get('/api/trips/').data['results'][0]
+        self.assertEqual(listed['image_variants'], detail)
+
+    def test_stale_images_are_not_overwritten_and_backfill_catches_up(self):
+        trip = Trip.objects.create(user=self.user, title='Hills', destination='Porto', image=self.photo((400, 300)),
+                                   start_date=date(2025, 6, 1), end_date=date(2025, 6, 5))
+        self.assertTrue(needs_variants(trip))
+        # Stripped on save, before any variant work has run.
+        self.assertFalse(self.open(trip.image.name).getexif())
+        self.assertEqual(self.open(trip.image.name).size, (400, 300))
+        self.assertIsNone(self.client.get(f'/api/trips/{trip.pk}/').data['image_variants'])
+
+        with mock.patch('trips.images.render_variants', side_effect=lambda field: (
+            Trip.objects.filter(pk=trip.pk).update(image='trip_images/replaced.jpg') and (None, {}))):
+            self.assertFalse(generate_variants(trip.pk))
+        self.assertEqual(Trip.objects.get(pk=trip.pk).image_variants, {})
+
+        Trip.objects.filter(pk=trip.pk).update(image=trip.image.name)
+        out = StringIO()
+        call_command('generate_image_variants', stdout=out)
+        self.assertIn('generated variants for 1, 0 failed', out.getvalue())
+        trip.refresh_from_db()
+        self.assertEqual(sorted(trip.image_variants['widths'], key=int), ['320', '400'])
+        call_command('generate_image_variants', stdout=out)
+        self.assertIn('generated variants for 0, 0 failed', out.getvalue())
+
+
+class ChildOwnerTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.alice = User.objects.create_user(username='alice', password='pw')
+        self.bob = User.objects.create_user(username='bob', password='pw')
+        self.trip = Trip.objects.create(user=self.alice, title='Fjords', destination='Bergen',
+                                        start_date=date(2025, 7, 1), end_date=date(2025, 7, 6))
+        self.other = Trip.objects.create(user=self.bob, title='Coast', destination='Split',
+                                         start_date=date(2025, 8, 1), end_date=date(2025, 8, 6))
+
+    def owners(self):
+        return {
+            model.__name__: set(model.objects.values_list('trip_id', 'owner_id'))
+            for model in (Activity, Expense, Checklist)
+        }
+
+    def add_children(self, trip_id):
+        Activity.objects.bulk_create([Activity(trip_id=trip_id, name='Hike', date=date(2025, 7, 2))])
+        Expense.objects.create(trip_id=trip_id, description='Ferry', amount=Decimal('30.00'), category='transport',
+                               date=date(2025, 7, 2))
+        Checklist.objects.create(trip_id=trip_id, item='Raincoat')
+
+    def test_owner_follows_the_trip(self):
+        self.add_children(self.trip.pk)
+        expected = {(self.trip.pk, self.alice.pk)}
+        self.assertEqual(self.owners(), {'Activity': expected, 'Expense': expected, 'Checklist': expected})
+
+        self.trip.user = self.bob
+        self.trip.save()
+        expected = {(self.trip.pk, self.bob.pk)}
+        self.assertEqual(self.owners(), {'Activity': expected, 'Expense': expected, 'Checklist': expected})
+
+        Trip.objects.filter(pk=self.trip.pk).update(user=self.alice)
+        expected = {(self.trip.pk, self.alice.pk)}
+        self.assertEqual(self.owners(), {'Activity': expected, 'Expense': expected, 'Checklist': expected})
+        self.assertEqual(set(ExpenseRollup.objects.values_list('trip_id', 'user_id')), expected)
+
+        Expense.objects.update(trip=self.other)
+        item = Checklist.objects.get()
+        item.trip_id = self.other.pk
+        item.save(update_fields=['trip'])
+        self.assertEqual(self.owners()['Expense'], {(self.other.pk, self.bob.pk)})
+        self.assertEqual(self.owners()['Checklist'], {(self.other.pk, self.bob.pk)})
+
+    def test_scoped_lists_skip_the_trip_join(self):
+        self.add_children(self.trip.pk)
+        self.add_children(self.other.pk)
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        for url in ('/api/activities/', '/api/expenses/', '/api/checklist/'):
+            with CaptureQueriesContext(connections['default']) as queries:
+                response = client.get(url)
+            data = response.data['results'] if isinstance(response.data, dict) else response.data
+            self.assertEqual([row['trip'] for row in data], [self.trip.pk], url)
+            self.assertNotIn('owner', data[0])
+            scoped = [query['sql'] for query in queries if '"owner_id"' in query['sql']]
+            self.assertTrue(scoped, url)
+            self.assertFalse([sql for sql in scoped if 'trips_trip' in sql], url)
+
+    def test_migration_backfills_missing_owners(self):
+        self.add_children(self.trip.pk)
+        for model in (Activity, Expense, Checklist):
+            model.objects.update(owner=None)
+        migration = importlib.import_module('trips.migrations.0012_backfill_child_owner')
+        migration.backfill_owners(django_apps, mock.Mock(connection=connections['default']))
+        expected = {(self.trip.pk, self.alice.pk)}
+        self.assertEqual(self.owners(), {'Activity': expected, 'Expense': expected, 'Checklist': expected})
+
+
+class CalendarTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.alice = User.objects.create_user(username='alice', password='pw')
+        self.bob = User.objects.create_user(username='bob', password='pw')
+        self.admin = User.objects.create_user(username='admin', password='pw', role='admin')
+        self.trip = Trip.objects.create(user=self.alice, title='Fjords', destination='Bergen',
+                                        start_date=date(2025, 6, 28), end_date=date(2025, 7, 3))
+        self.later = Trip.objects.create(user=self.alice, title='Alps', destination='Zermatt',
+                                         start_date=date(2025, 8, 1), end_date=date(2025, 8, 5))
+        self.other = Trip.objects.create(user=self.bob, title='Coast', destination='Split',
+                                         start_date=date(2025, 7, 1), end_date=date(2025, 7, 1))
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def add_activity(self, trip, name, day, start=None, end=None):
+        return Activity.objects.create(trip=trip, name=name, date=date(2025, 7, day), time=start, end_time=end)
+
+    def test_conflicts_within_a_trip(self):
+        breakfast = self.add_activity(self.trip, 'Breakfast', 1, clock(8), clock(9))
+        tour = self.add_activity(self.trip, 'Tour', 1, clock(8, 30), clock(12))
+        lunch = self.add_activity(self.trip, 'Lunch', 1, clock(12))
+        museum = self.add_activity(self.trip, 'Museum', 1, clock(11, 45))
+        self.add_activity(self.trip, 'Beach', 1)
+        self.add_activity(self.other, 'Ferry', 1, clock(8), clock(9))
+        night = self.add_activity(self.trip, 'Night train', 2, clock(23), clock(6))
+        early = self.add_activity(self.trip, 'Sunrise', 3, clock(5))
+
+        pairs = {(first.pk, second.pk) for first, second in find_conflicts(Activity.objects.all())}
+        # Tour ends at 12:00 as lunch starts, so they touch without clashing.
+        self.assertEqual(pairs, {(breakfast.pk, tour.pk), (tour.pk, museum.pk), (museum.pk, lunch.pk),
+                                 (night.pk, early.pk)})
+
+    def test_calendar_window(self):
+        tour = self.add_activity(self.trip, 'Tour', 1, clock(9), clock(11))
+        talk = self.add_activity(self.trip, 'Talk', 1, clock(10))
+        self.add_activity(self.trip, 'Packing', 5)
+        self.add_activity(self.other, 'Ferry', 1, clock(9))
+
+        response = self.client.get('/api/calendar/', {'start': '2025-07-01', 'end': '2025-07-02'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['trips']], [self.trip.pk])
+        self.assertEqual([row['name'] for row in response.data['activities']], ['Tour', 'Talk'])
+        self.assertEqual(response.data['conflicts'], [{'trip': self.trip.pk, 'activities': [tour.pk, talk.pk]}])
+
+        response = self.client.get('/api/calendar/', {'start': '2025-07-03', 'end': '2025-08-01'})
+        self.assertEqual([row['id'] for row in response.data['trips']], [self.trip.pk, self.later.pk])
+
+    def test_calendar_follows_trip_changes(self):
+        params = {'start': '2025-09-01', 'end': '2025-09-30'}
+        self.assertEqual(self.client.get('/api/calendar/', params).data['trips'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.later.start_date, self.later.end_date = date(2025, 8, 30), date(2025, 9, 2)
+            self.later.save()
+        self.assertEqual([row['id'] for row in self.client.get('/api/calendar/', params).data['trips']],
+                         [self.later.pk])
+
+    def test_calendar_scope_and_validation(self):
+        params = {'start': '2025-07-01', 'end': '2025-07-01', 'scope': 'all'}
+        self.assertEqual(self.client.get('/api/calendar/', params).status_code, 403)
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/calendar/', params)
+        self.assertEqual({row['id'] for row in response.data['trips']}, {self.trip.pk, self.other.pk})
+
+        for bad in ({'start': '2025-07-01'}, {'start': '2025-07-02', 'end': '2025-07-01'},
+                    {'start': 'soon', 'end': '2025-07-01'}, {'start': '2025-01-01', 'end': '2026-06-01'}):
+            self.assertEqual(self.client.get('/api/calendar/', bad).status_code, 400, bad)
+
+    @override_settings(CALENDAR_ALL_MAX_DAYS=31, CALENDAR_MAX_ROWS=1)
+    def test_calendar_bounds_every_user_view(self):
+        self.add_activity(self.trip, 'Tour', 1, clock(9))
+        self.add_activity(self.trip, 'Talk', 2, clock(10))
+        self.client.force_authenticate(self.admin)
+        params = {'start': '2025-07-01', 'end': '2025-08-15', 'scope': 'all'}
+        self.assertEqual(self.client.get('/api/calendar/', params).status_code, 400)
+
+        response = self.client.get('/api/calendar/', {**params, 'trip': self.trip.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['truncated'])
+        self.assertEqual([row['name'] for row in response.data['activities']], ['Tour'])
+
+    def test_trip_dates_must_be_ordered(self):
+        response = self.client.post('/api/trips/', {'title': 'Back', 'destination': 'Oslo',
+                                                    'start_date': '2025-07-05', 'end_date': '2025-07-01'},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('end_date', response.data)
+        response = self.client.patch(f'/api/trips/{self.trip.pk}/', {'end_date': '2025-06-01'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        with self.assertRaises(IntegrityError):
+            Trip.objects.filter(pk=self.trip.pk).update(end_date=date(2025, 6, 1))
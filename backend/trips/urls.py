@@ -1,13 +1,19 @@
 ﻿from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TripViewSet, ActivityViewSet, ExpenseViewSet, ChecklistViewSet
+from . import async_views
+from .views import TripViewSet, ActivityViewSet, ExpenseViewSet, ChecklistViewSet, ImportJobViewSet, SpendingAnalyticsView, CalendarView
 
 router = DefaultRouter()
 router.register(r'trips', TripViewSet, basename='trip')
 router.register(r'activities', ActivityViewSet, basename='activity')
 router.register(r'expenses', ExpenseViewSet, basename='expense')
 router.register(r'checklist', ChecklistViewSet, basename='checklist')
+router.register(r'imports', ImportJobViewSet, basename='import')
 
 urlpatterns = [
+    path('async/trips/dashboard/', async_views.trip_dashboard, name='async-trip-dashboard'),
+    path('async/trips/<int:pk>/statistics/', async_views.trip_statistics, name='async-trip-statistics'),
+    path('analytics/spending/', SpendingAnalyticsView.as_view(), name='spending-analytics'),
+    path('calendar/', CalendarView.as_view(), name='calendar'),
     path('', include(router.urls)),
 ]
@@ -1,87 +1,168 @@
-﻿from rest_framework import viewsets, filters, status
+﻿from rest_framework import viewsets, filters, status, mixins
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.views import APIView
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Trip, Activity, Expense, Checklist
-from .serializers import (TripSerializer, TripListSerializer, ActivitySerializer,
-                          ExpenseSerializer, ChecklistSerializer)
+from core.db_router import ReplicaReadsMixin
+from .models import Trip, Activity, Expense, Checklist, ImportJob, ExpenseRollup
+from .serializers import (TripSerializer, TripListSerializer, ActivitySerializer, CalendarActivitySerializer,
+                          ExpenseSerializer, ChecklistSerializer, ImportJobSerializer)
+from .bulk import BulkWriteMixin
+from .cache import cached_response
+from .calendar import find_conflicts, overlapping_trips
+from .fast_serializers import FastListMixin
+from .export import FORMATS, export_stream, scoped_trips
+from .concurrent import run_queries
+from .dashboard import trip_dashboard_queries
+from .conditional import make_etag, not_modified, set_validators, trip_token
+from .pagination import KeysetPagination
+from .rollups import BUCKETS, spending_series
+from .search import FullTextSearchFilter
+from .statistics import trip_statistics, bulk_trip_statistics
 from django.db.models import Sum, Count, Q
 
-class TripViewSet(viewsets.ModelViewSet):
+class TripViewSet(ReplicaReadsMixin, FastListMixin, viewsets.ModelViewSet):
     permission_classes = [AllowAny]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'destination']
     search_fields = ['title', 'destination', 'description']
     ordering_fields = ['start_date', 'created_at', 'budget']
+    max_bulk_statistics = 100
+    replica_actions = ('list', 'statistics', 'bulk_statistics', 'dashboard')
 
     def get_queryset(self):
-        return Trip.objects.all().order_by('-created_at')
+        queryset = Trip.objects.all()
+        if self.action == 'statistics':
+            queryset = queryset.with_statistics()
+        elif self.action in ('retrieve', 'update', 'partial_update'):
+            queryset = queryset.for_detail()
+        elif self.action == 'list':
+            queryset = queryset.for_list()
+        return queryset.order_by('-created_at')
 
     def get_serializer_class(self):
         if self.action == 'list':
             return TripListSerializer
         return TripSerializer
     
+    def conditional(self, request, token, build, last_modified=None):
+        """Answer with 304 when ``token`` still matches the client's ETag, else ``build()`` the response."""
+        etag = make_etag(request.get_host(), request.get_full_path(), *token)
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            response = set_validators(build(), etag, last_modified)
+        return response
+
+    def detail_token(self):
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        return trip_token(pk) if str(pk).isdigit() else None
+
+    def list(self, request, *args, **kwargs):
+        def build():
+            return super(TripViewSet, self).list(request, *args, **kwargs).data
+
+        return cached_response(request, 'trips', build, scopes=['trips', 'activities'],
+                               token=request.get_full_path())
+
+    def retrieve(self, request, *args, **kwargs):
+        token = self.detail_token()
+        if token is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        def build():
+            return self.get_serializer(self.get_object()).data
+
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        # The owner's scope too: the payload embeds their user row.
+        scopes = [f'user:{token[2]}'] if token[2] is not None else []
+        return cached_response(request, f'trip:{pk}', build, scopes=scopes, token=token[:2],
+                               last_modified=token[1])
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
     @action(detail=True, methods=['get'])
     def activities(self, request, pk=None):
-        trip = self.get_object()
-        activities = trip.activities.all()
-        serializer = ActivitySerializer(activities, many=True)
-        return Response(serializer.data)
+        def build():
+            trip = self.get_object()
+            activities = trip.activities.prefetch_related('expenses')
+            serializer = ActivitySerializer(activities, many=True)
+            return Response(serializer.data)
+
+        token = self.detail_token()
+        if token is None:
+            return build()
+        return self.conditional(request, token, build, last_modified=token[1])
 
     @action(detail=True, methods=['get'])
     def statistics(self, request, pk=None):
         trip = self.get_object()
-        stats = {
-            'total_activities': trip.activities.count(),
-            'completed_activities': trip.activities.filter(completed=True).count(),
-            'total_expenses': trip.expenses.aggregate(total=Sum('amount'))['total'] or 0,
-            'expenses_by_category': list(
-                trip.expenses.values('category')
-                .annotate(total=Sum('amount'))
-                .order_by('-total')
-            ),
-            'checklist_progress': {
-                'total': trip.checklist_items.count(),
-                'completed': trip.checklist_items.filter(completed=True).count()
-            },
-            'budget_status': {
-                'budget': float(trip.budget) if trip.budget else 0,
-                'spent': float(trip.actual_cost),
-                'remaining': float(trip.budget_remaining) if trip.budget_remaining else 0
-            }
-        }
-        return Response(stats)
+        token = (trip.version, trip.updated_at)
+        return self.conditional(request, token, lambda: Response(trip_statistics(trip)), last_modified=trip.updated_at)
+
+    @action(detail=False, methods=['get'])
+    def bulk_statistics(self, request):
+        ids = [value for value in request.query_params.get('ids', '').split(',') if value.strip()]
+        if not ids or not all(value.strip().isdigit() for value in ids):
+            return Response({'error': 'ids must be a comma-separated list of trip ids'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.max_bulk_statistics:
+            return Response({'error': f'At most {self.max_bulk_statistics} trips per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        trips = self.get_queryset().filter(pk__in=[int(value) for value in ids])
+        return Response(bulk_trip_statistics(trips))
 
     @action(detail=False, methods=['get'])
     def dashboard(self, request):
-        trips = self.get_queryset()
-        data = {
-            'total_trips': trips.count(),
-            'upcoming_trips': trips.filter(status='upcoming').count(),
-            'ongoing_trips': trips.filter(status='ongoing').count(),
-            'completed_trips': trips.filter(status='completed').count(),
-            'recent_trips': TripListSerializer(trips[:5], many=True).data,
-        }
-        return Response(data)
-
-class ActivityViewSet(viewsets.ModelViewSet):
+        def build():
+            return run_queries(trip_dashboard_queries(self.get_queryset()))
+
+        return cached_response(request, 'trip-dashboard', build, scopes=['trips', 'activities'])
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def export(self, request):
+        export_format = request.query_params.get('output', 'csv')
+        if export_format not in FORMATS:
+            return Response({'error': f'output must be one of: {", ".join(FORMATS)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        trips = scoped_trips(request.user)
+        try:
+            if request.query_params.get('trip'):
+                trips = trips.filter(pk=int(request.query_params['trip']))
+            if request.query_params.get('user'):
+                trips = trips.filter(user_id=int(request.query_params['user']))
+        except ValueError:
+            return Response({'error': 'trip and user must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(export_stream(trips, export_format),
+                                         content_type=FORMATS[export_format][1])
+        filename = f'trips-{timezone.now():%Y%m%d}.{export_format}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+class ActivityViewSet(ReplicaReadsMixin, FastListMixin, BulkWriteMixin, viewsets.ModelViewSet):
     queryset = Activity.objects.all()
     serializer_class = ActivitySerializer
     permission_classes = [AllowAny]
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
     filterset_fields = ['trip', 'category', 'completed']
+    search_fields = ['name', 'location', 'notes']
+    bulk_prefetch = ('expenses',)
     ordering_fields = ['date', 'time']
+    replica_actions = ('list',)
     
     def get_queryset(self):
         user = self.request.user
         if user.role == 'admin' or user.role == 'superadmin':
-            return Activity.objects.all()
-        return Activity.objects.filter(trip__user=user)
+            return Activity.objects.prefetch_related('expenses')
+        return Activity.objects.filter(owner=user).prefetch_related('expenses')
 
     @action(detail=True, methods=['post'])
     def toggle_complete(self, request, pk=None):
@@ -90,21 +171,24 @@ class ActivityViewSet(viewsets.ModelViewSet):
         activity.save()
         return Response({'completed': activity.completed})
 
-class ExpenseViewSet(viewsets.ModelViewSet):
+class ExpenseViewSet(ReplicaReadsMixin, FastListMixin, BulkWriteMixin, viewsets.ModelViewSet):
     queryset = Expense.objects.all()
     serializer_class = ExpenseSerializer
     permission_classes = [AllowAny]
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
     filterset_fields = ['trip', 'category']
+    search_fields = ['description']
     ordering_fields = ['date', 'amount']
+    replica_actions = ('list',)
     
     def get_queryset(self):
         user = self.request.user
         if user.role == 'admin' or user.role == 'superadmin':
             return Expense.objects.all()
-        return Expense.objects.filter(trip__user=user)
+        return Expense.objects.filter(owner=user)
 
-class ChecklistViewSet(viewsets.ModelViewSet):
+class ChecklistViewSet(BulkWriteMixin, viewsets.ModelViewSet):
     queryset = Checklist.objects.all()
     serializer_class = ChecklistSerializer
     permission_classes = [AllowAny]
@@ -115,7 +199,7 @@ class ChecklistViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.role == 'admin' or user.role == 'superadmin':
             return Checklist.objects.all()
-        return Checklist.objects.filter(trip__user=user)
+        return Checklist.objects.filter(owner=user)
 
     @action(detail=True, methods=['post'])
     def toggle(self, request, pk=None):
@@ -124,5 +208,151 @@ class ChecklistViewSet(viewsets.ModelViewSet):
         item.save()
         return Response({'completed': item.completed})
 
+class ImportJobViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                       viewsets.GenericViewSet):
+    serializer_class = ImportJobSerializer
+    permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        user = self.request.user
+        if user.role == 'admin' or user.role == 'superadmin':
+            return ImportJob.objects.all()
+        return ImportJob.objects.filter(user=user)
+
+    def create(self, request, *args, **kwargs):
+        from .imports import run_import
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = serializer.save(user=request.user)
+        if job.file.size > settings.IMPORT_INLINE_MAX_BYTES:
+            return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+        run_import(job)
+        return Response(self.get_serializer(job).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def resume(self, request, pk=None):
+        job = self.get_object()
+        if job.status != 'failed':
+            return Response({'error': 'Only failed imports can be resumed'}, status=status.HTTP_400_BAD_REQUEST)
+        job.status = 'pending'
+        job.save(update_fields=['status', 'updated_at'])
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+class SpendingAnalyticsView(ReplicaReadsMixin, APIView):
+    """Spending per day/week/month and category, read from the daily expense rollups.
+
+    ``scope=all`` (admins only) covers every user; otherwise the caller's trips.
+    ``currency`` converts the totals into one currency instead of one row per currency.
+    """
+    permission_classes = [IsAuthenticated]
+    replica_actions = ('get',)
+
+    def get(self, request):
+        params = request.query_params
+        user = request.user
+        bucket = params.get('bucket', 'month')
+        if bucket not in BUCKETS:
+            return Response({'error': f'bucket must be one of: {", ".join(BUCKETS)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start, end = (parse_date(params[name]) if params.get(name) else None for name in ('start', 'end'))
+            if (params.get('start') and start is None) or (params.get('end') and end is None):
+                raise ValueError
+            trip = int(params['trip']) if params.get('trip') else None
+        except ValueError:
+            return Response({'error': 'start and end must be YYYY-MM-DD dates and trip an integer'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        rollups = ExpenseRollup.objects.all()
+        if params.get('scope') == 'all':
+            if not (user.role == 'admin' or user.role == 'superadmin'):
+                return Response({'error': 'Only admins can see system-wide spending'},
+                                status=status.HTTP_403_FORBIDDEN)
+            scopes = ['trips', 'expenses']
+        else:
+            rollups = rollups.filter(user=user)
+            scopes = [f'user:{user.pk}']
+        if start:
+            rollups = rollups.filter(day__gte=start)
+        if end:
+            rollups = rollups.filter(day__lte=end)
+        if trip is not None:
+            rollups = rollups.filter(trip_id=trip)
+        if params.get('category'):
+            rollups = rollups.filter(category=params['category'])
+
+        currency = params.get('currency', '').upper() or None
+
+        def build():
+            return {'bucket': bucket, 'results': spending_series(rollups, bucket, currency)}
+
+        return cached_response(request, 'spending', build, scopes=scopes, token=request.get_full_path())
+
+
+class CalendarView(ReplicaReadsMixin, APIView):
+    """Trips and activities falling in the ``start``..``end`` window, plus clashing activities.
+
+    A trip is included when its dates overlap the window at all. ``conflicts``
+    lists pairs of activities on the same trip whose time slots overlap.
+    ``scope=all`` (admins only) covers every user, over a shorter window
+    unless narrowed to one ``trip``; otherwise the caller's trips. Rows are
+    capped at ``CALENDAR_MAX_ROWS`` each, earliest first, with ``truncated``
+    set when more matched.
+    """
+    permission_classes = [IsAuthenticated]
+    replica_actions = ('get',)
+
+    def get(self, request):
+        params = request.query_params
+        user = request.user
+        try:
+            start, end = (parse_date(params.get(name, '')) for name in ('start', 'end'))
+            if start is None or end is None:
+                raise ValueError
+            trip = int(params['trip']) if params.get('trip') else None
+        except ValueError:
+            return Response({'error': 'start and end must be YYYY-MM-DD dates and trip an integer'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        max_days = settings.CALENDAR_MAX_DAYS
+        if params.get('scope') == 'all' and trip is None:
+            max_days = settings.CALENDAR_ALL_MAX_DAYS
+        if end < start or (end - start).days >= max_days:
+            return Response({'error': f'end must fall within {max_days} days on or after start'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        trips = Trip.objects.for_list()
+        activities = Activity.objects.filter(date__gte=start, date__lte=end)
+        if params.get('scope') == 'all':
+            if not (user.role == 'admin' or user.role == 'superadmin'):
+                return Response({'error': 'Only admins can see every calendar'},
+                                status=status.HTTP_403_FORBIDDEN)
+            owner = None
+            scopes = ['trips', 'activities']
+        else:
+            owner = user
+            activities = activities.filter(owner=user)
+            scopes = [f'user:{user.pk}']
+        if trip is not None:
+            trips = trips.filter(pk=trip)
+            activities = activities.filter(trip_id=trip)
+
+        def build():
+            limit = settings.CALENDAR_MAX_ROWS
+            trip_rows = list(overlapping_trips(trips, start, end, user=owner).order_by('start_date', 'pk')[:limit + 1])
+            activity_rows = list(activities.order_by('date', 'time', 'pk')[:limit + 1])
+            truncated = len(trip_rows) > limit or len(activity_rows) > limit
+            trip_rows, activity_rows = trip_rows[:limit], activity_rows[:limit]
+            return {
+                'start': start,
+                'end': end,
+                'truncated': truncated,
+                'trips': TripListSerializer(trip_rows, many=True, context={'request': request}).data,
+                'activities': CalendarActivitySerializer(activity_rows, many=True).data,
+                'conflicts': [
+                    {'trip': first.trip_id, 'activities': [first.pk, second.pk]}
+                    for first, second in find_conflicts(activity_rows)
+                ],
+            }
 
+        return cached_response(request, 'calendar', build, scopes=scopes, token=request.get_full_path())
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+class UsersConfig(AppConfig):
+    name = 'users'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.models.signals import post_save, post_delete
+        from .authentication import user_changed
+        User = get_user_model()
+        post_save.connect(user_changed, sender=User, dispatch_uid='auth_user_saved')
+        post_delete.connect(user_changed, sender=User, dispatch_uid='auth_user_deleted')
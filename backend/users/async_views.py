@@ -0,0 +1,27 @@
+from trips.cache import acached_response
+from trips.concurrent import arun_queries, async_api_view, render
+
+from .dashboard import admin_dashboard, admin_dashboard_queries, user_dashboard, user_dashboard_queries
+
+
+def is_admin(user):
+    return user.role == 'admin' or user.role == 'superadmin'
+
+
+@async_api_view(permission=is_admin, replica=True)
+async def admin_dashboard_view(request):
+    """Async ``/dashboard/admin/``: snapshot, recent users and recent trips are loaded concurrently."""
+    return render(admin_dashboard(await arun_queries(admin_dashboard_queries())))
+
+
+@async_api_view(permission=lambda user: True, replica=True)
+async def user_dashboard_view(request):
+    """Async ``/dashboard/user/``: the eight dashboard queries run concurrently on a cache miss."""
+    user = request.user
+    if is_admin(user):
+        return render({'error': 'Admins should use admin dashboard'}, status=403)
+
+    async def build():
+        return user_dashboard(await arun_queries(user_dashboard_queries(user)))
+
+    return await acached_response(request, 'user-dashboard', build, scopes=[f'user:{user.pk}'])
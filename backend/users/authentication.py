@@ -0,0 +1,122 @@
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+User = get_user_model()
+
+_principals = {}
+_principals_lock = threading.Lock()
+
+
+def principal_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def principal_version_key(user_id):
+    return f'auth:user:{user_id}:version'
+
+
+def principal_fields():
+    # The password hash never leaves the database; it loads on demand if a view needs it.
+    return [field.attname for field in User._meta.concrete_fields if field.attname != 'password']
+
+
+def load_principal(user_id):
+    """Column values of user ``user_id``, from this process, the shared cache or the primary, in that order.
+
+    Returns ``None`` for unknown users. Entries expire after
+    ``AUTH_USER_CACHE_SECONDS`` in the shared cache and
+    ``AUTH_USER_LOCAL_CACHE_SECONDS`` in each process. Shared entries carry
+    the user's version as it was before the row was read, and only count
+    while it is still current: a reader that loaded the row just before
+    ``forget_user`` ran can't put the old values back.
+    """
+    now = time.time()
+    with _principals_lock:
+        entry = _principals.get(user_id)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    cache = caches[settings.RESPONSE_CACHE_ALIAS]
+    key, version_key = principal_key(user_id), principal_version_key(user_id)
+    cached = cache.get_many([key, version_key])
+    version = cached.get(version_key)
+    if version is None:
+        # A fresh value, so entries stored under an evicted version never match it.
+        cache.add(version_key, now, timeout=None)
+        version = cache.get(version_key)
+    entry = cached.get(key)
+    if entry is None or entry[0] <= now or entry[2] != version:
+        users = User.objects.using(DEFAULT_DB_ALIAS).filter(**{api_settings.USER_ID_FIELD: user_id})
+        values = users.values(*principal_fields()).first()
+        window = settings.AUTH_USER_CACHE_SECONDS
+        entry = (now + window, values, version)
+        cache.set(key, entry, timeout=window)
+    local_until = min(entry[0], now + settings.AUTH_USER_LOCAL_CACHE_SECONDS)
+    with _principals_lock:
+        _principals[user_id] = (local_until, entry[1])
+    return entry[1]
+
+
+def forget_user(user_id):
+    """Drop the cached principal of ``user_id`` once the current transaction commits.
+
+    Bumping the version also voids an entry that a concurrent
+    ``load_principal`` stores afterwards from the row it read before.
+    """
+    def forget():
+        cache = caches[settings.RESPONSE_CACHE_ALIAS]
+        cache.set(principal_version_key(user_id), time.time(), timeout=None)
+        cache.delete(principal_key(user_id))
+        with _principals_lock:
+            _principals.pop(user_id, None)
+    transaction.on_commit(forget)
+
+
+def clear_principals():
+    with _principals_lock:
+        _principals.clear()
+
+
+def user_changed(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+def as_user(values):
+    fields = list(values)
+    return User.from_db(DEFAULT_DB_ALIAS, fields, [values[field] for field in fields])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` that resolves the token's user without a query on the hot path.
+
+    The user is rebuilt from cached column values (see ``load_principal``),
+    so role and ``is_active`` changes apply as soon as ``forget_user`` runs
+    (on every save or delete of a user) in the process that made them, and
+    within ``AUTH_USER_LOCAL_CACHE_SECONDS`` everywhere else.
+    """
+
+    def get_user(self, validated_token):
+        if getattr(api_settings, 'CHECK_REVOKE_TOKEN', False):
+            # Needs the password hash, which is not cached.
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        values = load_principal(user_id)
+        if values is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        user = as_user(values)
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
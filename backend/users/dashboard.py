@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Sum
+
+from .serializers import UserSerializer, with_trip_totals
+
+User = get_user_model()
+
+
+def admin_dashboard_queries():
+    """Independent queries behind the admin dashboard; run them with ``run_queries``/``arun_queries``."""
+    from trips.dashboard import get_dashboard_stats
+    from trips.models import Trip
+    from trips.serializers import TripListSerializer
+
+    return {
+        'stats': get_dashboard_stats,
+        'recent_users': lambda: UserSerializer(
+            with_trip_totals(User.objects.order_by('-created_at'))[:5], many=True
+        ).data,
+        'recent_trips': lambda: TripListSerializer(
+            Trip.objects.for_list().order_by('-created_at')[:10], many=True
+        ).data,
+    }
+
+
+def admin_dashboard(results):
+    stats, snapshot = results['stats']
+    return {
+        'system_stats': stats['system_stats'],
+        'users_by_role': stats['users_by_role'],
+        'trips_by_status': stats['trips_by_status'],
+        'recent_users': results['recent_users'],
+        'recent_trips': results['recent_trips'],
+        'top_destinations': stats['top_destinations'],
+        'snapshot': snapshot,
+    }
+
+
+def user_dashboard_queries(user):
+    from trips.fx import base_currency, converted
+    from trips.models import Expense
+    from trips.serializers import TripListSerializer
+
+    trips = user.trips.all()
+    base = base_currency()
+    return {
+        'total_trips': trips.count,
+        'upcoming_trips': lambda: trips.filter(status='upcoming').count(),
+        'ongoing_trips': lambda: trips.filter(status='ongoing').count(),
+        'completed_trips': lambda: trips.filter(status='completed').count(),
+        'total_expenses': lambda: Expense.objects.filter(owner=user).aggregate(
+            total=Sum(converted(base))
+        )['total'],
+        'total_budget': lambda: trips.aggregate(
+            total=Sum(converted(base, amount='budget', on='start_date'))
+        )['total'],
+        'favorite_destinations': lambda: list(
+            trips.values('destination').annotate(count=Count('id')).order_by('-count')[:3]
+        ),
+        'recent_trips': lambda: TripListSerializer(trips.for_list().order_by('-created_at')[:5], many=True).data,
+        'upcoming': lambda: TripListSerializer(
+            trips.for_list().filter(status='upcoming').order_by('start_date')[:3], many=True
+        ).data,
+    }
+
+
+def user_dashboard(results):
+    from trips.fx import base_currency
+
+    return {
+        'personal_stats': {
+            'total_trips': results['total_trips'],
+            'upcoming_trips': results['upcoming_trips'],
+            'ongoing_trips': results['ongoing_trips'],
+            'completed_trips': results['completed_trips'],
+            'total_expenses': float(results['total_expenses'] or 0),
+            'total_budget': float(results['total_budget'] or 0),
+            'currency': base_currency(),
+        },
+        'favorite_destinations': results['favorite_destinations'],
+        'recent_trips': results['recent_trips'],
+        'upcoming_trips': results['upcoming'],
+    }
@@ -1,9 +1,27 @@
 ﻿from rest_framework import serializers
 from django.contrib.auth import authenticate, get_user_model
-from rest_framework_simplejwt.tokens import RefreshToken
+from tokens.tokens import RefreshToken
 
 User = get_user_model()
 
+def with_trip_totals(queryset):
+    """Annotate the ``trips_count`` and ``total_expenses`` that ``UserSerializer`` reads, as two correlated subqueries."""
+    from django.db.models import Count, DecimalField, OuterRef, Subquery, Sum
+    from django.db.models.functions import Coalesce
+    from trips.fx import base_currency, converted
+    from trips.models import Expense, Trip
+
+    money = DecimalField(max_digits=14, decimal_places=2)
+    trips = Trip.objects.filter(user=OuterRef('pk')).order_by().values('user').annotate(value=Count('pk'))
+    expenses = (
+        Expense.objects.filter(owner=OuterRef('pk')).order_by().values('owner')
+        .annotate(value=Sum(converted(base_currency()))).values('value')
+    )
+    return queryset.annotate(
+        trips_count=Coalesce(Subquery(trips.values('value')), 0),
+        total_expenses=Subquery(expenses, output_field=money),
+    )
+
 class UserSerializer(serializers.ModelSerializer):
     trips_count = serializers.SerializerMethodField()
     total_expenses = serializers.SerializerMethodField()
@@ -15,11 +33,18 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
     
     def get_trips_count(self, obj):
+        if hasattr(obj, 'trips_count'):
+            return obj.trips_count
         return obj.trips.count()
     
     def get_total_expenses(self, obj):
-        from django.db.models import Sum
-        total = obj.trips.aggregate(total=Sum('actual_cost'))['total']
+        if hasattr(obj, 'total_expenses'):
+            total = obj.total_expenses
+        else:
+            from django.db.models import Sum
+            from trips.fx import base_currency, converted
+            from trips.models import Expense
+            total = Expense.objects.filter(owner=obj).aggregate(total=Sum(converted(base_currency())))['total']
         return float(total) if total else 0.0
 
 class UserCreateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,154 @@
+import time
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from trips.models import Expense, Trip
+
+from .authentication import CachedJWTAuthentication, clear_principals, load_principal, principal_key
+from .serializers import UserSerializer
+
+User = get_user_model()
+
+
+class CachedPrincipalTests(TestCase):
+    def setUp(self):
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        clear_principals()
+        self.admin = User.objects.create_user(username='boss', password='pw', role='superadmin')
+        self.user = User.objects.create_user(username='member', password='pw', email='member@example.com')
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return client
+
+    def test_repeat_requests_resolve_the_user_without_a_query(self):
+        token = RefreshToken.for_user(self.user).access_token
+        authentication = CachedJWTAuthentication()
+        with self.assertNumQueries(1):
+            authentication.get_user(token)
+        with self.assertNumQueries(0):
+            user = authentication.get_user(token)
+        self.assertEqual((user.pk, user.role, user.email), (self.user.pk, 'user', 'member@example.com'))
+        self.assertIsInstance(user, User)
+
+        clear_principals()  # A fresh process still finds it in the shared cache.
+        with self.assertNumQueries(0):
+            authentication.get_user(token)
+
+    def test_role_and_active_changes_apply_immediately(self):
+        member, boss = self.client_for(self.user), self.client_for(self.admin)
+        self.assertEqual(member.get('/api/auth/profile/').status_code, 200)
+        self.assertEqual(member.get('/api/auth/manage/').status_code, 403)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = boss.post(f'/api/auth/manage/{self.user.pk}/change_role/', {'role': 'admin'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(member.get('/api/auth/manage/').status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = boss.post(f'/api/auth/manage/{self.user.pk}/toggle_active/')
+        self.assertEqual(response.data, {'is_active': False})
+        self.assertEqual(member.get('/api/auth/profile/').status_code, 401)
+
+    def test_other_processes_reject_revoked_users_within_the_local_ttl(self):
+        member = self.client_for(self.user)
+        now = time.time()
+        with mock.patch('users.authentication.time.time', return_value=now):
+            self.assertEqual(member.get('/api/auth/profile/').status_code, 200)
+
+        # Another process deactivates the user: the shared entry goes, this process's copy stays.
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        caches[settings.RESPONSE_CACHE_ALIAS].delete(principal_key(self.user.pk))
+
+        window = settings.AUTH_USER_LOCAL_CACHE_SECONDS
+        with mock.patch('users.authentication.time.time', return_value=now + window - 1):
+            self.assertEqual(member.get('/api/auth/profile/').status_code, 200)
+        with mock.patch('users.authentication.time.time', return_value=now + window + 1):
+            self.assertEqual(member.get('/api/auth/profile/').status_code, 401)
+
+    def test_late_fill_after_forget_is_ignored(self):
+        cache = caches[settings.RESPONSE_CACHE_ALIAS]
+        self.assertTrue(load_principal(self.user.pk)['is_active'])
+        stale = cache.get(principal_key(self.user.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        # A reader that loaded the row before the save stores it after forget_user ran.
+        cache.set(principal_key(self.user.pk), stale)
+        clear_principals()
+        self.assertFalse(load_principal(self.user.pk)['is_active'])
+
+    def test_profile_updates_write_through_a_fresh_row(self):
+        member = self.client_for(self.user)
+        self.assertEqual(member.get('/api/auth/profile/').data['first_name'], '')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = member.patch('/api/auth/profile/', {'first_name': 'Ada'})
+        self.assertEqual(response.data['first_name'], 'Ada')
+        self.assertTrue(User.objects.get(pk=self.user.pk).check_password('pw'))
+        self.assertEqual(member.get('/api/auth/profile/').data['first_name'], 'Ada')
+
+
+class UserListingTests(TestCase):
+    def setUp(self):
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        self.superadmin = User.objects.create_user(username='root', password='pw', role='superadmin')
+        self.admin = User.objects.create_user(username='staff', password='pw', role='admin')
+        self.client = APIClient()
+
+    def add_travellers(self, count):
+        for number in range(count):
+            user = User.objects.create_user(username=f'traveller{User.objects.count()}', password='pw')
+            trip = Trip.objects.create(user=user, title='Trip', destination='Oslo',
+                                       start_date=date(2025, 3, 1), end_date=date(2025, 3, 4))
+            Expense.objects.create(trip=trip, description='Fika', amount=Decimal('12.50') * (number + 1),
+                                   category='food', date=date(2025, 3, 2))
+
+    def listing_queries(self, user):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/auth/manage/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data['results']
+
+    def test_listing_query_count_does_not_grow_with_users(self):
+        self.add_travellers(2)
+        few, _ = self.listing_queries(self.superadmin)
+        self.add_travellers(5)
+        many, results = self.listing_queries(self.superadmin)
+        self.assertEqual(few, many)
+        self.assertEqual(len(results), 9)
+
+        for row in results:
+            user = User.objects.get(pk=row['id'])
+            expected = UserSerializer(user).data
+            self.assertEqual((row['trips_count'], row['total_expenses']),
+                             (expected['trips_count'], expected['total_expenses']))
+
+    def test_admins_only_list_regular_users(self):
+        self.add_travellers(3)
+        _, results = self.listing_queries(self.admin)
+        self.assertEqual(len(results), 3)
+        self.assertEqual({row['role'] for row in results}, {'user'})
+        self.assertEqual([row['trips_count'] for row in results], [1, 1, 1])
+
+    def test_cursor_pages_walk_newest_first(self):
+        self.add_travellers(12)
+        self.client.force_authenticate(self.superadmin)
+        response = self.client.get('/api/auth/manage/', {'pagination': 'cursor', 'page_size': 5})
+        seen = [row['id'] for row in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += [row['id'] for row in response.data['results']]
+        self.assertEqual(seen, list(User.objects.order_by('-created_at', '-pk').values_list('pk', flat=True)))
@@ -6,6 +6,7 @@ from .views import (
     AdminDashboardView, UserDashboardView
 )
 from rest_framework_simplejwt.views import TokenRefreshView
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'manage', UserManagementViewSet, basename='user-management')
@@ -18,5 +19,7 @@ urlpatterns = [
     path('profile/', UserProfileView.as_view(), name='profile'),
     path('dashboard/admin/', AdminDashboardView.as_view(), name='admin-dashboard'),
     path('dashboard/user/', UserDashboardView.as_view(), name='user-dashboard'),
+    path('async/dashboard/admin/', async_views.admin_dashboard_view, name='async-admin-dashboard'),
+    path('async/dashboard/user/', async_views.user_dashboard_view, name='async-user-dashboard'),
     path('', include(router.urls)),
 ]
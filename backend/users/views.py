@@ -2,13 +2,15 @@
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.decorators import action
-from rest_framework_simplejwt.tokens import RefreshToken
+from tokens.tokens import RefreshToken
 from django.contrib.auth import get_user_model
+from core.db_router import ReplicaReadsMixin
+from trips.pagination import KeysetPagination
 from django.db.models import Sum, Count, Q
 from datetime import datetime, timedelta
 from .serializers import (
     UserSerializer, UserCreateSerializer, UserUpdateSerializer,
-    RegisterSerializer, CustomTokenObtainPairSerializer
+    RegisterSerializer, CustomTokenObtainPairSerializer, with_trip_totals
 )
 
 User = get_user_model()
@@ -30,6 +32,8 @@ class RegisterView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
+        # Nothing to count yet; saves UserSerializer two queries.
+        user.trips_count, user.total_expenses = 0, None
 
         refresh = RefreshToken.for_user(user)
 
@@ -66,11 +70,15 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        if self.request.method in permissions.SAFE_METHODS:
+            return self.request.user
+        # request.user comes from the principal cache; write through a fresh row.
+        return User.objects.get(pk=self.request.user.pk)
 
 class UserManagementViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     permission_classes = [permissions.IsAuthenticated, IsAdminUser]
+    pagination_class = KeysetPagination
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -82,10 +90,15 @@ class UserManagementViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.role == 'superadmin':
-            return User.objects.all().order_by('-created_at')
+            users = User.objects.all()
         elif user.role == 'admin':
-            return User.objects.filter(role='user').order_by('-created_at')
-        return User.objects.none()
+            users = User.objects.filter(role='user')
+        else:
+            return User.objects.none()
+        if self.action in ('list', 'retrieve'):
+            users = with_trip_totals(users)
+        # Served by user_created_idx, also for ?pagination=cursor pages.
+        return users.order_by('-created_at', '-pk')
     
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, IsSuperAdmin])
     def change_role(self, request, pk=None):
@@ -121,103 +134,32 @@ class UserManagementViewSet(viewsets.ModelViewSet):
             'active_trips': user.trips.filter(status__in=['upcoming', 'ongoing']).count()
         })
 
-class AdminDashboardView(APIView):
+class AdminDashboardView(ReplicaReadsMixin, APIView):
     permission_classes = [permissions.IsAuthenticated, IsAdminUser]
+    replica_actions = ('get',)
     
     def get(self, request):
-        from trips.models import Trip
-        from trips.serializers import TripListSerializer
-        
-        total_users = User.objects.count()
-        active_users = User.objects.filter(is_active=True).count()
-        total_trips = Trip.objects.count()
-        active_trips = Trip.objects.filter(status__in=['upcoming', 'ongoing']).count()
-        
-        users_by_role = {
-            'superadmin': User.objects.filter(role='superadmin').count(),
-            'admin': User.objects.filter(role='admin').count(),
-            'user': User.objects.filter(role='user').count(),
-        }
-        
-        trips_by_status = {
-            'planning': Trip.objects.filter(status='planning').count(),
-            'upcoming': Trip.objects.filter(status='upcoming').count(),
-            'ongoing': Trip.objects.filter(status='ongoing').count(),
-            'completed': Trip.objects.filter(status='completed').count(),
-            'cancelled': Trip.objects.filter(status='cancelled').count(),
-        }
+        from trips.concurrent import run_queries
+        from .dashboard import admin_dashboard, admin_dashboard_queries
         
-        total_budget = Trip.objects.aggregate(total=Sum('budget'))['total'] or 0
-        total_expenses = Trip.objects.aggregate(total=Sum('actual_cost'))['total'] or 0
-        
-        recent_users = User.objects.order_by('-created_at')[:5]
-        recent_trips = Trip.objects.select_related('user').order_by('-created_at')[:10]
-        
-        top_destinations = Trip.objects.values('destination').annotate(
-            count=Count('id')
-        ).order_by('-count')[:5]
-        
-        thirty_days_ago = datetime.now() - timedelta(days=30)
-        new_users_month = User.objects.filter(created_at__gte=thirty_days_ago).count()
-        new_trips_month = Trip.objects.filter(created_at__gte=thirty_days_ago).count()
-        
-        return Response({
-            'system_stats': {
-                'total_users': total_users,
-                'active_users': active_users,
-                'total_trips': total_trips,
-                'active_trips': active_trips,
-                'total_budget': float(total_budget),
-                'total_expenses': float(total_expenses),
-                'new_users_month': new_users_month,
-                'new_trips_month': new_trips_month,
-            },
-            'users_by_role': users_by_role,
-            'trips_by_status': trips_by_status,
-            'recent_users': UserSerializer(recent_users, many=True).data,
-            'recent_trips': TripListSerializer(recent_trips, many=True).data,
-            'top_destinations': list(top_destinations),
-        })
+        return Response(admin_dashboard(run_queries(admin_dashboard_queries())))
 
-class UserDashboardView(APIView):
+class UserDashboardView(ReplicaReadsMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
+    replica_actions = ('get',)
     
     def get(self, request):
-        from trips.models import Trip
-        from trips.serializers import TripListSerializer
+        from trips.cache import cached_response
         
         user = request.user
         
         if user.role == 'admin' or user.role == 'superadmin':
             return Response({'error': 'Admins should use admin dashboard'}, status=status.HTTP_403_FORBIDDEN)
         
-        trips = user.trips.all()
-        
-        total_trips = trips.count()
-        upcoming_trips = trips.filter(status='upcoming').count()
-        ongoing_trips = trips.filter(status='ongoing').count()
-        completed_trips = trips.filter(status='completed').count()
-        
-        total_expenses = trips.aggregate(total=Sum('actual_cost'))['total'] or 0
-        total_budget = trips.aggregate(total=Sum('budget'))['total'] or 0
-        
-        favorite_destinations = trips.values('destination').annotate(
-            count=Count('id')
-        ).order_by('-count')[:3]
-        
-        recent_trips = trips.order_by('-created_at')[:5]
-        upcoming = trips.filter(status='upcoming').order_by('start_date')[:3]
+        return cached_response(request, 'user-dashboard', lambda: self.build(user), scopes=[f'user:{user.pk}'])
+    
+    def build(self, user):
+        from trips.concurrent import run_queries
+        from .dashboard import user_dashboard, user_dashboard_queries
         
-        return Response({
-            'personal_stats': {
-                'total_trips': total_trips,
-                'upcoming_trips': upcoming_trips,
-                'ongoing_trips': ongoing_trips,
-                'completed_trips': completed_trips,
-                'total_expenses': float(total_expenses),
-                'total_budget': float(total_budget),
-            },
-            'favorite_destinations': list(favorite_destinations),
-            'recent_trips': TripListSerializer(recent_trips, many=True).data,
-            'upcoming_trips': TripListSerializer(upcoming, many=True).data,
-        })
+        return user_dashboard(run_queries(user_dashboard_queries(user)))